@@ -0,0 +1,263 @@
+"""
+Local OpenAI compatible stand-in for OpenRouter, so the backend can be load tested without
+network calls, provider latency noise or cost.
+
+Answers /api/v1/chat/completions with game-shaped replies (a secret, yes/no answers, CORRECT:/INCORRECT:
+verdicts, hint lists, router tool calls and the fused FusedTurn call), streamed or not, after a
+latency drawn from the configured distribution.
+
+Usage (from backend/):
+    python -m benchmarks.fake_openrouter --port 8099 --latency lognormal:0.6,0.35 --token-delay 0.01
+    OPENROUTER_BASE_URL=http://127.0.0.1:8099/api/v1 uvicorn main:app
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SECRETS = ["Piano", "Giraffe", "Banana", "Eiffel Tower", "Telescope", "Tornado", "Chess", "Violin", "Saturn", "Pineapple"]
+
+class Latency:
+    """
+    A latency distribution in seconds, parsed from "fixed:0.5", "uniform:0.2,1.0", "normal:0.5,0.1",
+    "lognormal:<median>,<sigma>" or "exponential:<mean>". Samples are never negative.
+    """
+
+    def __init__(self, spec: str):
+        kind, _, params = spec.partition(":")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0] if p else 0.0
+        elif self.kind == "uniform":
+            value = random.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = random.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = p[0] * random.lognormvariate(0, p[1])
+        else:
+            value = random.expovariate(1 / p[0])
+        return max(0.0, value)
+
+class Settings:
+    latency = Latency("fixed:0")
+    token_delay = 0.0  # between streamed chunks
+    error_rate = 0.0  # 500s
+    rate_limit_rate = 0.0  # 429s with a Retry-After
+    retry_after = 1.0
+
+settings = Settings()
+stats = {"requests": 0, "streamed": 0, "tool_calls": 0, "errors": 0, "rate_limited": 0}
+
+app = FastAPI()
+
+def _text(content) -> str:
+    if isinstance(content, list):  # content blocks
+        return "\n".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+def _after(prompt: str, marker: str) -> str:
+    return prompt.split(marker)[-1].strip().rstrip(".") if marker in prompt else ""
+
+def _secret(prompt: str) -> str:
+    match = re.search(r"secret answer is: (.+?)\.(\s|$)", prompt)
+    return match.group(1) if match else ""
+
+def _user_message(prompt: str) -> str:
+    for marker in ("The user's message is:", "The user's guess is:", "The user's question is:", "Here is the user's current message:"):
+        if marker in prompt:
+            return _after(prompt, marker)
+    return ""
+
+def _pick_action(user_message: str, secret: str) -> str:
+    low = user_message.lower()
+    if low == "page_load":
+        return "general_chat" if secret else "generate_mystery_item"
+    if not secret:
+        return "generate_mystery_item" if re.search(r"\b(play|ready|start|yes|sure)\b", low) else "general_chat"
+    if re.search(r"give up|new game|start over|exit", low):
+        return "reset_game"
+    if "hint" in low:
+        return "give_hint"
+    if re.match(r"(is it|my guess is|i guess|it's|is it an?|is it the)\b", low) and len(low.split()) <= 5:
+        return "check_guess"
+    if "?" in low:
+        return "answer_question"
+    return "general_chat"
+
+def _is_correct(guess: str, secret: str) -> bool:
+    return bool(secret) and secret.lower() in guess.lower()
+
+def _reply(action: str, user_message: str, secret: str) -> str:
+    if action == "check_guess":
+        if _is_correct(user_message, secret):
+            return f"CORRECT: You got it, it was {secret}! Want to play again?"
+        return "INCORRECT: Not quite, but keep going! Think about where you would usually find it."
+    if action == "answer_question":
+        return random.choice(["Yes, it is, and that should narrow it down.", "No, it isn't, try another angle."])
+    if action == "give_hint":
+        return "Here's a hint: most people have seen one in real life."
+    if action == "reset_game":
+        return "No problem, let me know when you're ready to play again."
+    return "Happy to chat! There's a game in progress whenever you want to get back to it."
+
+def _tool_call(body: dict, prompt: str) -> tuple[str, dict]:
+    """Picks the function to call and fills its arguments from the prompt."""
+    functions = [tool["function"] for tool in body.get("tools", [])]
+    names = [f["name"] for f in functions]
+    user_message = _user_message(prompt)
+    secret = _secret(prompt)
+    if "FusedTurn" in names:
+        action = _pick_action(user_message, secret)
+        if action == "generate_mystery_item":
+            action = "general_chat"
+        reply = _reply(action, user_message, secret)
+        for prefix in ("CORRECT:", "INCORRECT:"):
+            reply = reply.removeprefix(prefix).strip()
+        is_correct = _is_correct(user_message, secret) if action == "check_guess" else None
+        return "FusedTurn", {"action": action, "is_correct": is_correct, "response": reply}
+
+    name = _pick_action(user_message, secret)
+    if name not in names:
+        name = "general_chat" if "general_chat" in names else names[0]
+    function = functions[names.index(name)]
+    args = {}
+    for param in function.get("parameters", {}).get("properties", {}):
+        args[param] = secret if param == "secret_answer" else user_message
+    return name, args
+
+def _content(prompt: str) -> str:
+    if "generate a secret" in prompt:
+        return random.choice(SECRETS)
+    match = re.search(r"write (\d+) hints", prompt)
+    if match:
+        return "\n".join(f"Hint number {i + 1} about the secret." for i in range(int(match.group(1))))
+    secret = _secret(prompt)
+    if "check if the user's guess" in prompt:
+        return _reply("check_guess", _after(prompt, "The user's guess is:"), secret)
+    if "answer the user's question" in prompt:
+        return _reply("answer_question", "", secret)
+    if "give hints about the secret" in prompt:
+        return _reply("give_hint", "", secret)
+    return _reply("general_chat", "", secret)
+
+def _usage(prompt: str, completion: str) -> dict:
+    prompt_tokens = len(prompt) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": max(1, len(completion) // 4),
+        "total_tokens": prompt_tokens + max(1, len(completion) // 4),
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: str | None = None, usage: dict | None = None) -> str:
+    data = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+    }
+    if usage:
+        data["usage"] = usage
+    return f"data: {json.dumps(data)}\n\n"
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    if random.random() < settings.rate_limit_rate:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit exceeded", "code": 429}},
+            status_code=429,
+            headers={"Retry-After": str(settings.retry_after)},
+        )
+    if random.random() < settings.error_rate:
+        stats["errors"] += 1
+        return JSONResponse({"error": {"message": "Upstream error", "code": 500}}, status_code=500)
+
+    prompt = "\n".join(_text(m.get("content")) for m in body.get("messages", []))
+    model = body.get("model", "fake")
+    completion_id = f"gen-{uuid.uuid4().hex}"
+    tool_call = None
+    if body.get("tools"):
+        stats["tool_calls"] += 1
+        name, args = _tool_call(body, prompt)
+        tool_call = {"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+        content = ""
+    else:
+        content = _content(prompt)
+    usage = _usage(prompt, content or tool_call["function"]["arguments"])
+
+    await asyncio.sleep(settings.latency.sample())
+
+    if not body.get("stream"):
+        message = {"role": "assistant", "content": content or None}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": usage,
+        }
+
+    stats["streamed"] += 1
+    include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+    async def stream():
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        if tool_call:
+            yield _chunk(completion_id, model, {"tool_calls": [{"index": 0, **tool_call}]})
+        else:
+            for word in re.findall(r"\S+\s*", content):
+                if settings.token_delay:
+                    await asyncio.sleep(settings.token_delay)
+                yield _chunk(completion_id, model, {"content": word})
+        yield _chunk(completion_id, model, {}, finish_reason="tool_calls" if tool_call else "stop")
+        if include_usage:
+            yield _chunk(completion_id, model, None, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "latency": settings.latency.spec, "token_delay": settings.token_delay}
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenRouter server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="fixed:0", help='e.g. "fixed:0.5", "uniform:0.2,1", "lognormal:0.6,0.35"')
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    settings.latency = Latency(args.latency)
+    settings.token_delay = args.token_delay
+    settings.error_rate = args.error_rate
+    settings.rate_limit_rate = args.rate_limit_rate
+    settings.retry_after = args.retry_after
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Load test for the mystery item API against the fake OpenRouter server.
+
+Starts benchmarks.fake_openrouter and the backend (uvicorn main:app) as subprocesses, then plays
+scripted games in N concurrent sessions through /mystery-item/invoke and /mystery-item/reset.
+Reports throughput, latency percentiles per step, per graph node time (from /mystery-item/stats)
+and the backend's memory growth per session. Results are written to benchmarks/results/ and can be
+compared against a stored baseline to catch regressions.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --sessions 50 --concurrency 20 --latency lognormal:0.4,0.3
+    python -m benchmarks.load_test --baseline benchmarks/results/baseline.json
+    python -m benchmarks.load_test --backend-url http://127.0.0.1:8000  # an already running backend, no memory stats
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from collections import defaultdict
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+QUESTIONS = [
+    "Is it bigger than a bread box?",
+    "Can you find it inside a house?",
+    "Is it something you can eat or drink?",
+    "Does it make any kind of sound?",
+    "Would a child be able to use it?",
+    "Is it found in nature somewhere?",
+]
+WRONG_GUESSES = ["Is it a bicycle?", "Is it a cat?", "Is it a toaster?"]
+# Metrics compared against the baseline, and whether higher is better
+REGRESSION_METRICS = {
+    "throughput_rps": True,
+    "latency_ms.all.p50": False,
+    "latency_ms.all.p95": False,
+    "latency_ms.all.p99": False,
+}
+
+def _percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 1)
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples) * 1000, 1),
+        "p50": pick(0.5),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(samples[-1] * 1000, 1),
+    }
+
+def _rss_mb(pid: int) -> float | None:
+    """Resident memory of a process, Linux only."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(int)
+        self.errors = 0
+
+    def add(self, step: str, seconds: float, status: int) -> None:
+        self.statuses[status] += 1
+        if status != 200:
+            self.errors += 1
+            return
+        self.latencies[step].append(seconds)
+        self.latencies["all"].append(seconds)
+
+async def _post(client: httpx.AsyncClient, recorder: Recorder, step: str, path: str, payload: dict) -> dict | None:
+    started = time.perf_counter()
+    try:
+        response = await client.post(path, json=payload)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    recorder.add(step, time.perf_counter() - started, status)
+    return response.json() if status == 200 else None
+
+async def play_session(client: httpx.AsyncClient, recorder: Recorder, games: int, questions: int, think_time: float) -> None:
+    """One player: page_load, a few questions, a hint, wrong guesses, the right guess, then /reset for the next game."""
+    session_id = str(uuid.uuid4())
+
+    async def say(step: str, message: str) -> dict | None:
+        if think_time:
+            await asyncio.sleep(random.uniform(0, think_time * 2))
+        return await _post(client, recorder, step, "/mystery-item/invoke", {"session_id": session_id, "message": message})
+
+    result = await say("page_load", "page_load")
+    for game in range(games):
+        if game:
+            if think_time:
+                await asyncio.sleep(random.uniform(0, think_time * 2))
+            result = await _post(client, recorder, "reset", "/mystery-item/reset", {"session_id": session_id})
+        secret = result and result.get("secret_answer")
+        for question in random.sample(QUESTIONS, min(questions, len(QUESTIONS))):
+            await say("question", question)
+        await say("hint", "Can I get a hint?")
+        await say("guess_wrong", random.choice(WRONG_GUESSES))
+        if secret:
+            await say("guess_right", f"Is it {secret}?")
+
+async def run_load(backend_url: str, sessions: int, concurrency: int, games: int, questions: int, think_time: float) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=backend_url, timeout=120, limits=limits) as client:
+        stats_before = (await client.get("/mystery-item/stats")).json()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def player():
+            async with semaphore:
+                await play_session(client, recorder, games, questions, think_time)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(player() for _ in range(sessions)))
+        elapsed = time.perf_counter() - started
+        stats_after = (await client.get("/mystery-item/stats")).json()
+
+    requests = sum(recorder.statuses.values())
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "requests": requests,
+        "errors": recorder.errors,
+        "statuses": {str(status): count for status, count in sorted(recorder.statuses.items())},
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {step: _percentiles(samples) for step, samples in sorted(recorder.latencies.items())},
+        "graph_nodes": _node_deltas(stats_before.get("graph_nodes", {}), stats_after.get("graph_nodes", {})),
+        "backend_stats": stats_after,
+    }
+
+def _node_deltas(before: dict, after: dict) -> dict:
+    """Time spent per graph node during the run, from the cumulative counters on /stats."""
+    deltas = {}
+    for node, stats in after.items():
+        runs = stats["runs"] - before.get(node, {}).get("runs", 0)
+        total_s = stats["total_s"] - before.get(node, {}).get("total_s", 0.0)
+        if runs:
+            deltas[node] = {
+                "runs": runs,
+                "total_s": round(total_s, 3),
+                "avg_ms": round(total_s / runs * 1000, 1),
+                "p95_ms_recent": stats["latency_ms_p95"],
+            }
+    return deltas
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1).raise_for_status()  # /ready is 503 until the backend's warm-up is done
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} didn't come up within {timeout}s")
+
+def _start_servers(args) -> tuple[list[subprocess.Popen], str, int]:
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openrouter", "--port", str(args.stub_port),
+         "--latency", args.latency, "--token-delay", str(args.token_delay),
+         "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate)],
+        cwd=BACKEND_DIR,
+    )
+    env = {
+        **os.environ,
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{args.stub_port}/api/v1",
+        "OPENROUTER_API_KEY": os.getenv("OPENROUTER_API_KEY", "benchmark"),
+        "MYSTERY_ITEM_GRAPH_MODE": args.graph_mode,
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.backend_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL if args.quiet else None,
+        stderr=subprocess.DEVNULL if args.quiet else None,
+    )
+    processes = [backend, stub]  # the backend first, so it doesn't see the stub go away
+    try:
+        _wait_until_up(f"http://127.0.0.1:{args.stub_port}/stats", stub)
+        _wait_until_up(f"http://127.0.0.1:{args.backend_port}/ready", backend)
+    except Exception:
+        _stop(processes)
+        raise
+    return processes, f"http://127.0.0.1:{args.backend_port}", backend.pid
+
+def _stop(processes: list[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def _metric(result: dict, path: str):
+    value = result
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Metrics that got worse than the baseline by more than tolerance (a fraction)."""
+    regressions = []
+    for path, higher_is_better in REGRESSION_METRICS.items():
+        current, previous = _metric(result, path), _metric(baseline, path)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{path}: {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+def _print_report(result: dict) -> None:
+    print(f"\n{result['requests']} requests in {result['elapsed_s']}s, {result['throughput_rps']} req/s, {result['errors']} errors {result['statuses']}")
+    print(f"{'step':<14}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)")
+    for step, stats in result["latency_ms"].items():
+        if stats["count"]:
+            print(f"{step:<14}{stats['count']:>7}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}{stats['max']:>10}")
+    if result["graph_nodes"]:
+        print(f"\n{'graph node':<14}{'runs':>7}{'avg ms':>10}{'total s':>10}")
+        for node, stats in result["graph_nodes"].items():
+            print(f"{node:<14}{stats['runs']:>7}{stats['avg_ms']:>10}{stats['total_s']:>10}")
+    memory = result.get("memory")
+    if memory:
+        print(f"\nbackend RSS {memory['rss_mb_before']} MB -> {memory['rss_mb_after']} MB, {memory['kb_per_session']} KB per session")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the mystery item API against a fake OpenRouter")
+    parser.add_argument("--sessions", type=int, default=50, help="simulated players")
+    parser.add_argument("--concurrency", type=int, default=20, help="players active at the same time")
+    parser.add_argument("--games", type=int, default=2, help="games per player, /reset between games")
+    parser.add_argument("--questions", type=int, default=3, help="questions per game")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds a player waits between messages")
+    parser.add_argument("--latency", default="lognormal:0.3,0.3", help="fake LLM latency distribution, see fake_openrouter.Latency")
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--graph-mode", default=os.getenv("MYSTERY_ITEM_GRAPH_MODE", "standard"), choices=["standard", "fused"])
+    parser.add_argument("--stub-port", type=int, default=8099)
+    parser.add_argument("--backend-port", type=int, default=8098)
+    parser.add_argument("--backend-url", help="use an already running backend instead of starting one")
+    parser.add_argument("--label", default="run", help="name of the results file")
+    parser.add_argument("--baseline", help="results file to compare against, exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs the baseline (fraction)")
+    parser.add_argument("--quiet", action="store_true", help="hide the backend's output")
+    args = parser.parse_args()
+
+    processes, backend_url, backend_pid = [], args.backend_url, None
+    if not backend_url:
+        processes, backend_url, backend_pid = _start_servers(args)
+    try:
+        rss_before = _rss_mb(backend_pid) if backend_pid else None
+        result = asyncio.run(run_load(backend_url, args.sessions, args.concurrency, args.games, args.questions, args.think_time))
+        rss_after = _rss_mb(backend_pid) if backend_pid else None
+    finally:
+        _stop(processes)
+
+    if rss_before and rss_after:
+        result["memory"] = {
+            "rss_mb_before": round(rss_before, 1),
+            "rss_mb_after": round(rss_after, 1),
+            "kb_per_session": round((rss_after - rss_before) * 1024 / args.sessions, 1),
+        }
+    result["config"] = {
+        key: getattr(args, key)
+        for key in ("sessions", "concurrency", "games", "questions", "think_time", "latency", "token_delay", "error_rate", "rate_limit_rate", "graph_mode")
+    }
+    result["environment"] = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    result["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    _print_report(result)
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{args.label}.json"
+    path.write_text(json.dumps(result, indent=2))
+    print(f"\nresults written to {path}")
+
+    if args.baseline:
+        regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS vs baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nno regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
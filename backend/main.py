@@ -1,15 +1,37 @@
+import sys
+import time
+_import_started = time.perf_counter()
+_modules_before = len(sys.modules)
+
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from src.services import testChain # for dev
 from src.routers import mystery_item_router
+from src.config.http_client_config import close_http_clients
+from src.utils.metrics import render_metrics
+from src.config.logging_config import setup_logging
+from src.utils.request_profiler import RequestProfilerMiddleware, PROFILING_ENABLED
+from src.services import app_startup
+
+app_startup.record_import_time(time.perf_counter() - _import_started, len(sys.modules) - _modules_before)
 
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
-logging.basicConfig(level=logging.INFO, format='%(levelname)s:     %(message)s')
+# Structured (LOG_FORMAT=json|text), sampled logging, written by a background listener thread
+setup_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The graph and the LLM clients are built here instead of at import, plus the optional warm-up (STARTUP_WARMUP_ENABLED)
+    await app_startup.start()
+    yield
+    await app_startup.stop()
+    await close_http_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 # frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
 allowed_origins = [
@@ -26,11 +48,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in cProfile of single /invoke and /reset requests (X-Profile header or sampling)
+if PROFILING_ENABLED:
+    app.add_middleware(RequestProfilerMiddleware)
+
 app.include_router(mystery_item_router.router)
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: graph node, tool and LLM call histograms/counters."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until startup (and the warm-up, if enabled) has finished."""
+    stats = app_startup.get_startup_stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
 #test endpoints -------------------------------- # for dev
 @app.get("/")
 def read_root():
+    from src.services import testChain # for dev, imported on first use so it stays out of production startup
     logger.info("--- testChain.test_llm_call() ---")
     result = testChain.test_llm_call()
     logger.info(f"result: {result}")
@@ -0,0 +1,25 @@
+import os
+from dotenv import load_dotenv
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+load_dotenv()
+
+# "memory": in-process MemorySaver (single worker, lost on restart)
+# "sqlite": SQLite file in WAL mode, shared by all worker processes on the host
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory").lower()
+CHECKPOINTER_SQLITE_PATH = os.getenv("CHECKPOINTER_SQLITE_PATH", os.path.join("data", "checkpoints.sqlite"))
+CHECKPOINTER_KEEP_CHECKPOINTS = int(os.getenv("CHECKPOINTER_KEEP_CHECKPOINTS", "10"))
+
+def build_checkpointer() -> BaseCheckpointSaver:
+    """Builds the checkpointer selected by CHECKPOINTER_BACKEND."""
+    if CHECKPOINTER_BACKEND == "memory":
+        return MemorySaver()
+    if CHECKPOINTER_BACKEND == "sqlite":
+        from src.services.sqlite_checkpointer import SqliteCheckpointSaver
+
+        directory = os.path.dirname(CHECKPOINTER_SQLITE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return SqliteCheckpointSaver(CHECKPOINTER_SQLITE_PATH, keep_checkpoints=CHECKPOINTER_KEEP_CHECKPOINTS or None)
+    raise ValueError(f"Unknown CHECKPOINTER_BACKEND: {CHECKPOINTER_BACKEND}")
@@ -0,0 +1,232 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import importlib.util
+import httpx
+from dotenv import load_dotenv
+from src.utils.metrics import span, LLM_HTTP_SECONDS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Shared connection pool for all LLM clients, so concurrent turns reuse warm (TLS) connections
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+# HTTP/2 multiplexes concurrent requests over one connection, needs the `h2` package (httpx[http2])
+_LLM_HTTP2_REQUESTED = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_HTTP2 = _LLM_HTTP2_REQUESTED and importlib.util.find_spec("h2") is not None
+# Per-phase timeouts in seconds. POOL is how long a request may wait for a free connection,
+# TOTAL caps the whole request including reading the (streamed) body. The sync client can't interrupt a
+# blocking read, it checks TOTAL between body chunks, so a request may overrun it by up to READ.
+LLM_HTTP_TIMEOUT_CONNECT = float(os.getenv("LLM_HTTP_TIMEOUT_CONNECT", "5"))
+LLM_HTTP_TIMEOUT_READ = float(os.getenv("LLM_HTTP_TIMEOUT_READ", "60"))
+LLM_HTTP_TIMEOUT_WRITE = float(os.getenv("LLM_HTTP_TIMEOUT_WRITE", "10"))
+LLM_HTTP_TIMEOUT_POOL = float(os.getenv("LLM_HTTP_TIMEOUT_POOL", "5"))
+LLM_HTTP_TIMEOUT_TOTAL = float(os.getenv("LLM_HTTP_TIMEOUT_TOTAL", "90"))
+
+LLM_HTTP_TIMEOUT = httpx.Timeout(
+    connect=LLM_HTTP_TIMEOUT_CONNECT,
+    read=LLM_HTTP_TIMEOUT_READ,
+    write=LLM_HTTP_TIMEOUT_WRITE,
+    pool=LLM_HTTP_TIMEOUT_POOL,
+)
+LLM_HTTP_LIMITS = httpx.Limits(
+    max_connections=LLM_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+)
+
+# Pool saturation counters ------------------------------------------------------------
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "saturated_requests": 0,  # started while every connection was busy, i.e. had to wait for the pool (HTTP/1.1)
+    "pool_timeouts": 0,
+    "connect_errors": 0,
+    "total_timeouts": 0,
+    "errors": 0,
+}
+
+def _request_started() -> None:
+    with _stats_lock:
+        _stats["requests"] += 1
+        if _stats["in_flight"] >= LLM_HTTP_MAX_CONNECTIONS:
+            _stats["saturated_requests"] += 1
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+
+def _request_finished() -> None:
+    with _stats_lock:
+        _stats["in_flight"] -= 1
+
+def _request_failed(e: Exception) -> None:
+    with _stats_lock:
+        if isinstance(e, httpx.PoolTimeout):
+            _stats["pool_timeouts"] += 1
+        elif isinstance(e, httpx.ConnectError):
+            _stats["connect_errors"] += 1
+        _stats["errors"] += 1
+    _request_finished()
+
+def _total_timeout(request: httpx.Request) -> httpx.ReadTimeout:
+    with _stats_lock:
+        _stats["total_timeouts"] += 1
+    return httpx.ReadTimeout(f"Total timeout of {LLM_HTTP_TIMEOUT_TOTAL}s exceeded", request=request)
+
+class _CountedSyncStream(httpx.SyncByteStream):
+    """Response body wrapper, the request counts as in flight until its body is closed. Checks the TOTAL deadline per chunk."""
+
+    def __init__(self, stream: httpx.SyncByteStream, request: httpx.Request, deadline: float):
+        self._stream = stream
+        self._request = request
+        self._deadline = deadline
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if time.monotonic() > self._deadline:
+                raise _total_timeout(self._request)
+            yield chunk
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            _request_finished()
+        self._stream.close()
+
+class _CountedAsyncStream(httpx.AsyncByteStream):
+    """Async response body wrapper, also enforces the TOTAL deadline (event loop time) while the body is read."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, request: httpx.Request, deadline: float):
+        self._stream = stream
+        self._request = request
+        self._deadline = deadline
+        self._closed = False
+
+    async def __aiter__(self):
+        chunks = self._stream.__aiter__()
+        while True:
+            # timeout_at only schedules a timer on the one deadline, no task per chunk like wait_for. It wraps the
+            # read only: a timeout around the yield would cancel whatever the consumer awaits in between.
+            try:
+                if asyncio.get_running_loop().time() >= self._deadline:
+                    raise TimeoutError  # a buffered chunk is returned without suspending, so the timer can't fire
+                async with asyncio.timeout_at(self._deadline):
+                    chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                raise _total_timeout(self._request) from None
+            yield chunk
+
+    async def aclose(self) -> None:
+        if not self._closed:
+            self._closed = True
+            _request_finished()
+        await self._stream.aclose()
+
+class _CountingTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _request_started()
+        started = time.perf_counter()
+        deadline = time.monotonic() + LLM_HTTP_TIMEOUT_TOTAL
+        try:
+            with span("llm.http", method=request.method, url=str(request.url)) as current:
+                response = super().handle_request(request)
+                current.set_attribute("http.status_code", response.status_code)
+        except Exception as e:
+            _request_failed(e)
+            LLM_HTTP_SECONDS.observe(time.perf_counter() - started, status="error")
+            raise
+        LLM_HTTP_SECONDS.observe(time.perf_counter() - started, status=response.status_code)
+        response.stream = _CountedSyncStream(response.stream, request, deadline)
+        return response
+
+class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _request_started()
+        started = time.perf_counter()
+        deadline = asyncio.get_running_loop().time() + LLM_HTTP_TIMEOUT_TOTAL
+        try:
+            # The span ends with the response headers, the streamed body is read by the LLM call's span
+            with span("llm.http", method=request.method, url=str(request.url)) as current:
+                async with asyncio.timeout_at(deadline):
+                    response = await super().handle_async_request(request)
+                current.set_attribute("http.status_code", response.status_code)
+        except TimeoutError:
+            e = _total_timeout(request)
+            _request_failed(e)
+            LLM_HTTP_SECONDS.observe(time.perf_counter() - started, status="timeout")
+            raise e
+        except Exception as e:
+            _request_failed(e)
+            LLM_HTTP_SECONDS.observe(time.perf_counter() - started, status="error")
+            raise
+        LLM_HTTP_SECONDS.observe(time.perf_counter() - started, status=response.status_code)
+        response.stream = _CountedAsyncStream(response.stream, request, deadline)
+        return response
+
+_http_client: httpx.Client | None = None
+_async_http_client: httpx.AsyncClient | None = None
+_clients_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """The process-wide sync httpx client shared by all LLM clients."""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            transport = _CountingTransport(limits=LLM_HTTP_LIMITS, http2=LLM_HTTP2)
+            _http_client = httpx.Client(transport=transport, timeout=LLM_HTTP_TIMEOUT)
+        return _http_client
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """The process-wide async httpx client shared by all LLM clients."""
+    global _async_http_client
+    with _clients_lock:
+        if _async_http_client is None:
+            transport = _CountingAsyncTransport(limits=LLM_HTTP_LIMITS, http2=LLM_HTTP2)
+            _async_http_client = httpx.AsyncClient(transport=transport, timeout=LLM_HTTP_TIMEOUT)
+            if _LLM_HTTP2_REQUESTED and not LLM_HTTP2:
+                logger.warning("LLM_HTTP2 is on but the `h2` package isn't installed, the LLM clients use HTTP/1.1 (pip install 'httpx[http2]')")
+            logger.info(
+                f"--- LLM http client: max_connections={LLM_HTTP_MAX_CONNECTIONS}, "
+                f"keepalive={LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS}/{LLM_HTTP_KEEPALIVE_EXPIRY}s, http2={LLM_HTTP2} ---"
+            )
+        return _async_http_client
+
+async def close_http_clients() -> None:
+    """Closes the shared clients, e.g. on app shutdown."""
+    global _http_client, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
+def _pool_connections(client: httpx.Client | httpx.AsyncClient | None) -> dict:
+    # httpcore's pool isn't public API, only used for the stats snapshot
+    try:
+        connections = client._transport._pool.connections
+    except AttributeError:
+        return {"open": 0, "idle": 0}
+    return {"open": len(connections), "idle": sum(1 for c in connections if c.is_idle())}
+
+def get_http_pool_stats() -> dict:
+    """Request counters plus a snapshot of the open/idle connections of the shared pools."""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        **stats,
+        "max_connections": LLM_HTTP_MAX_CONNECTIONS,
+        "utilization": stats["in_flight"] / LLM_HTTP_MAX_CONNECTIONS if LLM_HTTP_MAX_CONNECTIONS else 0.0,
+        "http2": LLM_HTTP2,
+        "async_pool": _pool_connections(_async_http_client),
+        "sync_pool": _pool_connections(_http_client),
+    }
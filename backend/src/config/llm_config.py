@@ -1,24 +1,87 @@
 import os
+import logging
+from typing import NamedTuple
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
+from src.config.http_client_config import get_http_client, get_async_http_client, LLM_HTTP_TIMEOUT
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "mistralai/mistral-7b-instruct:free")
+# Any OpenAI compatible endpoint, e.g. the local fake server in benchmarks/fake_openrouter.py
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 
 if not OPENROUTER_API_KEY:
     raise ValueError("OPENROUTER_API_KEY is not set in the environment variables.")
 
-try:
-    llm = ChatOpenAI(
-        model=OPENROUTER_MODEL,
+def build_llm(model: str = OPENROUTER_MODEL, **kwargs) -> ChatOpenAI:
+    """
+    Builds a ChatOpenAI client for OpenRouter on top of the shared pooled httpx clients,
+    so every LLM client in the process reuses the same warm connections.
+    """
+    params = {
+        "temperature": 1,
+        "max_retries": 0,  # retries (and 429 backoff) are handled by the LLM scheduler
+        **kwargs,
+    }
+    return ChatOpenAI(
+        model=model,
         api_key=OPENROUTER_API_KEY,
-        base_url="https://openrouter.ai/api/v1",
-        temperature=1,
-        max_retries=3,
+        base_url=OPENROUTER_BASE_URL,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        timeout=LLM_HTTP_TIMEOUT,
+        **params,
+    )
+
+class RoleConfig(NamedTuple):
+    model: str
+    temperature: float
+    max_tokens: int | None
+
+def _role_config(role: str) -> RoleConfig:
+    max_tokens = os.getenv(f"LLM_MAX_TOKENS_{role.upper()}")
+    return RoleConfig(
+        model=os.getenv(f"LLM_MODEL_{role.upper()}", OPENROUTER_MODEL),
+        temperature=float(os.getenv(f"LLM_TEMPERATURE_{role.upper()}", "1")),
+        max_tokens=int(max_tokens) if max_tokens else None,
     )
-    print("LLM Initialized successfully!")
-except Exception as e:
-    print(f"FATAL: Error initializing the LLM: {e}")
-    raise e
+
+# Model settings per call role, e.g. LLM_MODEL_ROUTER=<small fast model>, LLM_TEMPERATURE_ROUTER=0,
+# LLM_MAX_TOKENS_ANSWER=200. Unset roles use OPENROUTER_MODEL at temperature 1.
+LLM_ROLES = ("router", "generate", "answer", "hint", "guess", "chat")
+ROLE_CONFIGS = {role: _role_config(role) for role in LLM_ROLES}
+
+_llms: dict[tuple[str | None, str], ChatOpenAI] = {}
+
+def get_llm(model: str | None = None, role: str | None = None) -> ChatOpenAI:
+    """
+    One lazily built client per (role, model), all on the shared connection pool.
+    model defaults to the role's model, a different model (fallback/hedge) keeps the role's temperature and max_tokens.
+    """
+    config = ROLE_CONFIGS.get(role)
+    model = model or (config.model if config else OPENROUTER_MODEL)
+    if (role, model) not in _llms:
+        kwargs = {}
+        if config:
+            kwargs["temperature"] = config.temperature
+            if config.max_tokens:
+                kwargs["max_tokens"] = config.max_tokens
+        _llms[(role, model)] = build_llm(model, **kwargs)
+    return _llms[(role, model)]
+
+def __getattr__(name: str):
+    # `llm` (the default client, used by testChain) is built on first access, not at import
+    if name == "llm":
+        try:
+            llm = get_llm()
+        except Exception:
+            logger.exception("Error initializing the default LLM client")
+            raise
+        logger.info("LLM initialized successfully (%s)", llm.model_name, extra={"category": "startup"})
+        globals()["llm"] = llm
+        return llm
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json": one JSON object per line, "text": the old "INFO:     message" lines (plus key=value fields)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Per category sampling, e.g. "history=0.01,llm_reply=0.1,guess_match=0.5". Categories come from
+# extra={"category": ...} (or the logger name). Warnings and errors are never dropped.
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition("=") for item in os.getenv("LOG_SAMPLE_RATES", "").split(","))
+    if name.strip() and rate
+}
+# Longer messages/fields are cut, so a conversation or an LLM reply can't turn into KBs per line
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "1000"))
+# Structured fields logged as [redacted], e.g. LOG_REDACT_FIELDS="" to see secrets while developing
+LOG_REDACT_FIELDS = {f.strip() for f in os.getenv("LOG_REDACT_FIELDS", "secret_answer,secret,api_key,authorization").split(",") if f.strip()}
+# Route uvicorn's own (access/error) loggers through the same queue
+LOG_CAPTURE_UVICORN = os.getenv("LOG_CAPTURE_UVICORN", "true").lower() == "true"
+
+_API_KEY_PATTERN = re.compile(r"sk-[A-Za-z0-9_-]{10,}")
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName", "color_message"}
+
+def _truncate(value: str) -> str:
+    if len(value) <= LOG_MAX_FIELD_CHARS:
+        return value
+    return f"{value[:LOG_MAX_FIELD_CHARS]}...[+{len(value) - LOG_MAX_FIELD_CHARS} chars]"
+
+def _clean(key: str, value):
+    if key in LOG_REDACT_FIELDS and value:
+        return "[redacted]"
+    if isinstance(value, str):
+        return _truncate(_API_KEY_PATTERN.sub("sk-[redacted]", value))
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return _truncate(str(value))
+
+def _fields(record: logging.LogRecord) -> dict:
+    """The extra={...} fields of a record, truncated/redacted."""
+    return {key: _clean(key, value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+def _message(record: logging.LogRecord) -> str:
+    # getMessage() applies the %-args here, on the listener thread, not on the request thread
+    return _truncate(_API_KEY_PATTERN.sub("sk-[redacted]", record.getMessage()))
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": _message(record),
+            **_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{record.levelname}:     {_message(record)}"
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = LOG_SAMPLE_RATES.get(getattr(record, "category", None) or record.name)
+        return rate is None or record.levelno >= logging.WARNING or random.random() < rate
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler.prepare() formats the message on the calling thread, this one only passes the
+    record on, so %-args are formatted by the listener (pass values that won't change afterwards).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+_listener: QueueListener | None = None
+
+def setup_logging() -> None:
+    """
+    Root logging for the app: records go through a queue to a background listener thread that
+    formats and writes them, so request handling never waits on log I/O.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    if LOG_CAPTURE_UVICORN:
+        # uvicorn.error/uvicorn.access propagate to "uvicorn", which writes to the queue
+        for name in ("uvicorn.error", "uvicorn.access"):
+            logging.getLogger(name).handlers = []
+            logging.getLogger(name).propagate = True
+        uvicorn_logger = logging.getLogger("uvicorn")
+        uvicorn_logger.handlers = [queue_handler]
+        uvicorn_logger.propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Flushes the queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,9 +1,21 @@
 import logging
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from src.services import mystery_item_service
-from src.utils.mystery_item_helpers import extract_last_ai_response
+from src.utils.mystery_item_prerouter import get_prerouter_stats
+from src.utils.token_budget import get_token_stats
+from src.utils.prompt_builder import get_cache_stats
+from src.utils.guess_matcher import get_guess_matcher_stats
+from src.config.http_client_config import get_http_pool_stats
+from src.services.llm_scheduler import llm_scheduler, LLMOverloadedError
+from src.services.llm_hedging import llm_hedger
+from src.utils.llm_usage_stats import get_llm_usage_stats
+from src.utils.graph_node_stats import get_node_stats
+from src.config.llm_config import ROLE_CONFIGS
+from src.services.session_coordinator import get_session_stats
+from src.services.app_startup import get_startup_stats
 import re
 import json
 
@@ -21,28 +33,60 @@ class ChatRequest(BaseModel):
 class ResetRequest(BaseModel):
     session_id: str
 
+def _overloaded(e: LLMOverloadedError) -> HTTPException:
+    logger.warning(f"--- LLM overloaded, rejecting request: {e} ---")
+    headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+    return HTTPException(status_code=503, detail="The game is busy right now, please try again in a moment.", headers=headers)
+
 @router.post("/invoke")
-def invoke_mystery_item(request: ChatRequest):
-    result = mystery_item_service.invoke_mystery_item_graph(
-        session_id=request.session_id,
-        user_message=request.message
-    )
+async def invoke_mystery_item(request: ChatRequest):
+    try:
+        result = await mystery_item_service.invoke_mystery_item_graph(
+            session_id=request.session_id,
+            user_message=request.message
+        )
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
     
-    messages = result["messages"]
     tool_name = result["tool_name"]
     secret_answer = result["secret_answer"]
-    ai_response = extract_last_ai_response(messages)
+    ai_response = result["response"]
     return {"response": ai_response, "tool_name": tool_name, "secret_answer": secret_answer}
 
+@router.post("/stream")
+async def stream_mystery_item(request: ChatRequest):
+    """Same as /invoke, but streams the reply as Server-Sent Events (token events, then a final end event with tool_name)."""
+
+    async def event_stream():
+        try:
+            async for event in mystery_item_service.stream_mystery_item_graph(
+                session_id=request.session_id,
+                user_message=request.message
+            ):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except LLMOverloadedError as e:
+            # Headers are already sent, report it in-band
+            error = _overloaded(e)
+            event = {"type": "error", "status": error.status_code, "detail": error.detail, "retry_after": e.retry_after}
+            yield f"event: error\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/reset")
-def reset_mystery_item_session(request: ResetRequest):
+async def reset_mystery_item_session(request: ResetRequest):
     """Reset the mystery item game session, clearing all backend state and starting a new game."""
     
-    result = mystery_item_service.reset_session_state(request.session_id)
-    messages = result["messages"]
+    try:
+        result = await mystery_item_service.reset_session_state(request.session_id)
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
     tool_name = result["tool_name"] 
     secret_answer = result["secret_answer"]
-    ai_response = extract_last_ai_response(messages)
+    ai_response = result["response"]
     
     return {
         "success": True, 
@@ -52,3 +96,25 @@ def reset_mystery_item_session(request: ResetRequest):
         "message": "Session reset successfully and new game started"
     }
 
+@router.get("/stats")
+async def get_mystery_item_stats():
+    """Runtime counters, e.g. how many agent LLM calls the pre-router saved."""
+    session_expiry = mystery_item_service.session_expiry  # None until the graph is built on startup
+    return {
+        "startup": get_startup_stats(),
+        "sessions": {**get_session_stats(), "expiry": session_expiry.stats() if session_expiry else {}},
+        "prerouter": get_prerouter_stats(),
+        "mystery_item_pool": mystery_item_service.mystery_item_pool.stats(),
+        "answer_cache": mystery_item_service.answer_cache.stats(),
+        "guess_matcher": get_guess_matcher_stats(),
+        "prompt_tokens": get_token_stats(),
+        "prompt_cache": get_cache_stats(),
+        "llm_http_pool": get_http_pool_stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_hedging": llm_hedger.stats(),
+        "graph_nodes": get_node_stats(),
+        "llm_roles": {
+            role: {**config._asdict(), **get_llm_usage_stats().get(role, {})}
+            for role, config in ROLE_CONFIGS.items()
+        },
+    }
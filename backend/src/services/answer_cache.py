@@ -0,0 +1,170 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import defaultdict
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from src.utils.metrics import CACHE_LOOKUPS, CACHE_STORES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Answers to the same question about the same secret don't depend on the player, share them across sessions
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# "memory": per process LRU/TTL cache, "sqlite": local file shared by the worker processes on the host
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory").lower()
+ANSWER_CACHE_MAXSIZE = int(os.getenv("ANSWER_CACHE_MAXSIZE", "10000"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_SQLITE_PATH = os.getenv("ANSWER_CACHE_SQLITE_PATH", os.path.join("data", "answer_cache.sqlite"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_LEADING_FILLERS_RE = re.compile(r"^(?:(?:ok(?:ay)?|so|um+|hm+|well|and|alright)\s+)+")
+# "is this", "is the thing" and "is it" ask the same question
+_SUBJECT_RE = re.compile(r"^(is|does|can|was|has)\s+(?:this|that|the (?:thing|secret|answer|item|object))\b")
+
+def normalize_text(text: str) -> str:
+    """Cheap lexical normalization: case, accents, punctuation, whitespace."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    text = _PUNCTUATION_RE.sub(" ", text.lower())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def normalize_question(question: str) -> str:
+    """normalize_text plus leading fillers dropped and "is this ..." folded into "is it ..."."""
+    text = _LEADING_FILLERS_RE.sub("", normalize_text(question))
+    return _SUBJECT_RE.sub(r"\1 it", text)
+
+class _SqliteStore:
+    """LRU/TTL table in a local SQLite file (WAL mode), one connection guarded by a lock."""
+
+    def __init__(self, path: str, maxsize: int, ttl: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed_at ON answers (accessed_at)")
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Evict expired entries, then the least recently used ones above maxsize
+            self.conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+class _MemoryStore:
+    """cachetools TTLCache (evicts least recently used entries when full), guarded by a lock."""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self.lock:
+            return self.cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        with self.lock:
+            self.cache[key] = value
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.cache)
+
+class AnswerCache:
+    """
+    Replies keyed by (kind, normalized secret, normalized question/guess), e.g. ("answer", "piano", "is it alive").
+    Only replies that can't depend on the rest of the conversation should be put here.
+    """
+
+    def __init__(self, backend: str = ANSWER_CACHE_BACKEND, maxsize: int = ANSWER_CACHE_MAXSIZE, ttl: int = ANSWER_CACHE_TTL_SECONDS):
+        if backend == "memory":
+            self.store = _MemoryStore(maxsize, ttl)
+        elif backend == "sqlite":
+            self.store = _SqliteStore(ANSWER_CACHE_SQLITE_PATH, maxsize, ttl)
+        else:
+            raise ValueError(f"Unknown ANSWER_CACHE_BACKEND: {backend}")
+        self.backend = backend
+
+    @staticmethod
+    def _key(kind: str, secret_answer: str, text: str) -> str | None:
+        secret = normalize_text(secret_answer)
+        text = normalize_question(text) if kind == "answer" else normalize_text(text)
+        if not secret or not text:
+            return None
+        return f"{kind}\x1f{secret}\x1f{text}"
+
+    def get(self, kind: str, secret_answer: str, text: str) -> str | None:
+        key = self._key(kind, secret_answer, text)
+        if key is None:
+            return None
+        try:
+            value = self.store.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"answer cache read failed: {e}")
+            value = None
+        CACHE_LOOKUPS.inc(cache="answer", kind=kind, result="hit" if value is not None else "miss")
+        if value is not None:
+            logger.info("--- answer cache hit (%s) ---", kind, extra={"category": "cache"})
+        return value
+
+    def set(self, kind: str, secret_answer: str, text: str, value: str) -> None:
+        key = self._key(kind, secret_answer, text)
+        if key is None or not value:
+            return
+        try:
+            self.store.set(key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"answer cache write failed: {e}")
+            return
+        CACHE_STORES.inc(cache="answer", kind=kind)
+
+    def stats(self) -> dict:
+        per_kind = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0})
+        for (cache, kind, result), count in CACHE_LOOKUPS.values().items():
+            if cache == "answer":
+                per_kind[kind]["hits" if result == "hit" else "misses"] += count
+        for (cache, kind), count in CACHE_STORES.values().items():
+            if cache == "answer":
+                per_kind[kind]["stores"] += count
+        for stats in per_kind.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return {"enabled": ANSWER_CACHE_ENABLED, "backend": self.backend, "size": len(self.store), "kinds": dict(per_kind)}
@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from dotenv import load_dotenv
+from src.config.llm_config import OPENROUTER_BASE_URL
+from src.config.http_client_config import get_async_http_client, LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS
+from src.services import mystery_item_service
+from src.services.mystery_item_pool import POOL_ENABLED
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: pre-open the LLM connections and fill the mystery item pool/answer cache before /ready passes
+STARTUP_WARMUP_ENABLED = os.getenv("STARTUP_WARMUP_ENABLED", "false").lower() == "true"
+# Connections opened to the LLM endpoint (TLS handshakes done up front), capped at the keep-alive pool size
+STARTUP_WARMUP_CONNECTIONS = min(int(os.getenv("STARTUP_WARMUP_CONNECTIONS", "4")), LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS)
+# /ready passes after this long even if the warm-up hasn't finished, the pool keeps filling in the background
+STARTUP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "60"))
+# Opening questions answered for every pooled secret during warm-up, e.g. "Is it alive?,Is it man-made?"
+STARTUP_WARMUP_QUESTIONS = [q.strip() for q in os.getenv("STARTUP_WARMUP_QUESTIONS", "").split(",") if q.strip()]
+
+_ready = asyncio.Event()
+_warmup_task: asyncio.Task | None = None
+_report: dict = {"imports_s": None, "modules_imported": None, "init_s": None, "warmup": None}
+
+def record_import_time(seconds: float, modules: int) -> None:
+    """Import time of main.py and how many modules it loaded (`python -X importtime main.py` has the per module breakdown)."""
+    _report["imports_s"] = round(seconds, 3)
+    _report["modules_imported"] = modules
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+def get_startup_stats() -> dict:
+    return {"ready": is_ready(), "warmup_enabled": STARTUP_WARMUP_ENABLED, **_report}
+
+async def start() -> None:
+    """Lifespan startup: builds the graph and the LLM clients, then runs the warm-up in the background (if enabled)."""
+    global _warmup_task
+    started = time.perf_counter()
+    mystery_item_service.init_mystery_item_service()
+    if POOL_ENABLED:
+        mystery_item_service.mystery_item_pool.ensure_started()
+    _report["init_s"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Startup: imports %ss (%s modules), graph and clients %ss",
+        _report["imports_s"], _report["modules_imported"], _report["init_s"],
+        extra={"category": "startup", **{k: v for k, v in _report.items() if k != "warmup"}, "total_modules": len(sys.modules)},
+    )
+    if not STARTUP_WARMUP_ENABLED:
+        _ready.set()
+        return
+    _warmup_task = asyncio.create_task(_run_warmup())
+
+async def stop() -> None:
+    """Lifespan shutdown: cancels an unfinished warm-up and stops the service's background tasks."""
+    if _warmup_task and not _warmup_task.done():
+        _warmup_task.cancel()
+        try:
+            await _warmup_task
+        except asyncio.CancelledError:
+            pass
+    await mystery_item_service.shutdown_mystery_item_service()
+
+async def _run_warmup() -> None:
+    started = time.perf_counter()
+    result = {"connections": 0, "pooled": 0, "answers_cached": 0, "timed_out": False}
+    _report["warmup"] = result
+    try:
+        async with asyncio.timeout(STARTUP_WARMUP_TIMEOUT_SECONDS):
+            result["connections"] = await _open_connections(STARTUP_WARMUP_CONNECTIONS)
+            if POOL_ENABLED:
+                result["pooled"] = await mystery_item_service.mystery_item_pool.wait_filled()
+                if STARTUP_WARMUP_QUESTIONS:
+                    result["answers_cached"] = await mystery_item_service.prefill_answer_cache(
+                        mystery_item_service.mystery_item_pool.pooled_secrets(), STARTUP_WARMUP_QUESTIONS
+                    )
+    except TimeoutError:
+        result["timed_out"] = True
+        logger.warning("Startup warm-up didn't finish in %ss, marking the app ready anyway", STARTUP_WARMUP_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning(f"Startup warm-up failed, marking the app ready anyway: {e}")
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info("Startup warm-up done in %ss", result["seconds"], extra={"category": "startup", **result})
+    _ready.set()
+
+async def _open_connections(count: int) -> int:
+    """
+    Sends `count` concurrent HEAD requests to the LLM endpoint, so the shared pool keeps that many
+    connections open (DNS, TCP and TLS done) for the first real calls. The status doesn't matter.
+    """
+    client = get_async_http_client()
+
+    async def open_one() -> bool:
+        try:
+            await client.head(OPENROUTER_BASE_URL)
+            return True
+        except Exception as e:
+            logger.warning(f"Startup warm-up connection failed: {e}")
+            return False
+
+    results = await asyncio.gather(*(open_one() for _ in range(count)))
+    return sum(results)
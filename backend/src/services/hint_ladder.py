@@ -0,0 +1,73 @@
+import os
+import re
+import asyncio
+import logging
+import contextvars
+from collections import OrderedDict
+from langchain_core.messages import SystemMessage
+from src.utils.mystery_item_prompts import hint_ladder_system_prompt
+from src.services.llm_scheduler import llm_scheduler, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+HINT_LADDER_ENABLED = os.getenv("HINT_LADDER_ENABLED", "true").lower() == "true"
+HINT_LADDER_SIZE = int(os.getenv("HINT_LADDER_SIZE", "5"))
+MAX_PENDING_LADDERS = 1000
+
+# thread_id -> (secret_answer, ladder), waiting to be merged into the session state on the next turn.
+# Process-local: with several workers, a turn served by another worker than the one that built the
+# ladder doesn't see it, and that game's give_hint keeps calling the LLM (same as with no ladder).
+_ready_ladders: OrderedDict[str, tuple[str, list[str]]] = OrderedDict()
+_background_tasks: set[asyncio.Task] = set()
+
+def _parse_ladder(content: str, secret_answer: str) -> list[str]:
+    hints = []
+    for line in content.splitlines():
+        hint = re.sub(r"^\s*(\d+[.)]|[-*•])\s*", "", line).strip()
+        # Drop anything that leaks the answer, the ladder is served without another check
+        if hint and secret_answer.lower() not in hint.lower():
+            hints.append(hint)
+    return hints
+
+async def _build_hint_ladder(llm, thread_id: str, secret_answer: str) -> None:
+    try:
+        prompt = [SystemMessage(content=hint_ladder_system_prompt(secret_answer, HINT_LADDER_SIZE))]
+        response = await llm_scheduler.run(lambda: llm.ainvoke(prompt), priority=BACKGROUND)
+        ladder = _parse_ladder(response.content, secret_answer)
+    except Exception as e:
+        logger.warning(f"Failed to build hint ladder for session {thread_id}: {e}")
+        return
+
+    if ladder:
+        _ready_ladders[thread_id] = (secret_answer, ladder)
+        _ready_ladders.move_to_end(thread_id)
+        while len(_ready_ladders) > MAX_PENDING_LADDERS:
+            _ready_ladders.popitem(last=False)
+        logger.info("--- hint ladder ready for session %s: %s hints ---", thread_id, len(ladder), extra={"category": "background"})
+
+def schedule_hint_ladder(llm, thread_id: str | None, secret_answer: str) -> None:
+    """
+    Precomputes the hint ladder for a new secret in the background, without blocking the current turn.
+    Called from a tool, so the task gets a fresh context instead of the turn's RunnableConfig/callbacks,
+    otherwise its LLM call would be reported to the turn's handlers and streamed after the turn ended.
+    """
+    if not HINT_LADDER_ENABLED or not thread_id:
+        return
+    _ready_ladders.pop(thread_id, None)
+    task = asyncio.get_running_loop().create_task(
+        _build_hint_ladder(llm, thread_id, secret_answer), context=contextvars.Context()
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def pop_ready_hint_ladder(thread_id: str | None, secret_answer: str | None) -> dict:
+    """
+    Returns the state update for a finished ladder that belongs to the current secret, or {}.
+    Ladders for an older secret (the game was reset meanwhile) are dropped.
+    """
+    if not thread_id or thread_id not in _ready_ladders:
+        return {}
+    ladder_secret, ladder = _ready_ladders.pop(thread_id)
+    if ladder_secret != secret_answer:
+        return {}
+    return {"hint_ladder": ladder, "hint_ladder_secret": ladder_secret, "hints_used": 0}
@@ -0,0 +1,201 @@
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, TypeVar
+import httpx
+import openai
+from dotenv import load_dotenv
+from src.services.llm_scheduler import LLMOverloadedError
+from src.utils.metrics import LLM_ATTEMPT_SECONDS, LLM_CALLS, LLM_FALLBACKS, LLM_HEDGES, percentile
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Fire a second request when the first one is slower than this percentile of recent latencies
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "4.0"))  # until there are enough samples
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Model for the hedge request, defaults to the first fallback model, else the same model
+LLM_HEDGE_MODEL = os.getenv("LLM_HEDGE_MODEL")
+# Ordered, comma separated models to use while the breaker of the ones before them is open
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+def _is_model_failure(e: BaseException) -> bool:
+    """Errors that say something about the model/provider, not about this process being overloaded."""
+    if isinstance(e, LLMOverloadedError):
+        return isinstance(e.__cause__, openai.RateLimitError)
+    return isinstance(e, (openai.APIError, httpx.HTTPError))
+
+class CircuitBreaker:
+    """
+    Opens after LLM_BREAKER_FAILURE_THRESHOLD consecutive failures, half-opens after the reset time:
+    then a single probe call is let through, its success closes the breaker and its failure reopens it.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= LLM_BREAKER_RESET_SECONDS else "open"
+
+    def allow(self) -> bool:
+        """True if a call may go to the model. When half open, only the first caller gets the probe."""
+        state = self.state
+        if state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return state == "closed"
+
+    def release_probe(self) -> None:
+        """The probe ended without saying anything about the model (cancelled, not a model error, never sent)."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= LLM_BREAKER_FAILURE_THRESHOLD:
+            self.opened_at = time.monotonic()
+
+class LLMHedger:
+    """
+    Runs an LLM call against an ordered list of models:
+    - falls back to the next model when a call fails or the model's circuit breaker is open
+    - with LLM_HEDGING_ENABLED, sends a second request (LLM_HEDGE_MODEL or the next model) when the first
+      is still running after the call type's latency percentile, keeps the first to finish and cancels the other
+    """
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = defaultdict(CircuitBreaker)
+
+    def hedge_delay(self, call_type: str) -> float:
+        samples = LLM_ATTEMPT_SECONDS.recent(call_type=call_type)
+        if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, percentile(samples, LLM_HEDGE_PERCENTILE))
+
+    def _models(self, primary_model: str) -> tuple[list[str], set[str]]:
+        """The models to try in order, and the half open ones among them this call holds the probe of."""
+        models = [primary_model] + [m for m in LLM_FALLBACK_MODELS if m != primary_model]
+        allowed, probes = [], set()
+        for model in models:
+            breaker = self._breakers[model]
+            half_open = breaker.state == "half_open"
+            if breaker.allow():
+                allowed.append(model)
+                if half_open:
+                    probes.add(model)
+        return allowed or [primary_model], probes  # everything open, keep trying the primary rather than failing outright
+
+    async def _attempt(
+        self, call_type: str, model: str, make_call: Callable[[str, bool], Awaitable[T]], silent: bool, probes: set[str],
+    ) -> T:
+        probe = model in probes
+        probes.discard(model)  # this attempt resolves the probe
+        started = time.monotonic()
+        try:
+            result = await make_call(model, silent)
+        except BaseException as e:
+            if _is_model_failure(e):
+                self._breakers[model].record_failure()
+            elif probe:
+                self._breakers[model].release_probe()
+            raise
+        self._breakers[model].record_success()
+        LLM_ATTEMPT_SECONDS.observe(time.monotonic() - started, call_type=call_type)
+        return result
+
+    async def call(self, call_type: str, primary_model: str, make_call: Callable[[str, bool], Awaitable[T]]) -> T:
+        """
+        make_call(model, silent) runs the call on the given model, silent=True for hedge requests
+        so only one of the two streams its tokens.
+        """
+        models, probes = self._models(primary_model)
+        last_error: Exception | None = None
+        try:
+            for i, model in enumerate(models):
+                if i:
+                    LLM_FALLBACKS.inc(call_type=call_type)
+                    logger.warning(f"--- {call_type}: falling back to model {model} after: {last_error} ---")
+                try:
+                    if LLM_HEDGING_ENABLED:
+                        return await self._hedged(call_type, model, models[i + 1:], make_call, probes)
+                    return await self._attempt(call_type, model, make_call, silent=False, probes=probes)
+                except Exception as e:
+                    if not _is_model_failure(e):
+                        raise
+                    last_error = e
+            raise last_error
+        finally:
+            for model in probes:  # fallback models this call never got to
+                self._breakers[model].release_probe()
+
+    async def _hedged(self, call_type: str, model: str, next_models: list[str], make_call, probes: set[str]) -> T:
+        primary = asyncio.ensure_future(self._attempt(call_type, model, make_call, silent=False, probes=probes))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(call_type))
+            if done:
+                return primary.result()
+
+            hedge_model = LLM_HEDGE_MODEL or (next_models[0] if next_models else model)
+            logger.info(f"--- {call_type}: no reply after {self.hedge_delay(call_type):.2f}s, hedging with {hedge_model} ---")
+            hedge = asyncio.ensure_future(self._attempt(call_type, hedge_model, make_call, silent=True, probes=probes))
+            pending = {primary, hedge}
+            errors = []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.inc(call_type=call_type, winner="hedge" if task is hedge else "primary")
+                        return task.result()
+                    errors.append(task.exception())
+            LLM_HEDGES.inc(call_type=call_type, winner="none")
+            raise errors[0]
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        """Per call type calls (as counted by the service), hedges sent and who won them, and fallbacks."""
+        per_call_type = defaultdict(lambda: {"calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "fallbacks": 0})
+        for (_, call_type, _), calls in LLM_CALLS.values().items():
+            per_call_type[call_type]["calls"] += calls
+        for (call_type, winner), count in LLM_HEDGES.values().items():
+            per_call_type[call_type]["hedged"] += count
+            if winner != "none":
+                per_call_type[call_type][f"{winner}_wins"] += count
+        for (call_type,), count in LLM_FALLBACKS.values().items():
+            per_call_type[call_type]["fallbacks"] += count
+        for call_type, stats in per_call_type.items():
+            stats["hedge_rate"] = stats["hedged"] / stats["calls"] if stats["calls"] else 0.0
+            stats["hedge_delay_s"] = round(self.hedge_delay(call_type), 3)
+        return {
+            "hedging_enabled": LLM_HEDGING_ENABLED,
+            "fallback_models": LLM_FALLBACK_MODELS,
+            "breakers": {model: {"state": b.state, "failures": b.failures} for model, b in self._breakers.items()},
+            "calls": dict(per_call_type),
+        }
+
+llm_hedger = LLMHedger()
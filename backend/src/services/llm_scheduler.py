@@ -0,0 +1,233 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, TypeVar
+import openai
+from dotenv import load_dotenv
+from src.utils.metrics import LLM_QUEUE_WAIT_SECONDS, LLM_RETRIES, LLM_REJECTED
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Request rate and burst sent to the provider (0 = unlimited)
+LLM_RATE_LIMIT_RPS = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "5"))
+# Prompt tokens per minute sent to the provider (0 = unlimited)
+LLM_RATE_LIMIT_TPM = int(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Calls waiting for a slot, beyond that new calls are rejected right away. Background calls get a smaller share.
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "64"))
+LLM_QUEUE_MAX_BACKGROUND = int(os.getenv("LLM_QUEUE_MAX_BACKGROUND", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+# Retries happen here (the clients use max_retries=0) so a 429 pauses every caller instead of each retrying on its own
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_DEFAULT_RETRY_AFTER = float(os.getenv("LLM_DEFAULT_RETRY_AFTER", "2"))
+
+# Priorities, lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_RETRYABLE_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+class LLMOverloadedError(Exception):
+    """Raised when an LLM call is rejected by admission control or the provider keeps rate limiting."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # per second, 0 = unlimited
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        if self.rate:
+            self._refill(now)
+            self.tokens -= min(amount, self.capacity)
+
+def _retry_after_seconds(e: openai.APIStatusError) -> float:
+    headers = e.response.headers if e.response is not None else {}
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    reset = headers.get("x-ratelimit-reset")  # OpenRouter: epoch milliseconds
+    if reset:
+        try:
+            return max(0.0, int(reset) / 1000 - time.time())
+        except ValueError:
+            pass
+    return LLM_DEFAULT_RETRY_AFTER
+
+class LLMScheduler:
+    """
+    Central gate for all LLM calls: a priority queue (interactive turns before background pool/hint refills)
+    dispatched under request/token buckets and a concurrency cap. A 429 pauses dispatching for
+    everyone until its Retry-After, and calls are rejected fast with LLMOverloadedError when the queue is full.
+    """
+
+    def __init__(self):
+        self._requests = _TokenBucket(LLM_RATE_LIMIT_RPS, LLM_RATE_LIMIT_BURST)
+        self._tokens = _TokenBucket(LLM_RATE_LIMIT_TPM / 60, LLM_RATE_LIMIT_TPM)
+        self._heap: list[tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._paused_until = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "queue_timeouts": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "queue_wait_ms_total": 0.0,
+            "dispatched": 0,
+        }
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._dispatcher and not self._dispatcher.done():
+            return
+        # First call, or a new event loop (e.g. a fresh asyncio.run), the old queue died with the old loop
+        self._loop = loop
+        self._heap = []
+        self._active = 0
+        self._wakeup = asyncio.Event()
+        self._dispatcher = loop.create_task(self._dispatch_loop())
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            while self._heap and self._heap[0][3].done():
+                heapq.heappop(self._heap)  # gave up waiting
+            if self._heap and self._active < LLM_MAX_CONCURRENCY:
+                now = time.monotonic()
+                tokens = self._heap[0][2]
+                wait = max(self._paused_until - now, self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+                if wait <= 0:
+                    _, _, tokens, future = heapq.heappop(self._heap)
+                    self._requests.take(1, now)
+                    self._tokens.take(tokens, now)
+                    self._active += 1
+                    future.set_result(None)
+                    continue
+                timeout = wait
+            # call_later instead of wait_for, which can swallow the task's cancellation on 3.11
+            timer = self._loop.call_later(timeout, self._wakeup.set) if timeout is not None else None
+            try:
+                await self._wakeup.wait()
+            finally:
+                if timer:
+                    timer.cancel()
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        self._ensure_started()
+        limit = LLM_QUEUE_MAX if priority == INTERACTIVE else LLM_QUEUE_MAX_BACKGROUND
+        queued = sum(1 for entry in self._heap if entry[0] == priority and not entry[3].done())
+        if queued >= limit:
+            self._stats["rejected"] += 1
+            LLM_REJECTED.inc(reason="queue_full")
+            raise LLMOverloadedError(
+                f"LLM queue is full ({queued} {_PRIORITY_NAMES[priority]} calls waiting)",
+                retry_after=max(1.0, self._paused_until - time.monotonic()),
+            )
+
+        future = self._loop.create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), tokens, future))
+        self._wakeup.set()
+        started = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=LLM_QUEUE_TIMEOUT)
+        except asyncio.CancelledError:
+            if future.done():
+                self._release()  # the slot was granted just before the caller went away
+            else:
+                future.cancel()
+            raise
+        if not future.done():
+            future.cancel()
+            self._stats["queue_timeouts"] += 1
+            LLM_REJECTED.inc(reason="queue_timeout")
+            raise LLMOverloadedError(f"Waited more than {LLM_QUEUE_TIMEOUT}s for an LLM slot", retry_after=LLM_QUEUE_TIMEOUT)
+        waited = time.monotonic() - started
+        self._stats["dispatched"] += 1
+        self._stats["queue_wait_ms_total"] += waited * 1000
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, priority=_PRIORITY_NAMES[priority])
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._wakeup.set()
+
+    def _pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._wakeup.set()
+
+    async def run(self, call: Callable[[], Awaitable[T]], priority: int = INTERACTIVE, tokens: int = 0) -> T:
+        """Runs call() once a slot is free under the rate limits, retrying 429s/transient errors."""
+        self._stats["submitted"] += 1
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await self._acquire(priority, tokens)
+            try:
+                return await call()
+            except openai.RateLimitError as e:
+                self._stats["rate_limited"] += 1
+                retry_after = _retry_after_seconds(e)
+                logger.warning(f"--- LLM rate limited, pausing all calls for {retry_after:.1f}s ---")
+                self._pause(retry_after)
+                if attempt == LLM_MAX_RETRIES:
+                    LLM_REJECTED.inc(reason="rate_limited")
+                    raise LLMOverloadedError("LLM provider is rate limiting requests", retry_after=retry_after) from e
+                LLM_RETRIES.inc(reason="rate_limited")
+            except _RETRYABLE_ERRORS as e:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                logger.warning(f"LLM call failed ({type(e).__name__}), retrying: {e}")
+                LLM_RETRIES.inc(reason=type(e).__name__)
+                await asyncio.sleep(min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5))
+            finally:
+                self._release()
+            self._stats["retries"] += 1
+
+    def stats(self) -> dict:
+        queued = [entry for entry in self._heap if not entry[3].done()]
+        dispatched = self._stats["dispatched"]
+        return {
+            **{k: v for k, v in self._stats.items() if k != "queue_wait_ms_total"},
+            "avg_queue_wait_ms": self._stats["queue_wait_ms_total"] / dispatched if dispatched else 0.0,
+            "active": self._active,
+            "queued": {name: sum(1 for entry in queued if entry[0] == priority) for priority, name in _PRIORITY_NAMES.items()},
+            "paused_for_s": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+llm_scheduler = LLMScheduler()
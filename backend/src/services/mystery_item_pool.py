@@ -0,0 +1,144 @@
+import os
+import asyncio
+import random
+import contextvars
+import logging
+from collections import deque
+from typing import Callable
+from langchain_core.messages import SystemMessage
+from src.utils.mystery_item_prompts import TOPICS, generate_mystery_item_system_prompt
+from src.services.llm_scheduler import llm_scheduler, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: every worker fills the pool (a secret per topic and slot) at startup, a burst of background LLM calls
+# that can use up a free-tier rate limit before the first player shows up
+POOL_ENABLED = os.getenv("MYSTERY_ITEM_POOL_ENABLED", "false").lower() == "true"
+POOL_LOW_WATERMARK = int(os.getenv("MYSTERY_ITEM_POOL_LOW_WATERMARK", "1"))
+POOL_HIGH_WATERMARK = int(os.getenv("MYSTERY_ITEM_POOL_HIGH_WATERMARK", "3"))
+POOL_RECENT_SIZE = int(os.getenv("MYSTERY_ITEM_POOL_RECENT_SIZE", "100"))
+
+def _normalize(secret: str) -> str:
+    return " ".join(secret.lower().strip(" .!\"'").split())
+
+class MysteryItemPool:
+    """
+    Bounded pool of pre-generated secret answers, one queue per topic.
+    A background task refills any topic below the low watermark up to the high watermark,
+    skipping secrets that are already pooled or were recently handed out.
+    get_llm builds (or returns) the LLM client when the first secret is generated, not at construction.
+    """
+
+    def __init__(self, get_llm: Callable, low_watermark: int = POOL_LOW_WATERMARK, high_watermark: int = POOL_HIGH_WATERMARK,
+                 recent_size: int = POOL_RECENT_SIZE):
+        self.get_llm = get_llm
+        self.low_watermark = low_watermark
+        self.high_watermark = max(high_watermark, low_watermark)
+        self._items: dict[str, deque[str]] = {topic: deque() for topic in TOPICS}
+        self._recent: deque[str] = deque(maxlen=recent_size)
+        self._refill_needed: asyncio.Event | None = None
+        self._pass_done: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stats = {"hits": 0, "misses": 0, "generated": 0, "duplicates": 0, "errors": 0}
+
+    def pop(self) -> str | None:
+        """Returns a pre-generated secret from a random non-empty topic, or None if the pool is empty."""
+        self.ensure_started()
+        topics = [topic for topic, items in self._items.items() if items]
+        if not topics:
+            self._stats["misses"] += 1
+            self._refill_needed.set()
+            return None
+
+        topic = random.choice(topics)
+        secret = self._items[topic].popleft()
+        self._recent.append(_normalize(secret))
+        self._stats["hits"] += 1
+        if len(self._items[topic]) < self.low_watermark:
+            self._refill_needed.set()
+        return secret
+
+    def remember(self, secret: str) -> None:
+        """Records a secret generated outside the pool so the pool won't hand it out again soon."""
+        self._recent.append(_normalize(secret))
+
+    def pooled_secrets(self) -> list[str]:
+        return [item for items in self._items.values() for item in items]
+
+    async def wait_filled(self) -> int:
+        """Starts the replenisher and waits for its current refill pass to finish (startup warm-up). Returns the pooled count."""
+        self.ensure_started()
+        await self._pass_done.wait()
+        return sum(len(items) for items in self._items.values())
+
+    def ensure_started(self) -> None:
+        """
+        Starts the replenisher on the running event loop (no-op if it's already running).
+        The app's startup starts it, a first pop() inside a graph run would otherwise hand the run's
+        RunnableConfig/callbacks (contextvars) to every later refill, so it always gets a fresh context.
+        """
+        if self._task and not self._task.done():
+            return
+        self._refill_needed = asyncio.Event()
+        self._refill_needed.set()
+        self._pass_done = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._replenish_loop(), context=contextvars.Context())
+        logger.info("Mystery item pool replenisher started")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _is_duplicate(self, secret: str) -> bool:
+        normalized = _normalize(secret)
+        if normalized in self._recent:
+            return True
+        return any(normalized == _normalize(item) for items in self._items.values() for item in items)
+
+    async def _generate(self, topic: str) -> str:
+        system_message = SystemMessage(content=generate_mystery_item_system_prompt(topic))
+        response = await llm_scheduler.run(lambda: self.get_llm().ainvoke([system_message]), priority=BACKGROUND)
+        return response.content.strip()
+
+    async def _replenish_loop(self) -> None:
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            self._pass_done.clear()
+
+            for topic, items in self._items.items():
+                if len(items) >= self.low_watermark:
+                    continue
+                attempts = 0
+                while len(items) < self.high_watermark and attempts < self.high_watermark * 2:
+                    attempts += 1
+                    try:
+                        secret = await self._generate(topic)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self._stats["errors"] += 1
+                        logger.warning(f"Mystery item pool refill failed for topic '{topic}': {e}")
+                        await asyncio.sleep(5)
+                        break
+                    if not secret or self._is_duplicate(secret):
+                        self._stats["duplicates"] += 1
+                        continue
+                    items.append(secret)
+                    self._stats["generated"] += 1
+            self._pass_done.set()
+
+    def stats(self) -> dict:
+        pooled = sum(len(items) for items in self._items.values())
+        served = self._stats["hits"] + self._stats["misses"]
+        return {
+            "enabled": POOL_ENABLED,
+            "pooled": pooled,
+            "hit_rate": self._stats["hits"] / served if served else 0.0,
+            **self._stats,
+        }
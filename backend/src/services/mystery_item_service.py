@@ -2,247 +2,684 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
+import asyncio
 import logging
 import time
-from src.config.llm_config import llm
-from typing import Annotated, TypedDict, Sequence 
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, AIMessage
-from langgraph.graph.message import add_messages
+import uuid
+from src.config.llm_config import get_llm, ROLE_CONFIGS
+from typing import Annotated, AsyncIterator, Callable, Literal, TypedDict, Sequence 
+from pydantic import BaseModel, Field
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, AIMessage, AIMessageChunk, RemoveMessage
+from langgraph.graph.message import add_messages, REMOVE_ALL_MESSAGES
 
 from langgraph.graph import StateGraph, END
-from langchain_core.tools import tool
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.tools import tool, InjectedToolCallId
+from langgraph.prebuilt import ToolNode, InjectedState
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
+from langgraph.types import Command
+from src.config.checkpointer_config import build_checkpointer
 from src.utils.mystery_item_helpers import (
     format_history_for_prompt, 
-    extract_last_tool_call,
-    trim_message_history,
-    schedule_cleanup,
-    extract_secret_from_messages
+    migrate_messages_to_turns,
+    extract_secret_from_messages,
+    FALLBACK_RESPONSE
 )
+from src.utils.token_budget import count_prompt_tokens
+from src.utils.prompt_builder import build_prompt, history_block
+from src.utils.llm_usage_stats import record_llm_usage
+from src.utils.graph_node_stats import NodeTimer
+from src.utils.metrics import (
+    span,
+    traced_node,
+    instrumented_tool,
+    TRACING_ENABLED,
+    LLM_CALLS,
+)
+from src.utils.mystery_item_state import GameTurn, append_turns, append_history_lines, render_turn_lines
+from src.services.mystery_item_pool import MysteryItemPool, POOL_ENABLED
+from src.services.hint_ladder import schedule_hint_ladder, pop_ready_hint_ladder
+from src.services.answer_cache import AnswerCache, ANSWER_CACHE_ENABLED
+from src.services.llm_scheduler import llm_scheduler, LLMOverloadedError, INTERACTIVE, BACKGROUND
+from src.services.llm_hedging import llm_hedger
+from src.services.session_coordinator import run_coalesced, session_lock
+from src.services.session_expiry import SessionExpiryIndex
+from src.utils.guess_matcher import (
+    match_guess,
+    local_guess_reply,
+    log_guess_decision,
+    GUESS_MATCHER_ENABLED,
+)
+from src.utils.mystery_item_prerouter import pre_route, build_tool_args, is_plain_hint_request, PreRouteDecision
 from src.utils.mystery_item_prompts import (
     generate_mystery_item_system_prompt,
     general_chat_system_prompt,
     check_guess_system_prompt,
     answer_question_system_prompt,
     game_agent_system_prompt,
-    give_hint_system_prompt
+    give_hint_system_prompt,
+    fused_turn_system_prompt
 )
 
 logger = logging.getLogger(__name__)
 
-memory = MemorySaver()
+mystery_item_pool = MysteryItemPool(lambda: get_llm(role="generate"))
+answer_cache = AnswerCache()
+
+# "standard": agent LLM picks a tool, then the tool makes its own LLM call (two round-trips per turn)
+# "fused": one structured-output call returns both the action and the reply, falls back to "standard" if it fails
+GRAPH_MODE = os.getenv("MYSTERY_ITEM_GRAPH_MODE", "standard").lower()
+
+# Tools whose LLM output is shown to the user as-is, so it's safe to stream token by token
+STREAMABLE_TOOLS = {"answer_question", "give_hint", "check_guess", "general_chat"}
+GUESS_VERDICT_PREFIXES = ("CORRECT:", "INCORRECT:")
 
 class AgentState(TypedDict):
     secret_answer: str | None = None
     last_activity: float
+    # Only the current turn's messages, record_turn folds them into `turns` and clears them
     messages: Annotated[Sequence[BaseMessage], add_messages]
+    turns: Annotated[list[GameTurn], append_turns]
+    history_lines: Annotated[list[str], append_history_lines]  # pre-rendered prompt history, last 20 lines
+    tool_name: str | None
+    last_response: str | None
+    questions_asked: int
+    guesses_made: int
+    hint_ladder: list[str]  # precomputed hints for hint_ladder_secret, vague to specific
+    hint_ladder_secret: str | None
+    hints_used: int
     
 # tools ------------------------------------------------------------
+def _tool_result(tool_name: str, tool_call_id: str, reply: str, **state_update) -> Command:
+    '''
+    Writes a tool's reply (plus any other state fields, e.g. secret_answer) straight into the graph state,
+    so nothing downstream has to parse it back out of the ToolMessage.
+    '''
+    return Command(update={
+        "tool_name": tool_name,
+        "last_response": reply,
+        "messages": [ToolMessage(content=reply, name=tool_name, tool_call_id=tool_call_id)],
+        **state_update,
+    })
+
+# kind -> builds the runnable on top of a model's client, so fallback/hedge models get the same tools/schema
+_RUNNABLE_KINDS: dict[str, Callable] = {"plain": lambda model_llm: model_llm}
+_runnables: dict[tuple[str, str, str], Runnable] = {}
+# Call types that aren't a role themselves, the fused call writes the answers
+_CALL_TYPE_ROLES = {"fused": "answer"}
+
+def _runnable(kind: str, role: str, model: str) -> Runnable:
+    if (kind, role, model) not in _runnables:
+        _runnables[(kind, role, model)] = _RUNNABLE_KINDS[kind](get_llm(model, role=role))
+    return _runnables[(kind, role, model)]
+
+async def _call_llm(kind: str, prompt: list[BaseMessage], call_type: str, priority: int = INTERACTIVE):
+    """
+    Every LLM call of a turn goes through here: prompt token stats, the role's model with
+    fallback/hedging, the LLM scheduler, prompt cache and per-role usage stats.
+    """
+    tokens = count_prompt_tokens(call_type, prompt)
+    role = _CALL_TYPE_ROLES.get(call_type, call_type)
+    model = ROLE_CONFIGS[role].model
+
+    async def attempt(model: str, silent: bool):
+        runnable = _runnable(kind, role, model)
+        # A hedge request runs without the turn's callbacks, so its tokens don't get mixed into the stream
+        config = {"callbacks": []} if silent else None
+        return await llm_scheduler.run(lambda: runnable.ainvoke(prompt, config=config), priority=priority, tokens=tokens)
+
+    started = time.perf_counter()
+    with span(f"llm.{call_type}", role=role, model=model, prompt_tokens=tokens):
+        try:
+            response = await llm_hedger.call(call_type, model, attempt)
+        except Exception as e:
+            LLM_CALLS.inc(role=role, call_type=call_type, outcome="overloaded" if isinstance(e, LLMOverloadedError) else "error")
+            raise
+    seconds = time.perf_counter() - started
+    message = response["raw"] if isinstance(response, dict) else response  # structured output with include_raw
+    record_llm_usage(role, call_type, model, seconds, message)
+    return response
+
 @tool
-def general_chat(user_message: str, history: str) -> dict:
+@instrumented_tool
+async def general_chat(
+    user_message: str,
+    state: Annotated[dict, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
     '''Use this tool for chat messages unrelated to the game.'''
     
-    system_message = SystemMessage(content=general_chat_system_prompt + f"""
-    
-    Here's the conversation history for your reference:
-    {history}
-    **End of conversation history**
-    
-    Here is the user's current message:
-    {user_message}
-    """)
+    history = format_history_for_prompt(state.get("history_lines") or [], "chat")
+    prompt = build_prompt(
+        general_chat_system_prompt,
+        turn_tail=f"""{history_block(history)}
+
+Here is the user's current message:
+{user_message}""",
+    )
  
     logger.info(f"--- general_chat_tool ---")
-    prompt = [system_message, HumanMessage(content=user_message)]
-    response = llm.invoke(prompt)
+    response = await _call_llm("plain", prompt, "chat")
     # logger.info(f"--- general_chat_tool response.content ---") 
     # logger.info(f"response.content: {response.content}")
-    return {"messages": [response]}
+    return _tool_result("general_chat", tool_call_id, response.content.strip())
     
 @tool
-def generate_mystery_item() -> dict:
+@instrumented_tool
+async def generate_mystery_item(config: RunnableConfig, tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
     '''Use this tool to generate a secret answer for a guess-the-thing game.'''
     
-    # Generate system prompt with random topic and letter to force variety
-    generated_mystery_prompt = generate_mystery_item_system_prompt()
-    system_message = SystemMessage(content=generated_mystery_prompt)
-    
-    response = llm.invoke([system_message])
+    # Pre-generated secrets don't depend on the user, serve one from the pool when available
+    secret_answer = mystery_item_pool.pop() if POOL_ENABLED else None
+    if secret_answer is None:
+        # Generate system prompt with random topic and letter to force variety
+        generated_mystery_prompt = generate_mystery_item_system_prompt()
+        system_message = SystemMessage(content=generated_mystery_prompt)
+        
+        response = await _call_llm("plain", [system_message], "generate")
+        secret_answer = response.content.strip()
+        if POOL_ENABLED:
+            mystery_item_pool.remember(secret_answer)
     logger.info(f"--- generate_mystery_item_tool ---")
-    logger.info(f"secret_answer: {response.content}")
-    return {
-        "secret_answer": response.content.strip(),
-        "messages": [AIMessage(content="I've thought of a new secret answer! You can start asking questions or try to guess what it is.")]
-    }
+    logger.info("secret_answer generated", extra={"category": "turn", "secret_answer": secret_answer})  # redacted unless LOG_REDACT_FIELDS says otherwise
+    schedule_hint_ladder(get_llm(role="hint"), config.get("configurable", {}).get("thread_id"), secret_answer)
+    return _tool_result(
+        "generate_mystery_item",
+        tool_call_id,
+        "I've thought of a new secret answer! You can start asking questions or try to guess what it is.",
+        secret_answer=secret_answer,
+        questions_asked=0,
+        guesses_made=0,
+    )
 
 @tool
-def check_guess(user_guess: str, secret_answer: str, history: str) -> dict:
+@instrumented_tool
+async def check_guess(
+    user_guess: str,
+    secret_answer: str,
+    state: Annotated[dict, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
     '''Use this tool to check if the user's guess is correct.'''
     
-    system_message = SystemMessage(content=check_guess_system_prompt + f"""
-    Here's the conversation history for your reference:
-    {history}
-    **End of conversation history**
-    
-    Here are the secret answer and user's guess, respond accordingly:
-    The secret answer is: {secret_answer}.
-    The user's guess is: {user_guess}.
-    """)
+    # A guess that is the answer (exact, plural, spacing, alias) doesn't need the LLM, everything else does
+    match = match_guess(user_guess, secret_answer)
+    if GUESS_MATCHER_ENABLED and match.verdict == "correct":
+        log_guess_decision(user_guess, secret_answer, match, "matcher", match.verdict)
+        return _guess_result(tool_call_id, local_guess_reply(match, secret_answer))
+
+    # Verdicts for the same guess of the same secret are shared across sessions, per hint stage: the
+    # INCORRECT replies get more helpful with the guesses made, a stage 0 reply mustn't answer a 5th guess
+    cache_text = f"{_guess_hint_stage(state.get('guesses_made') or 0)} {user_guess}"
+    cached = answer_cache.get("guess", secret_answer, cache_text) if ANSWER_CACHE_ENABLED else None
+    if cached is not None:
+        log_guess_decision(user_guess, secret_answer, match, "cache", _guess_verdict(cached))
+        return _guess_result(tool_call_id, cached)
+
+    history = format_history_for_prompt(state.get("history_lines") or [], "guess")
+    prompt = build_prompt(
+        check_guess_system_prompt,
+        session_block=f"The secret answer is: {secret_answer}.",
+        turn_tail=f"""{history_block(history)}
+
+Here is the user's guess, respond accordingly:
+The user's guess is: {user_guess}.""",
+    )
     
-    response = llm.invoke([system_message])
+    response = await _call_llm("plain", prompt, "guess")
     logger.info(f"--- check_guess ---")
-    logger.info(response.content)
-    
-    is_correct = response.content.upper().startswith("CORRECT:")
+    logger.debug("check_guess reply: %s", response.content, extra={"category": "llm_reply"})
+    log_guess_decision(user_guess, secret_answer, match, "llm", _guess_verdict(response.content))
+    if ANSWER_CACHE_ENABLED and response.content.strip().upper().startswith(GUESS_VERDICT_PREFIXES):
+        answer_cache.set("guess", secret_answer, cache_text, response.content.strip())
+    return _guess_result(tool_call_id, response.content)
+
+def _guess_hint_stage(guesses_made: int) -> int:
+    """The check_guess prompt's hint stages: gentle (guesses 1-2), obvious (3-4), almost gives it away (5+)."""
+    return min(guesses_made // 2, 2)
+
+def _guess_verdict(reply: str) -> str | None:
+    head = reply.strip().upper()
+    if head.startswith("CORRECT:"):
+        return "correct"
+    if head.startswith("INCORRECT:"):
+        return "incorrect"
+    return None
+
+def _guess_result(tool_call_id: str, verdict: str) -> Command:
+    """Turns a "CORRECT: ..."/"INCORRECT: ..." reply into the check_guess tool result."""
+    is_correct = _guess_verdict(verdict) == "correct"
     
-    message_content = response.content.replace("INCORRECT:", "").replace("CORRECT:", "").strip()
-    message = AIMessage(content=message_content)
+    message_content = verdict.replace("INCORRECT:", "").replace("CORRECT:", "").strip()
         
     if is_correct:
-        return {
-            "secret_answer": None,
-            "messages": [message]
-        }
+        return _tool_result("check_guess", tool_call_id, message_content, secret_answer=None)
     else:
-        return {
-            "messages": [message]
-        }
+        return _tool_result("check_guess", tool_call_id, message_content)
 
 @tool
-def answer_question(user_question: str, secret_answer: str, history: str) -> dict:
+@instrumented_tool
+async def answer_question(
+    user_question: str,
+    secret_answer: str,
+    state: Annotated[dict, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
     '''Use this tool to answer questions about the secret answer without revealing what it is.'''
     
-    system_message = SystemMessage(content=answer_question_system_prompt + f"""
-    Here's the conversation history for your reference:
-    {history}
-    **End of conversation history**
-    
-    Here are the secret answer and user's question, respond accordingly:
-    The secret answer is: {secret_answer}.
-    The user's question is: {user_question}.
-    """)
+    cached = answer_cache.get("answer", secret_answer, user_question) if ANSWER_CACHE_ENABLED else None
+    if cached is not None:
+        return _tool_result("answer_question", tool_call_id, cached)
+
+    prompt = _answer_question_prompt(secret_answer, user_question, state.get("history_lines") or [])
     
-    response = llm.invoke([system_message])
+    response = await _call_llm("plain", prompt, "answer")
     logger.info(f"--- answer_question ---")
     # logger.info(f"user_question: {user_question}")
     # logger.info(f"response.content: {response.content}")
-    return {"messages": [response]}
+    if ANSWER_CACHE_ENABLED:
+        answer_cache.set("answer", secret_answer, user_question, response.content.strip())
+    return _tool_result("answer_question", tool_call_id, response.content.strip())
+
+def _answer_question_prompt(secret_answer: str, user_question: str, history_lines: list[str]) -> list[BaseMessage]:
+    history = format_history_for_prompt(history_lines, "answer")
+    return build_prompt(
+        answer_question_system_prompt,
+        session_block=f"The secret answer is: {secret_answer}.",
+        turn_tail=f"""{history_block(history)}
+
+Here is the user's question, respond accordingly:
+The user's question is: {user_question}.""",
+    )
+
+async def prefill_answer_cache(secret_answers: Sequence[str], questions: Sequence[str], concurrency: int = 4) -> int:
+    """
+    Answers common opening questions for the given secrets ahead of time (startup warm-up),
+    so the first answer_question of a pooled game is a cache hit. Returns the number of answers cached.
+    concurrency stays below the scheduler's background queue, which the pool and hint ladders share.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prefill(secret_answer: str, question: str) -> bool:
+        if answer_cache.get("answer", secret_answer, question) is not None:
+            return False
+        prompt = _answer_question_prompt(secret_answer, question, [])
+        async with semaphore:
+            response = await _call_llm("plain", prompt, "answer", priority=BACKGROUND)
+        answer_cache.set("answer", secret_answer, question, response.content.strip())
+        return True
+
+    results = await asyncio.gather(
+        *(prefill(secret_answer, question) for secret_answer in secret_answers for question in questions),
+        return_exceptions=True,
+    )
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        logger.warning("Answer cache prefill: %d of %d answers failed, e.g. %s", len(errors), len(results), errors[0])
+    return sum(1 for r in results if r is True)
 
 @tool
-def give_hint(user_message: str, secret_answer: str, history: str) -> dict:
+@instrumented_tool
+async def give_hint(
+    user_message: str,
+    secret_answer: str,
+    state: Annotated[dict, InjectedState],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
     '''
     Use this tool to give hints about the secret answer without revealing what it is.
     Use it if the user is asking for a hint, or is frustrated, or has asked 4+ questions.
     '''
     
-    system_message = SystemMessage(content=give_hint_system_prompt + f"""
-    Here's the conversation history for your reference:
-    {history}
-    **End of conversation history**
+    # Serve the next precomputed hint when the user just asked for one, no LLM call needed
+    hint_ladder = state.get("hint_ladder") or []
+    hints_used = state.get("hints_used") or 0
+    if (
+        state.get("hint_ladder_secret") == secret_answer
+        and hints_used < len(hint_ladder)
+        and is_plain_hint_request(user_message)
+    ):
+        logger.info(f"--- give_hint (ladder {hints_used + 1}/{len(hint_ladder)}) ---")
+        return _tool_result("give_hint", tool_call_id, hint_ladder[hints_used], hints_used=hints_used + 1)
     
-    Here are the secret answer and user's message, respond accordingly:
-    The secret answer is: {secret_answer}.
-    The user's message is: {user_message}.
-    """)
+    history = format_history_for_prompt(state.get("history_lines") or [], "hint")
+    session_block = f"The secret answer is: {secret_answer}."
+    if hint_ladder and state.get("hint_ladder_secret") == secret_answer:
+        session_block += "\nPrepared hints for this answer, from vague to specific:\n" + "\n".join(hint_ladder)
+    prompt = build_prompt(
+        give_hint_system_prompt,
+        session_block=session_block,
+        turn_tail=f"""{history_block(history)}
+
+Here is the user's message, respond accordingly:
+The user's message is: {user_message}.""",
+    )
     
-    response = llm.invoke([system_message])
+    response = await _call_llm("plain", prompt, "hint")
     logger.info(f"--- give_hint ---")
-    logger.info(f"response.content: {response.content}")
+    logger.debug("response.content: %s", response.content, extra={"category": "llm_reply"})
     
-    return {"messages": [response]}
+    return _tool_result("give_hint", tool_call_id, response.content.strip())
 
 @tool
-def reset_game(secret_answer: str | None = None) -> dict:
+@instrumented_tool
+async def reset_game(tool_call_id: Annotated[str, InjectedToolCallId], secret_answer: str | None = None) -> Command:
     """Call this tool when the user wants to play again or start a new game, but wants to continue the conversation."""
     
     logger.info(f"--- reset_game ---")
-    
+    return _tool_result("reset_game", tool_call_id, _reset_game_message(secret_answer), secret_answer=None)
+
+def _reset_game_message(secret_answer: str | None) -> str:
     if secret_answer and secret_answer is not None:
-        message = f"No problem, the secret answer was '{secret_answer}'. I've cleared the board. Let me know when you're ready to play again."
-    else:
-        message = "Sure, just let me know when you're ready to play again."
-        
-    return {
-        "secret_answer": None,
-        "messages": [AIMessage(content=message)]
-    }
+        return f"No problem, the secret answer was '{secret_answer}'. I've cleared the board. Let me know when you're ready to play again."
+    return "Sure, just let me know when you're ready to play again."
 
 tools = [generate_mystery_item, check_guess, answer_question, general_chat, reset_game, give_hint]
-tool_node = ToolNode(tools)
-llm_w_tools = llm.bind_tools(tools, tool_choice="any") # force it to choose a tool
-# END tools ------------------------------------------------------------
+def _handle_tool_error(e: Exception) -> str:
+    # Overload must reach the API as a 503 instead of becoming an error ToolMessage
+    if isinstance(e, LLMOverloadedError):
+        raise e
+    return TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e))
+
+tool_node = ToolNode(tools, handle_tool_errors=_handle_tool_error)
 
-# Initialize cleanup scheduler
-schedule_cleanup(memory)
+@traced_node("tool_node")
+async def traced_tool_node(state: AgentState, config: RunnableConfig):
+    '''tool_node inside a span, so the tool spans nest under their graph node.'''
+    return await tool_node.ainvoke(state, config)
 
-def node_game_agent(state: AgentState) -> AgentState:
+_RUNNABLE_KINDS["tools"] = lambda model_llm: model_llm.bind_tools(tools, tool_choice="any") # force it to choose a tool
+# END tools ------------------------------------------------------------
+
+@traced_node("agent")
+async def node_game_agent(state: AgentState, config: RunnableConfig) -> AgentState:
     '''
     This node is responsible for the game logic, it only calls tools.
     '''
     messages = state["messages"]
     last_message = messages[-1] if messages else None
-    system_message_content = game_agent_system_prompt
+    # Per-turn instructions go in the tail, game_agent_system_prompt stays a byte-identical prefix
+    turn_instructions = ""
 
-    # Check for secret_answer once - either in state or extract from messages
-    secret_answer = state.get("secret_answer")
-    if not secret_answer:
-        secret_answer = extract_secret_from_messages(state["messages"])
+    secret_answer, history_lines, migration_update = _load_turn_context(state)
 
     if last_message and last_message.content == "page_load":
         if not secret_answer:
             logger.info("--- page_load: no secret answer, instructing agent to generate one ---")
-            system_message_content += "\nImportant:The user has just loaded the page and there is no secret answer. You MUST use the `generate_mystery_item` tool to create a new secret answer now."
+            turn_instructions = "Important:The user has just loaded the page and there is no secret answer. You MUST use the `generate_mystery_item` tool to create a new secret answer now."
         else:
             logger.info("--- page_load: secret answer exists, instructing agent to remind user ---")
-            system_message_content += "\nImportant: The user has just loaded the page and a game is already in progress. You MUST use the `general_chat` tool to remind them that there's an ongoing game."
+            turn_instructions = "Important: The user has just loaded the page and a game is already in progress. You MUST use the `general_chat` tool to remind them that there's an ongoing game."
             
-    # Trim message history and update last_activity
-    trimmed_messages = trim_message_history(state["messages"])
+    # Update last_activity
     current_time = time.time()
     
-    history = format_history_for_prompt(trimmed_messages)
-    
-    system_message_content += f"""
+    history = format_history_for_prompt(history_lines, "router")
 
-    Here is the conversation history for your reference:
-    {history}
-    **End of conversation history**
-    """
+    # Merge a hint ladder that finished in the background since the last turn
+    ladder_update = pop_ready_hint_ladder(config["configurable"].get("thread_id"), secret_answer)
 
+    # Skip the agent LLM when the intent is obvious (page_load, "new game", "hint", ...)
+    user_message = last_message.content if isinstance(last_message, HumanMessage) else None
+    decision = pre_route(user_message, secret_answer)
+    if decision:
+        return _merge_updates({
+            "messages": [_prerouted_tool_call(decision, user_message, secret_answer)],
+            "tool_name": decision.tool_name,
+            "last_response": None,
+            "last_activity": current_time,
+        }, migration_update, ladder_update)
+    
+    session_block = None
     if secret_answer:
-        system_message_content += f"""
+        session_block = f"The current secret answer is: {secret_answer}. Use this when calling tools that require it."
 
-        The current secret answer is: {secret_answer}. Use this when calling tools that require it.
-        """
+    turn_tail = history_block(history)
+    if turn_instructions:
+        turn_tail += f"\n\n{turn_instructions}"
+    if last_message:
+        turn_tail += f"\n\nThe user's message is: {last_message.content}"
     
-    # print(f"system_message_content: {system_message_content}")
-    system_message = SystemMessage(content=system_message_content)
-    prompt = [system_message] + list(trimmed_messages)
-    response = llm_w_tools.invoke(prompt)
-    return {"messages": [response], "last_activity": current_time}
+    prompt = build_prompt(game_agent_system_prompt, session_block=session_block, turn_tail=turn_tail)
+    # print(f"prompt: {prompt}")
+    response = await _call_llm("tools", prompt, "router")
+    tool_name = response.tool_calls[0]["name"] if response.tool_calls else None
+    return _merge_updates(
+        {"messages": [response], "tool_name": tool_name, "last_response": None, "last_activity": current_time},
+        migration_update,
+        ladder_update,
+    )
+
+class FusedTurn(BaseModel):
+    """The action chosen for the user's message plus the reply shown to the user."""
+    action: Literal["answer_question", "check_guess", "give_hint", "general_chat", "reset_game"] = Field(
+        description="The game action that matches the user's message."
+    )
+    is_correct: bool | None = Field(
+        default=None, description="Only for check_guess: whether the user's guess matches the secret answer."
+    )
+    response: str = Field(description="The reply shown to the user.")
+
+_RUNNABLE_KINDS["fused"] = lambda model_llm: model_llm.with_structured_output(
+    FusedTurn, method="function_calling", include_raw=True
+)
+
+@traced_node("agent")
+async def node_fused_agent(state: AgentState, config: RunnableConfig) -> AgentState:
+    '''
+    Single round-trip version of node_game_agent + tool_node.
+    Writes the same state fields (reply, tool_name, secret_answer) and AIMessage(tool_calls) /
+    ToolMessage pair the tool node would, so record_turn handles both paths the same way.
+    Falls back to the two-call path for new games or when the structured output doesn't validate.
+    '''
+    messages = state["messages"]
+    last_message = messages[-1] if messages else None
+
+    secret_answer, history_lines, migration_update = _load_turn_context(state)
+
+    # Generating a secret and the page_load reminder go through the regular tool path
+    if not secret_answer or not last_message or last_message.content == "page_load":
+        return await node_game_agent(state, config)
+
+    history = format_history_for_prompt(history_lines, "fused")
+
+    ladder_update = pop_ready_hint_ladder(config["configurable"].get("thread_id"), secret_answer)
+
+    decision = pre_route(last_message.content, secret_answer)
+    if decision:
+        return _merge_updates({
+            "messages": [_prerouted_tool_call(decision, last_message.content, secret_answer)],
+            "tool_name": decision.tool_name,
+            "last_response": None,
+            "last_activity": time.time(),
+        }, migration_update, ladder_update)
+
+    prompt = build_prompt(
+        fused_turn_system_prompt,
+        session_block=f"The secret answer is: {secret_answer}.",
+        turn_tail=f"""{history_block(history)}
+
+The user's message is: {last_message.content}.""",
+    )
+
+    try:
+        result = await _call_llm("fused", prompt, "fused")
+        turn = result["parsed"]
+        if result["parsing_error"] or not turn or not turn.response.strip():
+            raise ValueError(result["parsing_error"] or "empty structured output")
+    except LLMOverloadedError:
+        raise
+    except Exception as e:
+        logger.warning(f"--- fused turn failed, falling back to two-call graph: {e} ---")
+        return _merge_updates(await node_game_agent(state, config), ladder_update)
+
+    logger.info("--- fused_agent: %s ---", turn.action, extra={"category": "turn"})
+    reply = turn.response.strip()
+    update = {"tool_name": turn.action, "last_response": reply, "last_activity": time.time()}
+    if turn.action == "reset_game":
+        update["last_response"] = reply = _reset_game_message(secret_answer)
+        update["secret_answer"] = None
+    elif turn.action == "check_guess" and turn.is_correct:
+        update["secret_answer"] = None
+
+    tool_call_id = f"fused_{uuid.uuid4().hex}"
+    update["messages"] = [
+        AIMessage(content="", tool_calls=[{"name": turn.action, "args": {}, "id": tool_call_id}]),
+        ToolMessage(content=reply, name=turn.action, tool_call_id=tool_call_id),
+    ]
+    return _merge_updates(update, migration_update, ladder_update)
+
+def route_after_agent(state: AgentState) -> str:
+    '''The fused agent already produced the tool result, otherwise run the chosen tool.'''
+    messages = state["messages"]
+    if messages and isinstance(messages[-1], ToolMessage):
+        return "record_turn"
+    return "tool_node"
+
+def node_record_turn(state: AgentState) -> AgentState:
+    '''
+    Folds the finished turn into a compact GameTurn record and clears the turn's messages,
+    so the checkpoint doesn't keep every HumanMessage/AIMessage/ToolMessage of the session.
+    '''
+    messages = state["messages"]
+    question = next((msg.content for msg in messages if isinstance(msg, HumanMessage)), "")
+    tool_name = state.get("tool_name")
+    answer = state.get("last_response") or FALLBACK_RESPONSE
+
+    turn = GameTurn(question=question, answer=answer, tool=tool_name)
+    update = {
+        "turns": [turn],
+        "history_lines": render_turn_lines(turn),
+        "last_response": answer,
+        "messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)],
+    }
+    if tool_name == "answer_question":
+        update["questions_asked"] = (state.get("questions_asked") or 0) + 1
+    elif tool_name == "check_guess":
+        update["guesses_made"] = (state.get("guesses_made") or 0) + 1
+    return update
+
+def _merge_updates(update: dict, *extra_updates: dict) -> dict:
+    '''Merges extra state updates into a node's update, their message writes go first.'''
+    merged = dict(update)
+    for extra in extra_updates:
+        for key, value in extra.items():
+            if key == "messages":
+                merged["messages"] = list(value) + list(merged.get("messages", []))
+            else:
+                merged.setdefault(key, value)
+    return merged
+
+def _load_turn_context(state: AgentState) -> tuple[str | None, list[str], dict]:
+    '''
+    Returns the secret answer and the rendered history lines for the current turn, plus a state update.
+    Checkpoints from before the compact schema hold the whole message list, those messages are
+    migrated into GameTurn records once and removed; turns recorded before the history cache
+    existed are rendered once. The update is empty for up-to-date state.
+    '''
+    messages = state["messages"]
+    secret_answer = state.get("secret_answer")
+    turns = list(state.get("turns") or [])
+    history_lines = list(state.get("history_lines") or [])
+    update = {}
+
+    legacy_messages = messages[:-1]
+    if legacy_messages:
+        logger.info(f"--- migrating {len(legacy_messages)} legacy messages to turn records ---")
+        migrated_turns = migrate_messages_to_turns(legacy_messages)
+        if not secret_answer:
+            secret_answer = extract_secret_from_messages(legacy_messages)
+        turns = append_turns(turns, migrated_turns)
+        update["turns"] = migrated_turns
+        update["secret_answer"] = secret_answer
+        update["messages"] = [RemoveMessage(id=msg.id) for msg in legacy_messages if msg.id]
+
+    if turns and not history_lines:
+        new_lines = [line for turn in turns for line in render_turn_lines(turn)]
+        history_lines = append_history_lines([], new_lines)
+        update["history_lines"] = new_lines
+
+    return secret_answer, history_lines, update
+
+def _prerouted_tool_call(decision: PreRouteDecision, user_message: str, secret_answer: str | None) -> AIMessage:
+    '''Builds the tool-calling AIMessage the agent LLM would have returned for a pre-routed intent.'''
+    return AIMessage(content="", tool_calls=[{
+        "name": decision.tool_name,
+        "args": build_tool_args(decision.tool_name, user_message, secret_answer),
+        "id": f"prerouted_{uuid.uuid4().hex}",
+    }])
 
 graph = StateGraph(AgentState)
-graph.add_node("agent", node_game_agent)
-graph.add_node("tool_node", tool_node)
+graph.add_node("agent", node_fused_agent if GRAPH_MODE == "fused" else node_game_agent)
+graph.add_node("tool_node", traced_tool_node if TRACING_ENABLED else tool_node)
+graph.add_node("record_turn", node_record_turn)
 
 graph.set_entry_point("agent")
-graph.add_edge("agent", "tool_node")
-graph.add_edge("tool_node", END)
+graph.add_conditional_edges("agent", route_after_agent, ["tool_node", "record_turn"])
+graph.add_edge("tool_node", "record_turn")
+graph.add_edge("record_turn", END)
+
+# Built by get_graph(), on the app's startup (or the first turn), not at import -------------
+memory: BaseCheckpointSaver | None = None
+# Expiry index for inactive sessions, touched on every turn, swept in the background
+session_expiry: SessionExpiryIndex | None = None
+app: CompiledStateGraph | None = None
+
+def get_graph() -> CompiledStateGraph:
+    """The compiled graph on its checkpointer, built once. Also the graph factory in langgraph.json."""
+    global memory, session_expiry, app
+    if app is None:
+        memory = build_checkpointer()
+        session_expiry = SessionExpiryIndex(memory)
+        app = graph.compile(checkpointer=memory)
+    return app
+
+def init_mystery_item_service() -> None:
+    """Builds the graph and the LLM clients (and their shared HTTP pools) of every call type up front."""
+    get_graph()
+    for role, config in ROLE_CONFIGS.items():
+        _runnable("plain", role, config.model)
+    _runnable("tools", "router", ROLE_CONFIGS["router"].model)
+    if GRAPH_MODE == "fused":
+        _runnable("fused", "answer", ROLE_CONFIGS["answer"].model)
 
-app = graph.compile(checkpointer=memory)
+async def shutdown_mystery_item_service() -> None:
+    """Stops the pool replenisher and the session sweeper."""
+    await mystery_item_pool.stop()
+    if session_expiry:
+        await session_expiry.stop()
 
-def invoke_mystery_item_graph(session_id: str, user_message: str | None = None) -> dict:
+async def invoke_mystery_item_graph(session_id: str, user_message: str | None = None) -> dict:
     """
     Invokes the guessing game graph.
+    Runs fully async (astream + ainvoke in every node/tool), so a single event loop
+    can serve many in-flight turns without tying up threadpool workers.
     Args:
         session_id: The session ID for the conversation.
         user_message: The user's message to inject into the graph.
     Returns:
-        A dictionary containing the updated list of messages and the last tool call name.
+        A dictionary containing the reply, the last tool call name and the secret answer.
     """
     logger.info(f"--- invoke_graph ---")
+    # One graph run at a time per session, identical concurrent requests share the run
+    return await run_coalesced(
+        session_id,
+        (session_id, "invoke", user_message),
+        lambda: _run_graph(session_id, user_message),
+    )
+
+async def _run_graph(session_id: str, user_message: str | None) -> dict:
+    """Runs one turn of the graph, the caller holds the session's lock."""
     config = {"configurable": {"thread_id": session_id}}
+    graph_app = get_graph()
+    await session_expiry.touch(session_id)
+    replay = await _replay_page_load(config, user_message)
+    if replay is not None:
+        return replay
     
     current_time = time.time()
     initial_state = {"messages": [], "last_activity": current_time}
@@ -250,35 +687,128 @@ def invoke_mystery_item_graph(session_id: str, user_message: str | None = None)
         initial_state["messages"].append(HumanMessage(content=user_message))
 
     final_state = None
-    for chunk in app.stream(initial_state, config=config):
+    node_timer = NodeTimer()
+    async for chunk in graph_app.astream(initial_state, config=config):
+        node_timer.update(chunk)
         final_state = chunk
 
-    # The last chunk will be the output of the 'tool_node'
-    if final_state and "tool_node" in final_state:
-        current_state = app.get_state(config)
-        messages = current_state.values["messages"]
-        tool_name = extract_last_tool_call(messages)
-        secret_answer = extract_secret_from_messages(messages)  # for dev
-        return {
-            "messages": messages,
-            "tool_name": tool_name,
-            "secret_answer": secret_answer
-        }
+    # The last chunk will be the output of the 'record_turn' node
+    if not (final_state and "record_turn" in final_state):
+        # Fallback to get the current state if the last chunk wasn't the tool node
+        logger.info(f"--- current_state (fallback) ---")
+    return await _get_graph_result(config)
+
+async def _replay_page_load(config: dict, user_message: str | None) -> dict | None:
+    """
+    A page_load right after another page_load (e.g. StrictMode mounting twice, a reload before playing)
+    returns the previous result, so a session generates its game at most once and the agent isn't called again.
+    """
+    if user_message != "page_load":
+        return None
+    values = (await get_graph().aget_state(config)).values
+    turns = values.get("turns") or []
+    if values.get("secret_answer") and turns and turns[-1].question == "page_load":
+        logger.info(f"--- page_load replayed, nothing happened since the last one ---")
+        return await _get_graph_result(config)
+    return None
+
+async def stream_mystery_item_graph(session_id: str, user_message: str | None = None) -> AsyncIterator[dict]:
+    """
+    Streams a game turn token by token.
+    Forwards the tokens of the tool's LLM call (only for STREAMABLE_TOOLS, so the secret
+    from generate_mystery_item is never leaked) and finishes with an "end" event.
+    Args:
+        session_id: The session ID for the conversation.
+        user_message: The user's message to inject into the graph.
+    Yields:
+        {"type": "token", "content": str} events, then one
+        {"type": "end", "response": str, "tool_name": str | None, "secret_answer": str | None}.
+    """
+    logger.info(f"--- stream_graph ---")
+    async with session_lock(session_id):
+        async for event in _stream_graph(session_id, user_message):
+            yield event
 
-    # Fallback to get the current state if the last chunk wasn't the tool node
-    current_state = app.get_state(config)
-    logger.info(f"--- current_state (fallback) ---")
-    logger.info(current_state)
-    messages = current_state.values["messages"]
-    tool_name = extract_last_tool_call(messages)
-    secret_answer = extract_secret_from_messages(messages)  # for dev
+async def _stream_graph(session_id: str, user_message: str | None) -> AsyncIterator[dict]:
+    """Streams one turn of the graph, the caller holds the session's lock."""
+    config = {"configurable": {"thread_id": session_id}}
+    graph_app = get_graph()
+    await session_expiry.touch(session_id)
+    replay = await _replay_page_load(config, user_message)
+    if replay is not None:
+        yield {"type": "end", "response": replay["response"], "tool_name": replay["tool_name"], "secret_answer": replay["secret_answer"]}
+        return
+
+    initial_state = {"messages": [], "last_activity": time.time()}
+    if user_message:
+        initial_state["messages"].append(HumanMessage(content=user_message))
+
+    tool_name = None
+    verdict_pending = ""  # check_guess replies start with "CORRECT:"/"INCORRECT:", strip it before forwarding
+    verdict_stripped = False
+    node_timer = NodeTimer()
+    async for mode, chunk in graph_app.astream(initial_state, config=config, stream_mode=["updates", "messages"]):
+        if mode == "updates":
+            node_timer.update(chunk)
+            agent_update = chunk.get("agent") if isinstance(chunk, dict) else None
+            if agent_update and agent_update.get("tool_name"):
+                tool_name = agent_update["tool_name"]
+            continue
+
+        message_chunk, metadata = chunk
+        if metadata.get("langgraph_node") != "tool_node" or tool_name not in STREAMABLE_TOOLS:
+            continue
+        if not isinstance(message_chunk, AIMessageChunk) or not isinstance(message_chunk.content, str):
+            continue
+        token = message_chunk.content
+
+        if tool_name == "check_guess" and not verdict_stripped:
+            verdict_pending += token
+            head = verdict_pending.lstrip()
+            if any(prefix.startswith(head.upper()) and len(head) < len(prefix) for prefix in GUESS_VERDICT_PREFIXES):
+                continue  # not enough characters yet to tell whether it's a verdict prefix
+            token = _strip_verdict_prefix(verdict_pending)
+            if not token:
+                continue  # just the prefix so far, its trailing whitespace may still be coming
+            verdict_stripped = True
+
+        if token:
+            yield {"type": "token", "content": token}
+
+    if verdict_pending and not verdict_stripped:
+        # The reply ended while it still looked like the start of a prefix (e.g. "In")
+        token = _strip_verdict_prefix(verdict_pending)
+        if token:
+            yield {"type": "token", "content": token}
+
+    result = await _get_graph_result(config)
+    yield {
+        "type": "end",
+        "response": result["response"],
+        "tool_name": result["tool_name"],
+        "secret_answer": result["secret_answer"],
+    }
+
+def _strip_verdict_prefix(text: str) -> str:
+    """The streamed check_guess text without its "CORRECT:"/"INCORRECT:" prefix, unchanged without one."""
+    head = text.lstrip()
+    for prefix in GUESS_VERDICT_PREFIXES:
+        if head.upper().startswith(prefix):
+            return head[len(prefix):].lstrip()
+    return text
+
+async def _get_graph_result(config: dict) -> dict:
+    """Reads the checkpointed state for the thread and builds the result dict returned to the router."""
+    current_state = await get_graph().aget_state(config)
+    values = current_state.values
     return {
-        "messages": messages,
-        "tool_name": tool_name,
-        "secret_answer": secret_answer
+        "response": values.get("last_response") or FALLBACK_RESPONSE,
+        "tool_name": values.get("tool_name"),
+        "secret_answer": values.get("secret_answer"),  # for dev
+        "turns": values.get("turns", []),
     }
 
-def reset_session_state(session_id: str) -> dict:
+async def reset_session_state(session_id: str) -> dict:
     """
     Resets the session state by deleting the thread from memory and starts a new game.
     Args:
@@ -286,10 +816,14 @@ def reset_session_state(session_id: str) -> dict:
     Returns:
         Dict with the new game response, or error dict if reset failed.
     """
+    return await run_coalesced(session_id, (session_id, "reset"), lambda: _reset_session(session_id))
+
+async def _reset_session(session_id: str) -> dict:
+    """Deletes the thread and starts a new game, the caller holds the session's lock."""
     try:
         
         # Use the checkpointer's delete_thread method to completely clear the session
-        memory.delete_thread(session_id)
+        await get_graph().checkpointer.adelete_thread(session_id)
         
         # # Verify the reset worked by checking if there are any checkpoints
         # config = {"configurable": {"thread_id": session_id}}
@@ -301,16 +835,19 @@ def reset_session_state(session_id: str) -> dict:
         #     # This is expected if the thread was completely deleted
         #     logger.info(f"Thread {session_id} successfully deleted - no state found: {state_check_error}")
         
-        logger.info(f"Session {session_id} reset successfully")
+        logger.info("Session %s reset successfully", session_id)
         
         # Start a new game and return the response
-        return invoke_mystery_item_graph(session_id, "page_load")
+        return await _run_graph(session_id, "page_load")
         
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         logger.error(f"Failed to reset session {session_id}: {e}")
         return {
             "error": f"Failed to reset session: {str(e)}",
-            "messages": [],
+            "response": FALLBACK_RESPONSE,
+            "turns": [],
             "tool_name": None,
             "secret_answer": None
         }
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class _SessionLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+# session_id -> lock, only kept while someone holds or waits for it
+_session_locks: dict[str, _SessionLock] = {}
+# (session_id, request kind, message) -> the task computing its result
+_in_flight: dict[Hashable, asyncio.Task] = {}
+_stats = {"requests": 0, "coalesced": 0, "waited_for_lock": 0}
+
+@asynccontextmanager
+async def session_lock(session_id: str):
+    """Serializes graph runs of one session (thread), so concurrent turns can't interleave their checkpoints."""
+    entry = _session_locks.get(session_id)
+    if entry is None:
+        entry = _session_locks[session_id] = _SessionLock()
+    entry.users += 1
+    if entry.lock.locked():
+        _stats["waited_for_lock"] += 1
+    try:
+        async with entry.lock:
+            yield
+    finally:
+        entry.users -= 1
+        if entry.users == 0 and _session_locks.get(session_id) is entry:
+            del _session_locks[session_id]
+
+async def run_coalesced(session_id: str, key: Hashable, run: Callable[[], Awaitable[T]]) -> T:
+    """
+    Runs run() under the session's lock. An identical request (same key) that arrives while it is
+    still in flight (double click, StrictMode double page_load) gets the same result instead of a second run.
+    """
+    _stats["requests"] += 1
+    task = _in_flight.get(key)
+    if task is not None:
+        _stats["coalesced"] += 1
+        logger.info("--- coalesced duplicate request for session %s ---", session_id, extra={"category": "turn"})
+        return await asyncio.shield(task)
+
+    async def locked_run() -> T:
+        async with session_lock(session_id):
+            return await run()
+
+    task = asyncio.ensure_future(locked_run())
+    _in_flight[key] = task
+    task.add_done_callback(lambda _: _in_flight.pop(key, None) if _in_flight.get(key) is task else None)
+    # Shielded: one caller disconnecting must not cancel the run the others are waiting for
+    return await asyncio.shield(task)
+
+def get_session_stats() -> dict:
+    return {
+        **_stats,
+        "locked_sessions": len(_session_locks),
+        "in_flight": len(_in_flight),
+    }
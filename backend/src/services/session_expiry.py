@@ -0,0 +1,189 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import contextvars
+from dotenv import load_dotenv
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from src.services.session_coordinator import session_lock
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+# Hard cap on live sessions, the least recently active ones are evicted beyond it
+SESSION_MAX_LIVE = int(os.getenv("SESSION_MAX_LIVE", "10000"))
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+SESSION_SWEEP_BATCH = int(os.getenv("SESSION_SWEEP_BATCH", "100"))
+
+class SessionExpiryIndex:
+    """
+    Min-heap of (last_activity, thread_id), touched on every turn. The sweeper pops expired threads
+    (and the least recently active ones above SESSION_MAX_LIVE) in small batches and deletes them from the checkpointer.
+    Touching a thread pushes a new entry, older entries for it are skipped as stale when popped.
+
+    A checkpointer shared by several workers (SqliteCheckpointSaver) keeps the last activity itself:
+    touches are written to it, every worker's sweeper picks threads from it and deletes them only if
+    nobody touched them since (`delete_thread_if_inactive`), so no worker evicts a session another one is serving.
+    """
+
+    def __init__(self, checkpointer: BaseCheckpointSaver, ttl: int = SESSION_TTL_SECONDS, max_live: int = SESSION_MAX_LIVE):
+        self.checkpointer = checkpointer
+        self.ttl = ttl
+        self.max_live = max_live
+        self.shared = hasattr(checkpointer, "adelete_thread_if_inactive")
+        self._last_activity: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+        self._shared_live: int | None = None  # thread count of the shared store at the last sweep
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stats = {"expired": 0, "lru_evicted": 0, "sweeps": 0, "errors": 0, "skipped_active": 0}
+
+    async def touch(self, thread_id: str | None, timestamp: float | None = None) -> None:
+        if thread_id is None:
+            return
+        timestamp = timestamp or time.time()
+        self.ensure_started()
+        if self.shared:
+            await self.checkpointer.atouch_thread(thread_id, timestamp)
+            return
+        self._last_activity[thread_id] = timestamp
+        heapq.heappush(self._heap, (timestamp, thread_id))
+        if len(self._heap) > 2 * len(self._last_activity) + 1024:
+            self._compact()
+        if len(self._last_activity) > self.max_live and self._wakeup:
+            self._wakeup.set()
+
+    def _compact(self) -> None:
+        self._heap = [(ts, tid) for tid, ts in self._last_activity.items()]
+        heapq.heapify(self._heap)
+
+    def ensure_started(self) -> None:
+        """Starts the sweeper on the running event loop, the index is touched from async turns only."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        # Fresh context: the first touch happens inside a request, the sweeper outlives it
+        self._task = loop.create_task(self._sweep_loop(), context=contextvars.Context())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pop_due(self, now: float) -> list[tuple[str, float, str]]:
+        """Pops up to SESSION_SWEEP_BATCH threads that are expired or over the cap, with their last activity and the reason."""
+        due = []
+        cutoff = now - self.ttl
+        while self._heap and len(due) < SESSION_SWEEP_BATCH:
+            timestamp, thread_id = self._heap[0]
+            if self._last_activity.get(thread_id) != timestamp:
+                heapq.heappop(self._heap)  # stale, the thread was touched again
+                continue
+            if timestamp < cutoff:
+                reason = "expired"
+            elif len(self._last_activity) - len(due) > self.max_live:
+                reason = "lru_evicted"
+            else:
+                break
+            heapq.heappop(self._heap)
+            due.append((thread_id, timestamp, reason))
+        return due
+
+    async def _shared_due(self, now: float) -> list[tuple[str, float, str]]:
+        """The same selection as _pop_due, read from the shared store."""
+        cutoff = now - self.ttl
+        due = [(thread_id, ts, "expired") for thread_id, ts in await self.checkpointer.ainactive_threads(cutoff, SESSION_SWEEP_BATCH)]
+        self._shared_live = await self.checkpointer.acount_threads()
+        over = self._shared_live - len(due) - self.max_live
+        if over > 0 and len(due) < SESSION_SWEEP_BATCH:
+            oldest = await self.checkpointer.ainactive_threads(float("inf"), len(due) + min(over, SESSION_SWEEP_BATCH - len(due)))
+            expired = {thread_id for thread_id, _, _ in due}
+            due += [(thread_id, ts, "lru_evicted") for thread_id, ts in oldest if thread_id not in expired]
+        return due
+
+    async def sweep(self) -> int:
+        """Evicts everything that's due, batch by batch, yielding to turns in between. Returns the number evicted."""
+        evicted = 0
+        self._stats["sweeps"] += 1
+        while True:
+            due = await self._shared_due(time.time()) if self.shared else self._pop_due(time.time())
+            if not due:
+                return evicted
+            deleted = 0
+            for thread_id, timestamp, reason in due:
+                # The lock keeps this worker's own turns out, the conditional delete the other workers' ones
+                async with session_lock(thread_id):
+                    try:
+                        deleted_now = await self._delete_if_inactive(thread_id, timestamp)
+                    except Exception as e:
+                        self._stats["errors"] += 1
+                        logger.warning(f"Failed to evict session {thread_id}: {e}")
+                        continue
+                if not deleted_now:
+                    self._stats["skipped_active"] += 1
+                    continue
+                self._stats[reason] += 1
+                deleted += 1
+            evicted += deleted
+            if self.shared and not deleted:
+                return evicted  # everything left in the batch was touched meanwhile, don't select it again
+            await asyncio.sleep(0)
+
+    async def _delete_if_inactive(self, thread_id: str, timestamp: float) -> bool:
+        if self.shared:
+            return await self.checkpointer.adelete_thread_if_inactive(thread_id, timestamp)
+        if self._last_activity.get(thread_id) != timestamp:
+            return False  # played while we waited for the lock
+        await self.checkpointer.adelete_thread(thread_id)
+        self._last_activity.pop(thread_id, None)
+        return True
+
+    async def _sweep_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # call_later instead of wait_for, which can swallow the task's cancellation on 3.11
+            timer = loop.call_later(SESSION_SWEEP_INTERVAL_SECONDS, self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                timer.cancel()
+            self._wakeup.clear()
+            try:
+                evicted = await self.sweep()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning(f"Session sweep failed: {e}")
+                continue
+            if evicted:
+                logger.info(f"--- evicted {evicted} sessions, {self._live()} live ---")
+
+    def _live(self) -> int | None:
+        return self._shared_live if self.shared else len(self._last_activity)
+
+    def _oldest_activity(self) -> float | None:
+        while self._heap and self._last_activity.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def stats(self) -> dict:
+        oldest = None if self.shared else self._oldest_activity()
+        return {
+            **self._stats,
+            "shared": self.shared,
+            "live": self._live(),  # shared store: as of the last sweep
+            "max_live": self.max_live,
+            "ttl_seconds": self.ttl,
+            "oldest_activity_age_s": round(time.time() - oldest, 1) if oldest else None,
+            "heap_entries": len(self._heap),
+        }
@@ -0,0 +1,363 @@
+import time
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Iterator, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_activity REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_thread_id ON checkpoints (thread_id);
+CREATE INDEX IF NOT EXISTS idx_writes_thread_id ON writes (thread_id);
+CREATE INDEX IF NOT EXISTS idx_threads_last_activity ON threads (last_activity);
+"""
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer backed by a local SQLite file in WAL mode.
+    Several worker processes can share the same file: each process reuses one connection,
+    writers wait on busy_timeout instead of failing, and readers don't block writers.
+    Only the newest `keep_checkpoints` checkpoints of a thread are kept (None keeps all).
+    The `threads` table holds each thread's last activity, shared by the workers' session expiry sweepers.
+    """
+
+    def __init__(self, path: str, *, keep_checkpoints: int | None = 10, busy_timeout_ms: int = 5000, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_checkpoints = keep_checkpoints
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=busy_timeout_ms / 1000)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self.conn.executescript(_SCHEMA)
+        # Files from before the threads table: their threads count as active as of the first start with it
+        self.conn.execute(
+            "INSERT OR IGNORE INTO threads (thread_id, last_activity) SELECT DISTINCT thread_id, ? FROM checkpoints",
+            (time.time(),),
+        )
+        logger.info(f"SQLite checkpointer ready at {path}")
+
+    @contextmanager
+    def _cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        with self.lock:
+            cur = self.conn.cursor()
+            try:
+                if transaction:
+                    cur.execute("BEGIN IMMEDIATE")
+                yield cur
+                if transaction:
+                    cur.execute("COMMIT")
+            except BaseException:
+                # Nothing to roll back if BEGIN itself failed (e.g. busy), the original error must surface
+                if transaction and self.conn.in_transaction:
+                    cur.execute("ROLLBACK")
+                raise
+            finally:
+                cur.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+    # sync API ------------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._cursor(transaction=False) as cur:
+            if checkpoint_id := get_checkpoint_id(config):
+                cur.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            else:
+                cur.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                )
+            row = cur.fetchone()
+            if row is None:
+                return None
+            return self._row_to_tuple(cur, thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(str(config["configurable"]["thread_id"]))
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._cursor(transaction=False) as cur:
+            rows = cur.execute(query, params).fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                checkpoint_tuple = self._row_to_tuple(cur, thread_id, checkpoint_ns, row)
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(checkpoint_tuple)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(dict(metadata))
+        with self._cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    serialized_checkpoint,
+                    metadata_type,
+                    serialized_metadata,
+                ),
+            )
+            self._touch(cur, thread_id, time.time())
+            if self.keep_checkpoints:
+                self._prune(cur, thread_id, checkpoint_ns)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # Special channels (errors, interrupts, ...) overwrite, regular writes are only stored once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # One transaction for the whole batch instead of one per write
+        with self._cursor() as cur:
+            cur.executemany(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        # Indexed deletes, cost depends on the thread's own (bounded) size, not on the number of sessions
+        with self._cursor() as cur:
+            self._delete(cur, str(thread_id))
+
+    # thread activity (session expiry across workers) ---------------------
+    def touch_thread(self, thread_id: str, timestamp: float) -> None:
+        """Records activity on a thread, e.g. at the start of a turn, before its first checkpoint write."""
+        with self._cursor() as cur:
+            self._touch(cur, str(thread_id), timestamp)
+
+    def inactive_threads(self, before: float, limit: int) -> Sequence[tuple[str, float]]:
+        """(thread_id, last_activity) of the least recently active threads with no activity since `before`."""
+        with self._cursor(transaction=False) as cur:
+            return cur.execute(
+                "SELECT thread_id, last_activity FROM threads WHERE last_activity < ? ORDER BY last_activity LIMIT ?",
+                (before, limit),
+            ).fetchall()
+
+    def count_threads(self) -> int:
+        with self._cursor(transaction=False) as cur:
+            return cur.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def delete_thread_if_inactive(self, thread_id: str, last_activity: float) -> bool:
+        """
+        Deletes the thread only if it had no activity after `last_activity` (the value the caller saw),
+        so a sweeper never deletes a session another worker has touched meanwhile. Returns whether it was deleted.
+        """
+        with self._cursor() as cur:
+            cur.execute("DELETE FROM threads WHERE thread_id = ? AND last_activity <= ?", (str(thread_id), last_activity))
+            if cur.rowcount == 0:
+                return False
+            self._delete(cur, str(thread_id))
+            return True
+
+    def get_next_version(self, current: str | None, channel: Any = None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # async API (the sqlite calls are short, run them off the event loop) --
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def atouch_thread(self, thread_id: str, timestamp: float) -> None:
+        await asyncio.to_thread(self.touch_thread, thread_id, timestamp)
+
+    async def ainactive_threads(self, before: float, limit: int) -> Sequence[tuple[str, float]]:
+        return await asyncio.to_thread(self.inactive_threads, before, limit)
+
+    async def acount_threads(self) -> int:
+        return await asyncio.to_thread(self.count_threads)
+
+    async def adelete_thread_if_inactive(self, thread_id: str, last_activity: float) -> bool:
+        return await asyncio.to_thread(self.delete_thread_if_inactive, thread_id, last_activity)
+
+    # helpers -------------------------------------------------------------
+    def _row_to_tuple(self, cur: sqlite3.Cursor, thread_id: str, checkpoint_ns: str, row: Sequence[Any]) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        writes = cur.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)) if metadata is not None else {},
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((wtype, value))) for task_id, channel, wtype, value in writes],
+        )
+
+    def _touch(self, cur: sqlite3.Cursor, thread_id: str, timestamp: float) -> None:
+        cur.execute(
+            "INSERT INTO threads (thread_id, last_activity) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_activity = max(last_activity, excluded.last_activity)",
+            (thread_id, timestamp),
+        )
+
+    def _delete(self, cur: sqlite3.Cursor, thread_id: str) -> None:
+        cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        cur.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    def _prune(self, cur: sqlite3.Cursor, thread_id: str, checkpoint_ns: str) -> None:
+        """Drops all but the newest keep_checkpoints checkpoints (and their writes) of the thread."""
+        cur.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_checkpoints - 1),
+        )
+        row = cur.fetchone()
+        if row is None:
+            return
+        oldest_kept = row[0]
+        cur.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        )
+        cur.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        )
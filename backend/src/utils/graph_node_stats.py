@@ -0,0 +1,33 @@
+import time
+from src.utils.metrics import GRAPH_NODE_SECONDS, percentile
+
+class NodeTimer:
+    """
+    Times the nodes of one graph run from its "updates" stream: the nodes run one after another,
+    so the time between two update chunks is the time of the node that produced the second one.
+    """
+
+    def __init__(self):
+        self._last = time.perf_counter()
+
+    def update(self, chunk) -> None:
+        now = time.perf_counter()
+        if isinstance(chunk, dict):
+            for node in chunk:
+                record_node_time(node, now - self._last)
+        self._last = now
+
+def record_node_time(node: str, seconds: float) -> None:
+    GRAPH_NODE_SECONDS.observe(seconds, node=node)
+
+def get_node_stats() -> dict:
+    """Per graph node run count, total time (s) and latency percentiles (ms, recent runs)."""
+    return {
+        node: {
+            "runs": summary["count"],
+            "total_s": round(summary["sum"], 3),
+            "latency_ms_p50": round(percentile(summary["recent"], 0.5) * 1000, 1),
+            "latency_ms_p95": round(percentile(summary["recent"], 0.95) * 1000, 1),
+        }
+        for (node,), summary in GRAPH_NODE_SECONDS.summaries().items()
+    }
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import random
+import logging
+import unicodedata
+from difflib import SequenceMatcher
+from typing import NamedTuple
+from dotenv import load_dotenv
+from src.utils.metrics import GUESS_DECISIONS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Decides guesses that are the answer (exact, plural, spacing, alias) locally, everything else goes to the check_guess LLM call
+GUESS_MATCHER_ENABLED = os.getenv("GUESS_MATCHER_ENABLED", "true").lower() == "true"
+# Typo-like and unrelated-looking guesses are never decided locally (desert/dessert, couch/sofa), these
+# thresholds only label them in the guess_match logs, for tuning against the LLM's verdicts
+GUESS_MATCHER_TYPO_RATIO = float(os.getenv("GUESS_MATCHER_TYPO_RATIO", "0.15"))
+GUESS_MATCHER_TYPO_MIN_LENGTH = int(os.getenv("GUESS_MATCHER_TYPO_MIN_LENGTH", "7"))
+GUESS_MATCHER_DIFFERENT_RATIO = float(os.getenv("GUESS_MATCHER_DIFFERENT_RATIO", "0.4"))
+# Optional JSON file {"alias": "canonical name", ...} merged into ALIASES
+GUESS_ALIASES_PATH = os.getenv("GUESS_ALIASES_PATH")
+
+# Normalized alias -> normalized canonical name
+ALIASES = {
+    "tv": "television",
+    "telly": "television",
+    "fridge": "refrigerator",
+    "phone": "telephone",
+    "cellphone": "mobile phone",
+    "cell phone": "mobile phone",
+    "smartphone": "mobile phone",
+    "bike": "bicycle",
+    "plane": "airplane",
+    "aeroplane": "airplane",
+    "car": "automobile",
+    "auto": "automobile",
+    "laptop": "laptop computer",
+    "pc": "computer",
+    "specs": "glasses",
+    "eyeglasses": "glasses",
+    "sneaker": "shoe",
+    "usa": "united states",
+    "us": "united states",
+    "america": "united states",
+    "uk": "united kingdom",
+    "britain": "united kingdom",
+    "great britain": "united kingdom",
+    "nyc": "new york city",
+    "new york": "new york city",
+    "la": "los angeles",
+    "piano player": "pianist",
+}
+
+_GUESS_PREAMBLE_RE = re.compile(
+    r"^(?:(?:my )?(?:final )?guess(?: is)?|i (?:think|guess|bet)(?: that)?(?: it s| its| it is)?|is it|it s|its|it is|maybe|perhaps|could it be|how about|what about|then)\s+"
+)
+_ARTICLES_RE = re.compile(r"\b(?:a|an|the)\b")
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_CORRECT_REPLIES = [
+    "You got it! The secret answer is {secret}! Well done. Want to play again?",
+    "Good job! The secret answer is {secret}, want to play again?",
+    "Yes! It's {secret}! Nicely done. Want to play another round?",
+]
+class GuessMatch(NamedTuple):
+    verdict: str | None  # "correct", or None when it's up to the LLM
+    score: float  # similarity of the normalized guess and answer, 0..1
+    reason: str
+
+def _load_aliases() -> None:
+    if not GUESS_ALIASES_PATH:
+        return
+    try:
+        with open(GUESS_ALIASES_PATH, encoding="utf-8") as f:
+            extra = json.load(f)
+        ALIASES.update({normalize_guess(k): normalize_guess(v) for k, v in extra.items()})
+        logger.info(f"--- loaded {len(extra)} guess aliases from {GUESS_ALIASES_PATH} ---")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load guess aliases from {GUESS_ALIASES_PATH}: {e}")
+
+def _singularize(word: str) -> str:
+    # Only the plain "+s" plural: "-es"/"-ies" would fold real words together (glasses -> glass)
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    return word[:-1] if word.endswith("s") else word
+
+def _singular(text: str) -> str:
+    return " ".join(_singularize(word) for word in text.split())
+
+def normalize_guess(text: str) -> str:
+    """Lowercase, no accents/punctuation/articles."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    text = _NON_WORD_RE.sub(" ", text.lower())
+    text = _ARTICLES_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def _strip_preamble(text: str) -> str:
+    text = _WHITESPACE_RE.sub(" ", _NON_WORD_RE.sub(" ", (text or "").lower())).strip()
+    previous = None
+    while text != previous:  # "my guess is maybe a piano"
+        previous = text
+        text = _GUESS_PREAMBLE_RE.sub("", text)
+    return text
+
+def _canonical(text: str) -> str:
+    return ALIASES.get(text, text)
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance, two-row DP."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def match_guess(user_guess: str, secret_answer: str) -> GuessMatch:
+    """
+    Compares a guess with the secret answer. Only a guess that is the answer (exact, "+s" plural,
+    spacing or an ALIASES entry) gets a local "correct", a near miss may be a different word
+    (desert/dessert) and an unrelated one a synonym (couch/sofa), so those are left to the LLM.
+    """
+    guess = normalize_guess(_strip_preamble(user_guess))
+    secret = normalize_guess(secret_answer)
+    if not guess or not secret:
+        return GuessMatch(None, 0.0, "empty")
+
+    if guess == secret:
+        return GuessMatch("correct", 1.0, "exact")
+    if guess.replace(" ", "") == secret.replace(" ", ""):
+        return GuessMatch("correct", 1.0, "spacing")
+    if _singular(guess) == _singular(secret):
+        return GuessMatch("correct", 1.0, "plural")
+    guess_forms = {_canonical(guess), _canonical(_singular(guess))}
+    secret_forms = {_canonical(secret), _canonical(_singular(secret))}
+    if guess_forms & secret_forms:
+        return GuessMatch("correct", 1.0, "alias")
+
+    # Labels for the logs only, the LLM decides
+    guess, secret = _canonical(_singular(guess)), _canonical(_singular(secret))
+    score = SequenceMatcher(None, guess, secret).ratio()
+    distance = edit_distance(guess, secret)
+    if len(secret) >= GUESS_MATCHER_TYPO_MIN_LENGTH and distance <= max(1, int(len(secret) * GUESS_MATCHER_TYPO_RATIO)):
+        return GuessMatch(None, score, f"typo:{distance}")
+
+    guess_words, secret_words = set(guess.split()), set(secret.split())
+    related = (
+        guess_words & secret_words
+        or guess in secret
+        or secret in guess
+        or any(g[:4] == s[:4] for g in guess_words for s in secret_words if len(g) >= 4 and len(s) >= 4)
+    )
+    # Long messages are probably not a plain guess ("is it something you play with?")
+    if not related and score < GUESS_MATCHER_DIFFERENT_RATIO and len(guess_words) <= 4:
+        return GuessMatch(None, score, "different")
+    return GuessMatch(None, score, "ambiguous")
+
+def local_guess_reply(match: GuessMatch, secret_answer: str) -> str:
+    """A check_guess reply ("CORRECT: ...") for a local verdict."""
+    return "CORRECT: " + random.choice(_CORRECT_REPLIES).format(secret=secret_answer)
+
+# Decision counters ------------------------------------------------------------
+def log_guess_decision(user_guess: str, secret_answer: str, match: GuessMatch, source: str, verdict: str | None) -> None:
+    """
+    Logs one guess decision as a structured record (matcher verdict next to the final one) so the
+    thresholds can be tuned offline against the LLM's verdicts (needs "secret" out of LOG_REDACT_FIELDS).
+    """
+    GUESS_DECISIONS.inc(source=source, verdict=verdict)
+    logger.info("guess_match", extra={
+        "category": "guess_match",
+        "guess": user_guess,
+        "secret": secret_answer,
+        "matcher_verdict": match.verdict,
+        "matcher_reason": match.reason,
+        "score": round(match.score, 3),
+        "source": source,  # "matcher", "cache" or "llm"
+        "verdict": verdict,
+    })
+
+def get_guess_matcher_stats() -> dict:
+    """How many guesses were decided locally vs by the LLM, by verdict."""
+    decisions = {f"{source}:{verdict}": count for (source, verdict), count in GUESS_DECISIONS.values().items()}
+    total = sum(decisions.values())
+    local = sum(count for key, count in decisions.items() if key.startswith("matcher:"))
+    return {
+        "enabled": GUESS_MATCHER_ENABLED,
+        "decisions": decisions,
+        "local_rate": local / total if total else 0.0,
+    }
+
+_load_aliases()
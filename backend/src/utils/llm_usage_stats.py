@@ -0,0 +1,39 @@
+from src.utils.metrics import LLM_CALLS, LLM_CALL_SECONDS, LLM_TOKENS, percentile
+
+def record_llm_usage(role: str, call_type: str, model: str, seconds: float, response) -> None:
+    """Adds one LLM call's latency (queueing included) and provider-reported token usage to the metrics."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    LLM_CALLS.inc(role=role, call_type=call_type, outcome="ok")
+    LLM_CALL_SECONDS.observe(seconds, role=role, model=model)
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), role=role, call_type=call_type, type="prompt")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), role=role, call_type=call_type, type="completion")
+    LLM_TOKENS.inc((usage.get("input_token_details") or {}).get("cache_read", 0) or 0, role=role, call_type=call_type, type="cached_prompt")
+
+def get_llm_usage_stats() -> dict:
+    """Per role call count, latency percentiles (ms, recent calls) and token usage."""
+    models: dict[str, dict[str, int]] = {}
+    latencies: dict[str, list[float]] = {}
+    for (role, model), summary in LLM_CALL_SECONDS.summaries().items():
+        models.setdefault(role, {})[model] = summary["count"]
+        latencies.setdefault(role, []).extend(summary["recent"])
+    tokens: dict[str, dict[str, float]] = {}
+    for (role, _, token_type), count in LLM_TOKENS.values().items():
+        role_tokens = tokens.setdefault(role, {})
+        role_tokens[token_type] = role_tokens.get(token_type, 0) + count
+
+    result = {}
+    for role, role_models in models.items():
+        calls = sum(role_models.values())
+        samples = sorted(latencies[role])
+        input_tokens = tokens.get(role, {}).get("prompt", 0)
+        output_tokens = tokens.get(role, {}).get("completion", 0)
+        result[role] = {
+            "calls": calls,
+            "models": role_models,
+            "latency_ms_p50": round(percentile(samples, 0.5) * 1000, 1),
+            "latency_ms_p95": round(percentile(samples, 0.95) * 1000, 1),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "avg_output_tokens": output_tokens / calls if calls else 0.0,
+        }
+    return result
@@ -0,0 +1,207 @@
+import os
+import time
+import bisect
+import functools
+import threading
+import importlib.util
+from collections import deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Spans need the optional `opentelemetry-api` package, plus an SDK/exporter (e.g. run under opentelemetry-instrument).
+# Without a configured tracer provider the API is a no-op.
+TRACING_ENABLED = (
+    os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    and importlib.util.find_spec("opentelemetry") is not None
+    and importlib.util.find_spec("opentelemetry.trace") is not None
+)
+if TRACING_ENABLED:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("mystery_item")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Prometheus registry ------------------------------------------------------------
+# A small in-process registry rendering the Prometheus text format, so /metrics needs no extra dependency
+_registry_lock = threading.Lock()
+_registry: list["_Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels_text(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+def percentile(samples: list[float], q: float) -> float:
+    """The q quantile of ascending sorted samples, 0.0 without samples."""
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _registry_lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with _registry_lock:
+            return self._values.get(self._key(labels), 0)
+
+    def values(self) -> dict[tuple, float]:
+        """Snapshot of the counts by label values, in the order of the metric's labels."""
+        with _registry_lock:
+            return dict(self._values)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels_text(self.labels, key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    """
+    Bucketed for /metrics. With a window it also keeps the most recent samples per label values,
+    for the exact recent percentiles of /stats and the hedge delay.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS, window: int = 0):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+        self.window = window
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with _registry_lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {
+                    "counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "max": value, "recent": deque(maxlen=self.window),
+                }
+            entry["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            entry["sum"] += value
+            entry["max"] = max(entry["max"], value)
+            if self.window:
+                entry["recent"].append(value)
+
+    def summaries(self) -> dict[tuple, dict]:
+        """Per label values: count, sum, max and the recent samples (sorted, empty without a window)."""
+        with _registry_lock:
+            return {
+                key: {"count": sum(entry["counts"]), "sum": entry["sum"], "max": entry["max"], "recent": sorted(entry["recent"])}
+                for key, entry in self._values.items()
+            }
+
+    def recent(self, **labels) -> list[float]:
+        """The recent samples of one label values, sorted."""
+        with _registry_lock:
+            entry = self._values.get(self._key(labels))
+            return sorted(entry["recent"]) if entry else []
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_labels_text(self.labels, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labels, key)} {entry['sum']}")
+            lines.append(f"{self.name}_count{_labels_text(self.labels, key)} {cumulative}")
+        return lines
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        lines = [line for metric in _registry for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+# Metrics ------------------------------------------------------------
+GRAPH_NODE_SECONDS = Histogram("mystery_item_graph_node_seconds", "Wall time of a graph node run", ("node",), window=500)
+TOOL_CALLS = Counter("mystery_item_tool_calls_total", "Tool runs, i.e. the tool_name chosen for a turn", ("tool", "outcome"))
+TOOL_SECONDS = Histogram("mystery_item_tool_seconds", "Wall time of a tool run", ("tool",))
+GUESS_DECISIONS = Counter("mystery_item_guess_decisions_total", "Who decided a guess: the local matcher, the cache or the LLM", ("source", "verdict"))
+CACHE_LOOKUPS = Counter("mystery_item_cache_lookups_total", "Answer cache lookups", ("cache", "kind", "result"))
+CACHE_STORES = Counter("mystery_item_cache_stores_total", "Answer cache writes", ("cache", "kind"))
+PREROUTER_DECISIONS = Counter("mystery_item_prerouter_decisions_total", "Pre-router results: hit (agent LLM skipped), below_threshold or miss", ("result", "tool"))
+LLM_CALL_SECONDS = Histogram("llm_call_seconds", "Wall time of an LLM call, queueing, retries and fallbacks included", ("role", "model"), window=500)
+LLM_CALLS = Counter("llm_calls_total", "LLM calls by outcome", ("role", "call_type", "outcome"))
+LLM_TOKENS = Counter("llm_tokens_total", "Provider reported tokens (prompt, completion, cached prompt)", ("role", "call_type", "type"))
+LLM_PROMPT_TOKENS = Histogram("llm_prompt_tokens", "Estimated prompt tokens per LLM call", ("call_type",), buckets=TOKEN_BUCKETS)
+LLM_QUEUE_WAIT_SECONDS = Histogram("llm_queue_wait_seconds", "Time an LLM call waited for a scheduler slot", ("priority",))
+LLM_RETRIES = Counter("llm_retries_total", "LLM call retries", ("reason",))
+LLM_REJECTED = Counter("llm_rejected_total", "LLM calls rejected by admission control", ("reason",))
+LLM_FALLBACKS = Counter("llm_fallbacks_total", "LLM calls moved to a fallback model", ("call_type",))
+LLM_HEDGES = Counter("llm_hedges_total", "Hedge requests sent, by which request won (none: both failed)", ("call_type", "winner"))
+LLM_ATTEMPT_SECONDS = Histogram("llm_attempt_seconds", "Wall time of one successful request to a model, the hedge delay is its recent percentile", ("call_type",), window=200)
+LLM_HTTP_SECONDS = Histogram("llm_http_request_seconds", "Time to the response headers of an LLM HTTP request", ("status",))
+
+# Tracing ------------------------------------------------------------
+class _NoSpan:
+    def set_attribute(self, key, value) -> None:
+        pass
+
+_NO_SPAN = _NoSpan()
+
+@contextmanager
+def span(name: str, **attributes):
+    """An OpenTelemetry span nested under the current one (graph node -> tool -> LLM call -> HTTP request), a no-op without it."""
+    if not TRACING_ENABLED:
+        yield _NO_SPAN
+        return
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+def traced_node(node: str):
+    """Runs an async graph node in a span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(f"node.{node}", node=node):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrumented_tool(func):
+    """Counts and times an async tool and runs it in a span. Goes under @tool, the signature is kept for its schema."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with span(f"tool.{name}", tool=name):
+                result = await func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - started, tool=name)
+            TOOL_CALLS.inc(tool=name, outcome=outcome)
+    return wrapper
@@ -0,0 +1,133 @@
+import os
+import re
+import logging
+from typing import NamedTuple
+from src.utils.metrics import PREROUTER_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+PREROUTER_ENABLED = os.getenv("PREROUTER_ENABLED", "true").lower() == "true"
+PREROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("PREROUTER_CONFIDENCE_THRESHOLD", "0.9"))
+
+class PreRouteDecision(NamedTuple):
+    tool_name: str
+    confidence: float
+    reason: str
+
+# Rule patterns, matched against the whole normalized message.
+# _START_GAME_RE only applies when there's no game; _RESET_GAME_RE and _HINT_RE only during a game.
+_START_GAME_RE = re.compile(
+    r"^(yes|yeah|yep|sure|ok(ay)?|ready|i'?m ready|let'?s (play|go|start)|start( a)?( new)? game|new game|play( again)?|play a game)[.!]*$"
+)
+_RESET_GAME_RE = re.compile(
+    r"^(play again|new game|start over|restart|i give up|give up|exit( game)?|quit( game)?|stop( playing)?|end( the)? game)[.!]*$"
+)
+_HINT_RE = re.compile(
+    r"^((can i (get|have)|could i (get|have)|may i have|(can|could) you give me|give me|get me|i need|i want)( a| another)? (hint|clue)( please)?"
+    r"|(hint|clue)( please)?|another (hint|clue)( please)?|i'?m stuck)[?.!]*$"
+)
+
+# Tiny keyword classifier for the ambiguous question/guess cases. Scores are
+# deliberately below the default threshold so they only short-circuit the LLM
+# when the threshold is lowered after checking them against production traffic.
+_QUESTION_OPENERS = ("does it", "do you", "can it", "can you", "is it made", "is it used", "is it bigger", "is it smaller",
+                     "how", "what", "where", "when", "why", "who", "which", "would", "could", "has it", "was it")
+_GUESS_RE = re.compile(r"^(is it|it'?s|maybe|i think it'?s|my guess is)( an?| the)? [\w' -]{1,30}\?*$")
+
+def _normalize(message: str) -> str:
+    return re.sub(r"\s+", " ", message.strip().lower())
+
+def _classify(text: str, has_secret: bool) -> PreRouteDecision | None:
+    if not has_secret:
+        return None
+    if text.startswith(_QUESTION_OPENERS) and text.endswith("?"):
+        return PreRouteDecision("answer_question", 0.8, "classifier:question")
+    if _GUESS_RE.match(text):
+        return PreRouteDecision("check_guess", 0.7, "classifier:guess")
+    return None
+
+def classify_intent(user_message: str, secret_answer: str | None) -> PreRouteDecision | None:
+    """
+    Deterministic intent classification for obvious cases.
+    Returns the best decision (which may be below the threshold), or None if nothing matched.
+    """
+    text = _normalize(user_message)
+    has_secret = bool(secret_answer)
+
+    if text == "page_load":
+        if not has_secret:
+            return PreRouteDecision("generate_mystery_item", 1.0, "rule:page_load_new_game")
+        return PreRouteDecision("general_chat", 1.0, "rule:page_load_reminder")
+
+    if has_secret:
+        if _RESET_GAME_RE.match(text):
+            return PreRouteDecision("reset_game", 0.95, "rule:reset_game")
+        if _HINT_RE.match(text):
+            return PreRouteDecision("give_hint", 0.95, "rule:hint")
+    elif _START_GAME_RE.match(text):
+        return PreRouteDecision("generate_mystery_item", 0.95, "rule:start_game")
+
+    return _classify(text, has_secret)
+
+def is_plain_hint_request(user_message: str) -> bool:
+    """True for bare hint requests ("hint please", "give me another clue") that don't need a custom reply."""
+    return bool(_HINT_RE.match(_normalize(user_message)))
+
+def build_tool_args(tool_name: str, user_message: str, secret_answer: str | None) -> dict:
+    """Builds the tool call args the agent LLM would have produced for the given tool."""
+    if tool_name == "generate_mystery_item":
+        return {}
+    if tool_name == "reset_game":
+        return {"secret_answer": secret_answer}
+    if tool_name == "general_chat":
+        return {"user_message": user_message}
+    if tool_name == "check_guess":
+        return {"user_guess": user_message, "secret_answer": secret_answer}
+    if tool_name == "answer_question":
+        return {"user_question": user_message, "secret_answer": secret_answer}
+    if tool_name == "give_hint":
+        return {"user_message": user_message, "secret_answer": secret_answer}
+    raise ValueError(f"Unknown tool: {tool_name}")
+
+# Hit-rate counters ------------------------------------------------------------
+def pre_route(user_message: str | None, secret_answer: str | None) -> PreRouteDecision | None:
+    """
+    Returns a decision when the pre-router is confident enough to skip the agent LLM, else None.
+    Every call is counted so the hit rate (= agent LLM calls saved) can be monitored.
+    """
+    if not PREROUTER_ENABLED or user_message is None:
+        return None
+
+    decision = classify_intent(user_message, secret_answer)
+    hit = decision is not None and decision.confidence >= PREROUTER_CONFIDENCE_THRESHOLD
+
+    if hit:
+        PREROUTER_DECISIONS.inc(result="hit", tool=decision.tool_name)
+    elif decision is not None:
+        PREROUTER_DECISIONS.inc(result="below_threshold", tool=decision.tool_name)
+    else:
+        PREROUTER_DECISIONS.inc(result="miss")
+
+    if hit:
+        logger.info(
+            "--- pre-router: %s (%s, confidence=%s) ---", decision.tool_name, decision.reason, decision.confidence,
+            extra={"category": "turn"},
+        )
+        return decision
+    return None
+
+def get_prerouter_stats() -> dict:
+    """Snapshot of the pre-router counters."""
+    decisions = PREROUTER_DECISIONS.values()
+    calls = sum(decisions.values())
+    hits_by_tool = {tool: count for (result, tool), count in decisions.items() if result == "hit"}
+    hits = sum(hits_by_tool.values())
+    return {
+        "enabled": PREROUTER_ENABLED,
+        "confidence_threshold": PREROUTER_CONFIDENCE_THRESHOLD,
+        "calls": calls,
+        "hits": hits,
+        "below_threshold": sum(count for (result, _), count in decisions.items() if result == "below_threshold"),
+        "hit_rate": hits / calls if calls else 0.0,
+        "hits_by_tool": hits_by_tool,
+    }
@@ -63,6 +63,19 @@ Based on the game context provided, adapt your responses:
 Take account of the conversation history and incorporate it into your response.
 """
 
+def hint_ladder_system_prompt(secret_answer: str, hint_count: int) -> str:
+    """Prompt that asks for an ordered list of hints for the secret answer, from vague to specific."""
+    return f"""
+You are a Guessing Game agent. The user plays by asking questions and making guesses to a secret answer that's either a thing, place, or person.
+Your job is to write {hint_count} hints for the secret answer, ordered from vague to very specific.
+The first hint should only narrow down the category, the last one should nearly give it away.
+IMPORTANT: Do not say the secret answer or variations/parts of the answer in any hint!
+
+Write each hint as a short, friendly sentence addressed to the player, one hint per line, with no numbering or extra text.
+
+The secret answer is: {secret_answer}.
+"""
+
 game_agent_system_prompt = """
 You are a Guessing Game agent. The user plays by asking questions and making guesses to a secret answer that's either a thing, place, or person.
 Your only job is to decide which tool to use based on the user's message. You must always choose one tool.
@@ -79,20 +92,43 @@ Tool Selection Rules:
 
 Important: When no game is active and the user shows any interest in playing (agreement, readiness, etc.), ALWAYS use `generate_mystery_item` to start the game.
 
-When calling tools that require context, use the secret_answer and history provided in your system message context.
+When calling tools that require it, use the secret_answer provided in your system message context. The tools read the conversation history themselves.
 
 Tool Parameter Requirements:
 - The `user_message`, `user_guess`, and `user_question` parameters should always be the most recent message from the user.
 - `generate_mystery_item`: no parameters
 - `reset_game`: requires `secret_answer` (if a game is in progress)
-- `check_guess`: requires `user_guess`, `secret_answer`, and `history`
-- `answer_question`: requires `user_question`, `secret_answer`, and `history`
-- `general_chat`: requires `user_message` and `history`
-- `give_hint`: requires `user_message`, `secret_answer`, and `history`
+- `check_guess`: requires `user_guess` and `secret_answer`
+- `answer_question`: requires `user_question` and `secret_answer`
+- `general_chat`: requires `user_message`
+- `give_hint`: requires `user_message` and `secret_answer`
+"""
+
+fused_turn_system_prompt = """
+You are a Guessing Game agent. The user plays by asking questions and making guesses to a secret answer that's either a thing, place, or person.
+A game is in progress. In ONE response you must both pick the action for the user's message and write the reply the user will see.
+There are no limits to number of questions or guesses a user can ask or make.
+
+Actions:
+- `check_guess`: the user is making a direct guess about what the item is (e.g., "is it a car?", "car").
+  Use good judgement to determine correctness - don't be super strict (Eg, "piano player" is correct for "pianist"), and set `is_correct`.
+  If correct, congratulate them, reveal the secret answer and ask if they want to play again.
+  If incorrect, be encouraging and give increasingly helpful hints based on how many guesses they've made.
+- `answer_question`: the user is asking about properties of the item. Answer honestly PLUS some context to help with their next guess,
+  but don't repeat the question back to them.
+- `give_hint`: the user asks for a hint or is frustrated. Give a hint that gets more obvious the more questions they've asked.
+- `reset_game`: the user wants to start over or stop playing (e.g., "I give up", "exit game").
+- `general_chat`: anything unrelated to the game (jokes, general questions). Respond to it and briefly mention returning to the game.
+
+IMPORTANT: Unless the guess is correct, do not say the secret answer or variations/parts of the answer in your response!
+Keep responses concise, no more than 50 words.
 """
 
 # Generate Mystery Item ------------------------
 import random
+import logging
+
+logger = logging.getLogger(__name__)
 
 TOPICS = [
     "Household Items",
@@ -122,13 +158,12 @@ LETTERS = [
     "W", "H", "M", "R", "Y", "N", "G", "B", "V", "L"
 ]
 
-def generate_mystery_item_system_prompt() -> str:
-    """Generate the system prompt with a randomly selected topic and starting letter."""
-    topic = random.choice(TOPICS)
+def generate_mystery_item_system_prompt(topic: str | None = None) -> str:
+    """Generate the system prompt with a randomly selected (or the given) topic and starting letter."""
+    topic = topic or random.choice(TOPICS)
     letters = random.sample(LETTERS, 5)
     letters_str = ", ".join(letters)
-    print(f"topic: {topic}")
-    print(f"letters: {letters_str}")
+    logger.debug("topic: %s, letters: %s", topic, letters_str, extra={"category": "prompt"})
     
     return f"""
 You are a Guessing Game agent. The user plays by asking questions and making guesses to a secret answer that's either a thing, place, or person.
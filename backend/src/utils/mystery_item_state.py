@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+
+MAX_TURNS = 50  # older turns drop out of the state, prompts only use the most recent ones anyway
+MAX_HISTORY_LINES = 20  # rendered lines kept for prompts (10 turns)
+
+@dataclass(slots=True, frozen=True)
+class GameTurn:
+    """One finished turn of the game: the user's message, the reply shown to them, and the tool that produced it."""
+    question: str
+    answer: str
+    tool: str | None = None
+
+def render_turn_lines(turn: GameTurn) -> list[str]:
+    """Renders a turn into the prompt history lines, done once when the turn is recorded."""
+    return [f"HumanMessage: {turn.question}", f"AIMessage: {turn.answer}"]
+
+def append_history_lines(left: list[str] | None, right: list[str] | None) -> list[str]:
+    """Reducer for AgentState.history_lines: a ring of the last MAX_HISTORY_LINES rendered lines."""
+    lines = list(left or []) + list(right or [])
+    return lines[-MAX_HISTORY_LINES:]
+
+def append_turns(left: list[GameTurn] | None, right: list[GameTurn] | None) -> list[GameTurn]:
+    """Reducer for AgentState.turns: appends new turns and keeps only the last MAX_TURNS."""
+    turns = list(left or []) + list(right or [])
+    return turns[-MAX_TURNS:]
@@ -0,0 +1,46 @@
+import os
+import logging
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from src.utils.metrics import LLM_CALLS, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Adds provider cache-control hints (honoured by e.g. Anthropic/Gemini models on OpenRouter) to the cacheable blocks
+PROMPT_CACHE_HINTS = os.getenv("PROMPT_CACHE_HINTS", "false").lower() == "true"
+
+def _block(text: str, cacheable: bool) -> str | list[dict]:
+    if not (PROMPT_CACHE_HINTS and cacheable):
+        return text
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+def build_prompt(static_prompt: str, session_block: str | None = None, turn_tail: str | None = None) -> list[BaseMessage]:
+    """
+    Lays out a prompt so providers can reuse its prefix across calls:
+    1. static_prompt: the instructions, byte-identical for every call of the same type
+    2. session_block: per-game context that only changes with a new secret (secret answer, hint ladder)
+    3. turn_tail: everything that changes every turn (history, the user's message), always last
+    """
+    messages: list[BaseMessage] = [SystemMessage(content=_block(static_prompt.strip(), cacheable=True))]
+    if session_block:
+        messages.append(SystemMessage(content=_block(session_block.strip(), cacheable=True)))
+    if turn_tail:
+        messages.append(HumanMessage(content=turn_tail.strip()))
+    return messages
+
+def history_block(history: str) -> str:
+    return f"Here's the conversation history for your reference:\n{history}\n**End of conversation history**"
+
+# Cache hit accounting ------------------------------------------------------------
+def get_cache_stats() -> dict:
+    """Per call type cached-token ratio as reported by the provider (recorded by record_llm_usage)."""
+    result = {}
+    for (_, call_type, outcome), calls in LLM_CALLS.values().items():
+        if outcome == "ok":
+            stats = result.setdefault(call_type, {"calls": 0, "input_tokens": 0, "cached_tokens": 0})
+            stats["calls"] += calls
+    for (_, call_type, token_type), count in LLM_TOKENS.values().items():
+        if call_type in result and token_type in ("prompt", "cached_prompt"):
+            result[call_type]["input_tokens" if token_type == "prompt" else "cached_tokens"] += count
+    for stats in result.values():
+        stats["cached_ratio"] = stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0
+    return result
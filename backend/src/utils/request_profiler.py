@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import uuid
+import pstats
+import random
+import asyncio
+import logging
+import cProfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: without PROFILING_ENABLED the middleware isn't installed at all
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# Requests with this header are profiled: "1"/"true"/"file" writes the profile to PROFILING_DIR, "inline" adds it
+# to the JSON response, other values are ignored. The header is client controlled, so it's off unless enabled too.
+PROFILING_HEADER_ENABLED = os.getenv("PROFILING_HEADER_ENABLED", "false").lower() == "true"
+PROFILING_HEADER = os.getenv("PROFILING_HEADER", "x-profile").lower()
+_HEADER_MODES = {"1": "file", "true": "file", "file": "file", "inline": "inline"}
+# Fraction of the profiled routes' requests profiled without the header (written to PROFILING_DIR)
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join("data", "profiles"))
+PROFILING_PATHS = {p.strip() for p in os.getenv("PROFILING_PATHS", "/mystery-item/invoke,/mystery-item/reset").split(",") if p.strip()}
+_TOP_FUNCTIONS = 25
+_MAX_CALLER_DEPTH = 8
+
+# Where the self time of a function goes, first match wins. "io_wait" is the event loop blocked in
+# select/epoll, i.e. waiting for the LLM (network) or for nothing to do. "llm_client" is the openai
+# SDK/httpx/TLS work of sending requests and reading responses.
+_CATEGORIES = [
+    ("io_wait", ("select.epoll", "select.select", "select.kqueue", "select.poll")),
+    ("langchain_pydantic", ("langchain_core", "langchain_openai", "pydantic")),
+    ("llm_client", ("httpx", "httpcore", "openai", "h11", "h2/", "anyio", "ssl", "socket")),
+    ("checkpoint", ("langgraph/checkpoint", "checkpointer", "pickle", "msgpack", "sqlite3", "jsonplus")),
+    ("helpers_regex", ("mystery_item_helpers", "mystery_item_prerouter", "guess_matcher", "mystery_item_state", "/re/", "_sre", "difflib")),
+    ("prompt_tokens", ("tiktoken", "token_budget", "prompt_builder")),
+    ("graph_runtime", ("langgraph",)),
+    ("imports", ("importlib", "marshal.loads")),  # lazy imports on a first call
+    ("app", (f"{os.sep}src{os.sep}", "main.py")),
+    ("asyncio", ("asyncio",)),
+    ("web", ("starlette", "fastapi", "uvicorn")),
+]
+
+def _category(filename: str, function: str) -> str:
+    location = f"{filename}:{function}"
+    for category, markers in _CATEGORIES:
+        if any(marker in location for marker in markers):
+            return category
+    return "other"
+
+def _key_category(stats: pstats.Stats, key: tuple, cache: dict) -> str:
+    """
+    Category of a function. Generic ones (builtins like isinstance, typing, abc, ...) count for
+    the nearest caller that has a category, following the caller with the most time.
+    """
+    if key in cache:
+        return cache[key]
+    category = _category(key[0], key[2])
+    seen = {key}
+    current = key
+    while category == "other" and len(seen) < _MAX_CALLER_DEPTH:
+        callers = stats.stats[current][4]
+        if not callers:
+            break
+        current = max(callers, key=lambda c: callers[c][3])
+        if current in seen:
+            break
+        seen.add(current)
+        category = cache.get(current) or _category(current[0], current[2])
+    cache[key] = category
+    return category
+
+def _function_label(key: tuple) -> str:
+    filename, line, function = key
+    if filename == "~":
+        return function
+    parts = filename.split(os.sep)
+    return f"{os.sep.join(parts[-2:])}:{line}({function})"
+
+def build_report(profile: cProfile.Profile, wall_seconds: float) -> dict:
+    """Self time per category plus the top functions, from a finished cProfile run."""
+    stats = pstats.Stats(profile)
+    breakdown: dict[str, float] = {}
+    categories: dict[tuple, str] = {}
+    rows = []
+    for key, (_, calls, self_time, cumulative, _) in stats.stats.items():
+        category = _key_category(stats, key, categories)
+        breakdown[category] = breakdown.get(category, 0.0) + self_time
+        rows.append((self_time, cumulative, calls, key, category))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    waiting = breakdown.get("io_wait", 0.0) + breakdown.get("llm_client", 0.0)
+    return {
+        "wall_ms": round(wall_seconds * 1000, 1),
+        "profiled_ms": round(stats.total_tt * 1000, 1),
+        # Time the event loop spent on this process' own work, LLM waiting and HTTP handling excluded
+        "non_llm_ms": round((stats.total_tt - waiting) * 1000, 1),
+        "breakdown_ms": {category: round(seconds * 1000, 1) for category, seconds in sorted(breakdown.items(), key=lambda item: -item[1])},
+        "top": [
+            {
+                "function": _function_label(key),
+                "category": category,
+                "self_ms": round(self_time * 1000, 2),
+                "cumulative_ms": round(cumulative * 1000, 2),
+                "calls": calls,
+            }
+            for self_time, cumulative, calls, key, category in rows[:_TOP_FUNCTIONS]
+        ],
+    }
+
+def _write_profile(profile: cProfile.Profile, report: dict, name: str) -> str:
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    path = os.path.join(PROFILING_DIR, name)
+    profile.dump_stats(f"{path}.prof")  # open with snakeviz / python -m pstats
+    with open(f"{path}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    return f"{path}.prof"
+
+class RequestProfilerMiddleware:
+    """
+    ASGI middleware that runs one request of PROFILING_PATHS under cProfile, when it is sampled or
+    (with PROFILING_HEADER_ENABLED) has the PROFILING_HEADER, and reports where its time went.
+    cProfile sees the whole event loop thread, so requests running at the same time are counted
+    too (the report says how many), and only one request is profiled at a time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._profiling = False
+        self._in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in PROFILING_PATHS:
+            return await self.app(scope, receive, send)
+        mode = self._mode(scope)
+        self._in_flight += 1
+        try:
+            if mode is None:
+                return await self.app(scope, receive, send)
+            if self._profiling:
+                logger.info(f"--- another request is being profiled, not profiling {scope['path']} ---")
+                return await self.app(scope, receive, send)
+            await self._profile(scope, receive, send, mode)
+        finally:
+            self._in_flight -= 1
+
+    def _mode(self, scope) -> str | None:
+        if PROFILING_HEADER_ENABLED:
+            for name, value in scope["headers"]:
+                if name.decode("latin-1").lower() == PROFILING_HEADER:
+                    mode = _HEADER_MODES.get(value.decode("latin-1").strip().lower())
+                    if mode:
+                        return mode
+        if PROFILING_SAMPLE_RATE and random.random() < PROFILING_SAMPLE_RATE:
+            return "file"
+        return None
+
+    async def _profile(self, scope, receive, send, mode: str) -> None:
+        start_message = None
+        body = []
+
+        async def capture(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        self._profiling = True
+        concurrent = self._in_flight - 1
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profile.disable()
+            self._profiling = False
+        wall_seconds = time.perf_counter() - started
+
+        profile_id = uuid.uuid4().hex[:12]
+        report = build_report(profile, wall_seconds)
+        report.update({"id": profile_id, "path": scope["path"], "status": start_message["status"], "concurrent_requests": concurrent})
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['path'].strip('/').replace('/', '_')}-{profile_id}"
+        report["file"] = await asyncio.to_thread(_write_profile, profile, report, name) if mode == "file" else None
+        logger.info(
+            f"--- profiled {scope['path']} in {report['wall_ms']}ms, non-LLM {report['non_llm_ms']}ms: {report['breakdown_ms']} ---"
+        )
+
+        content = b"".join(body)
+        if mode == "inline":
+            try:
+                payload = json.loads(content)
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict):
+                content = json.dumps({**payload, "profile": report}).encode()
+
+        breakdown = ";".join(f"{category}={ms}" for category, ms in report["breakdown_ms"].items())
+        headers = [(k, v) for k, v in start_message["headers"] if k.lower() != b"content-length"]
+        headers += [
+            (b"content-length", str(len(content)).encode()),
+            (b"x-profile-id", profile_id.encode()),
+            (b"x-profile-breakdown", breakdown.encode()),
+        ]
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
@@ -0,0 +1,84 @@
+import os
+import logging
+from functools import lru_cache
+from typing import Sequence
+from langchain_core.messages import BaseMessage
+from src.utils.metrics import LLM_PROMPT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# History token budget per prompt type, the static instructions and the user's message come on top
+DEFAULT_HISTORY_TOKEN_BUDGETS = {
+    "router": 300,
+    "answer": 600,
+    "hint": 600,
+    "guess": 600,
+    "chat": 400,
+    "fused": 600,
+}
+HISTORY_TOKEN_BUDGETS = {
+    prompt_type: int(os.getenv(f"HISTORY_TOKEN_BUDGET_{prompt_type.upper()}", budget))
+    for prompt_type, budget in DEFAULT_HISTORY_TOKEN_BUDGETS.items()
+}
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TIKTOKEN_ENCODING)
+    except Exception as e:
+        # e.g. no network to download the BPE file, fall back to a ~4 chars/token estimate
+        logger.warning(f"tiktoken encoding '{TIKTOKEN_ENCODING}' unavailable, estimating tokens: {e}")
+        return None
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (cached, history lines are counted again on every turn)."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text))
+
+def fit_history_to_budget(history_lines: Sequence[str], prompt_type: str) -> list[str]:
+    """Keeps the most recent history lines that fit in the prompt type's token budget."""
+    budget = HISTORY_TOKEN_BUDGETS.get(prompt_type)
+    if budget is None:
+        return list(history_lines)
+
+    kept = []
+    used = 0
+    for line in reversed(history_lines):
+        tokens = count_tokens(line) + 1  # + newline
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    kept.reverse()
+    return kept
+
+# Prompt size accounting ------------------------------------------------------------
+def count_prompt_tokens(prompt_type: str, messages: Sequence[BaseMessage]) -> int:
+    """Counts the tokens sent for one LLM call and adds them to the per prompt type stats."""
+    tokens = 0
+    for msg in messages:
+        if isinstance(msg.content, str):
+            tokens += count_tokens(msg.content)
+        else:  # content blocks, e.g. with cache-control hints
+            tokens += sum(count_tokens(block.get("text", "")) for block in msg.content if isinstance(block, dict))
+    LLM_PROMPT_TOKENS.observe(tokens, call_type=prompt_type)
+    logger.info("--- %s prompt: %s tokens ---", prompt_type, tokens, extra={"category": "prompt"})
+    return tokens
+
+def get_token_stats() -> dict:
+    """Per prompt type token counts: total, average and max tokens sent."""
+    return {
+        prompt_type: {
+            "calls": summary["count"],
+            "prompt_tokens": int(summary["sum"]),
+            "max_prompt_tokens": summary["max"],
+            "avg_prompt_tokens": summary["sum"] / summary["count"],
+            "history_budget": HISTORY_TOKEN_BUDGETS.get(prompt_type),
+        }
+        for (prompt_type,), summary in LLM_PROMPT_TOKENS.summaries().items()
+    }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The config modules refuse to import without a key, the tests never call the API
+os.environ.setdefault("OPENROUTER_API_KEY", "test-key")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
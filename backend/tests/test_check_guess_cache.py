@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from src.services import mystery_item_service
+from src.services.answer_cache import AnswerCache
+
+@pytest.fixture
+def llm_replies(monkeypatch):
+    """Fresh answer cache, and a fake _call_llm answering INCORRECT with the number of the call."""
+    calls = []
+
+    async def fake_call_llm(kind, prompt, call_type, priority=None):
+        calls.append(call_type)
+        return SimpleNamespace(content=f"INCORRECT: reply {len(calls)}")
+
+    monkeypatch.setattr(mystery_item_service, "answer_cache", AnswerCache(backend="memory"))
+    monkeypatch.setattr(mystery_item_service, "_call_llm", fake_call_llm)
+    monkeypatch.setattr(mystery_item_service, "ANSWER_CACHE_ENABLED", True)
+    return calls
+
+def _check_guess(user_guess: str, guesses_made: int) -> str:
+    command = asyncio.run(mystery_item_service.check_guess.coroutine(
+        user_guess=user_guess,
+        secret_answer="Toaster",
+        state={"guesses_made": guesses_made, "history_lines": []},
+        tool_call_id="call-1",
+    ))
+    return command.update["messages"][-1].content
+
+def test_same_guess_at_the_same_stage_is_served_from_the_cache(llm_replies):
+    assert _check_guess("microwave", 0) == "reply 1"
+    assert _check_guess("microwave", 1) == "reply 1"
+    assert llm_replies == ["guess"]
+
+def test_later_guesses_do_not_reuse_an_early_stage_reply(llm_replies):
+    assert _check_guess("microwave", 0) == "reply 1"
+    assert _check_guess("microwave", 5) == "reply 2"
+    assert _check_guess("microwave", 2) == "reply 3"
+    assert len(llm_replies) == 3
+
+def test_correct_guess_is_decided_locally(llm_replies):
+    assert "Toaster" in _check_guess("a toaster", 3)
+    assert llm_replies == []
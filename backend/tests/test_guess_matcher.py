@@ -0,0 +1,57 @@
+import pytest
+from src.utils.guess_matcher import match_guess, normalize_guess, edit_distance
+
+@pytest.mark.parametrize("guess, secret", [
+    ("Piano", "piano"),
+    ("a piano!", "Piano"),
+    ("my guess is the Eiffel Tower", "Eiffel Tower"),
+    ("pianos", "Piano"),
+    ("apple", "Apples"),
+    ("sail boat", "Sailboat"),
+    ("tv", "Television"),
+    ("bikes", "Bicycle"),
+    ("specs", "Glasses"),
+    ("nyc", "New York City"),
+])
+def test_clear_matches_are_correct(guess, secret):
+    assert match_guess(guess, secret).verdict == "correct"
+
+@pytest.mark.parametrize("guess, secret", [
+    # Real words close to the answer, a local "correct" would end the game
+    ("desert", "Dessert"),
+    ("mustard", "Custard"),
+    ("statue", "Statute"),
+    ("capitol", "Capital"),
+    ("glasses", "Glass"),
+    ("glass", "Glasses"),
+])
+def test_near_misses_go_to_the_llm(guess, secret):
+    assert match_guess(guess, secret).verdict is None
+
+@pytest.mark.parametrize("guess, secret", [
+    # Synonyms the check_guess prompt should accept ("don't be super strict")
+    ("couch", "Sofa"),
+    ("football", "Soccer"),
+    ("physician", "Doctor"),
+    ("jet", "Airplane"),
+    ("big apple", "New York City"),
+])
+def test_unrelated_looking_guesses_go_to_the_llm(guess, secret):
+    assert match_guess(guess, secret).verdict is None
+
+def test_matcher_never_decides_incorrect():
+    assert match_guess("dog", "Submarine").verdict is None
+    assert match_guess("dog", "Submarine").reason == "different"
+
+def test_typo_candidates_are_only_labelled():
+    match = match_guess("telescpe", "Telescope")
+    assert match.verdict is None
+    assert match.reason.startswith("typo:")
+
+def test_normalize_guess():
+    assert normalize_guess("  The Café,  au Lait! ") == "cafe au lait"
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("", "abc") == 3
+    assert edit_distance("same", "same") == 0
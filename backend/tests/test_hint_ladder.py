@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+from langchain_core.runnables.config import var_child_runnable_config
+from src.services import hint_ladder
+from src.services.hint_ladder import schedule_hint_ladder, pop_ready_hint_ladder, _parse_ladder
+
+class FakeLLM:
+    def __init__(self, content: str):
+        self.content = content
+        self.configs = []
+
+    async def ainvoke(self, messages):
+        self.configs.append(var_child_runnable_config.get())
+        return SimpleNamespace(content=self.content)
+
+async def _wait_for_background_tasks():
+    while hint_ladder._background_tasks:
+        await asyncio.gather(*hint_ladder._background_tasks)
+
+def test_parse_ladder_drops_numbering_and_leaks():
+    content = "1. It is made of metal\n2) You find it in a kitchen\n- It is a Toaster\n\n* It gets hot"
+    assert _parse_ladder(content, "Toaster") == ["It is made of metal", "You find it in a kitchen", "It gets hot"]
+
+def test_ready_ladder_is_merged_once_for_the_same_secret():
+    llm = FakeLLM("1. Vague\n2. Specific")
+
+    async def run():
+        schedule_hint_ladder(llm, "thread-1", "Toaster")
+        await _wait_for_background_tasks()
+        return pop_ready_hint_ladder("thread-1", "Toaster"), pop_ready_hint_ladder("thread-1", "Toaster")
+
+    first, second = asyncio.run(run())
+    assert first == {"hint_ladder": ["Vague", "Specific"], "hint_ladder_secret": "Toaster", "hints_used": 0}
+    assert second == {}
+
+def test_ladder_for_an_older_secret_is_dropped():
+    llm = FakeLLM("1. Vague")
+
+    async def run():
+        schedule_hint_ladder(llm, "thread-2", "Toaster")
+        await _wait_for_background_tasks()
+        return pop_ready_hint_ladder("thread-2", "Piano")
+
+    assert asyncio.run(run()) == {}
+
+def test_background_call_does_not_inherit_the_turns_run_context():
+    llm = FakeLLM("1. Vague")
+
+    async def run():
+        # As if scheduled from the generate_mystery_item tool inside a graph run
+        var_child_runnable_config.set({"callbacks": ["turn's handler"]})
+        schedule_hint_ladder(llm, "thread-3", "Toaster")
+        await _wait_for_background_tasks()
+        pop_ready_hint_ladder("thread-3", "Toaster")
+
+    asyncio.run(run())
+    assert llm.configs == [None]
+
+# give_hint ------------------------------------------------------------
+LADDER_STATE = {"hint_ladder": ["It is made of metal", "You find it in a kitchen"], "hint_ladder_secret": "Toaster", "history_lines": []}
+
+def _give_hint(monkeypatch, user_message: str, state: dict):
+    from src.services import mystery_item_service
+    calls = []
+
+    async def fake_call_llm(kind, prompt, call_type, priority=None):
+        calls.append(prompt)
+        return SimpleNamespace(content="An LLM hint")
+
+    monkeypatch.setattr(mystery_item_service, "_call_llm", fake_call_llm)
+    command = asyncio.run(mystery_item_service.give_hint.coroutine(
+        user_message=user_message, secret_answer="Toaster", state=state, tool_call_id="call-1",
+    ))
+    return command.update, calls
+
+def test_plain_hint_request_is_served_from_the_ladder(monkeypatch):
+    update, calls = _give_hint(monkeypatch, "Can I get a hint?", {**LADDER_STATE, "hints_used": 1})
+    assert update["last_response"] == "You find it in a kitchen"
+    assert update["hints_used"] == 2
+    assert calls == []
+
+def test_custom_hint_request_or_used_up_ladder_asks_the_llm(monkeypatch):
+    update, calls = _give_hint(monkeypatch, "Can I get a hint about its colour?", LADDER_STATE)
+    assert update["last_response"] == "An LLM hint" and "hints_used" not in update
+    assert "You find it in a kitchen" in str(calls[0])  # the ladder is still passed along
+
+    update, calls = _give_hint(monkeypatch, "Can I get a hint?", {**LADDER_STATE, "hints_used": 2})
+    assert update["last_response"] == "An LLM hint" and len(calls) == 1
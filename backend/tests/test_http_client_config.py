@@ -0,0 +1,49 @@
+import time
+import asyncio
+import httpx
+import pytest
+from src.config.http_client_config import _CountedAsyncStream, _CountedSyncStream, get_http_pool_stats
+
+REQUEST = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+
+class SlowAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: int, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def __aiter__(self):
+        for i in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            yield f"chunk {i}".encode()
+
+def _read_async(stream_factory, consumer_delay: float = 0.0) -> list[bytes]:
+    async def run():
+        stream = stream_factory(asyncio.get_running_loop().time())
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            await asyncio.sleep(consumer_delay)
+        return chunks
+    return asyncio.run(run())
+
+def test_body_read_within_the_deadline_passes_through():
+    chunks = _read_async(lambda now: _CountedAsyncStream(SlowAsyncStream(3, 0.001), REQUEST, now + 5))
+    assert chunks == [b"chunk 0", b"chunk 1", b"chunk 2"]
+
+def test_slow_body_hits_the_total_deadline():
+    before = get_http_pool_stats()["total_timeouts"]
+    with pytest.raises(httpx.ReadTimeout, match="Total timeout"):
+        _read_async(lambda now: _CountedAsyncStream(SlowAsyncStream(10, 0.03), REQUEST, now + 0.05))
+    assert get_http_pool_stats()["total_timeouts"] == before + 1
+
+def test_slow_consumer_is_not_cancelled_between_chunks():
+    # the deadline passes while the consumer is busy, only the next read fails
+    with pytest.raises(httpx.ReadTimeout):
+        _read_async(lambda now: _CountedAsyncStream(SlowAsyncStream(3, 0), REQUEST, now + 0.02), consumer_delay=0.05)
+
+def test_sync_body_checks_the_deadline_between_chunks():
+    stream = _CountedSyncStream(httpx.ByteStream(b"body"), REQUEST, time.monotonic() + 5)
+    assert list(stream) == [b"body"]
+    expired = _CountedSyncStream(httpx.ByteStream(b"body"), REQUEST, time.monotonic() - 1)
+    with pytest.raises(httpx.ReadTimeout):
+        list(expired)
@@ -0,0 +1,27 @@
+import logging
+import pytest
+from src.config import llm_config
+
+def test_default_llm_is_built_once_on_first_access(monkeypatch, caplog):
+    monkeypatch.delitem(llm_config.__dict__, "llm", raising=False)
+    with caplog.at_level(logging.INFO, logger=llm_config.__name__):
+        first = llm_config.llm
+    assert llm_config.llm is first
+    assert "LLM initialized successfully" in caplog.text
+    monkeypatch.delitem(llm_config.__dict__, "llm")
+
+def test_failed_initialization_is_logged_and_raised(monkeypatch, caplog):
+    monkeypatch.delitem(llm_config.__dict__, "llm", raising=False)
+
+    def broken_get_llm(*args, **kwargs):
+        raise RuntimeError("bad base url")
+
+    monkeypatch.setattr(llm_config, "get_llm", broken_get_llm)
+    with caplog.at_level(logging.ERROR, logger=llm_config.__name__), pytest.raises(RuntimeError, match="bad base url"):
+        llm_config.llm
+    assert "Error initializing the default LLM client" in caplog.text
+    assert "llm" not in llm_config.__dict__
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        llm_config.not_a_setting
@@ -0,0 +1,184 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from src.services import llm_hedging as hedging_module
+from src.services.llm_hedging import CircuitBreaker, LLMHedger
+from src.utils.metrics import LLM_ATTEMPT_SECONDS, LLM_FALLBACKS, LLM_HEDGES
+
+def _connection_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError(request=httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions"))
+
+# circuit breaker ------------------------------------------------------------
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_BREAKER_FAILURE_THRESHOLD", 2)
+    breaker = CircuitBreaker()
+    breaker.record_failure()
+    breaker.record_success()  # resets the streak
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+def test_half_open_breaker_reopens_on_one_failure_and_closes_on_success(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(hedging_module, "LLM_BREAKER_RESET_SECONDS", 0)
+    breaker = CircuitBreaker()
+    breaker.record_failure()
+    assert breaker.state == "half_open" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.opened_at is not None
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_half_open_breaker_lets_a_single_probe_through(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(hedging_module, "LLM_BREAKER_RESET_SECONDS", 0)
+    breaker = CircuitBreaker()
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow() and not breaker.allow()  # the rest wait for the probe
+    breaker.release_probe()  # e.g. the probe was cancelled
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+def _half_open(hedger: LLMHedger, model: str) -> None:
+    breaker = hedger._breakers[model]
+    breaker.failures = hedging_module.LLM_BREAKER_FAILURE_THRESHOLD
+    breaker.opened_at = -float("inf")  # opened long ago
+
+def test_backlog_goes_to_the_fallback_while_the_probe_runs(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_FALLBACK_MODELS", ["backup"])
+    hedger = LLMHedger()
+    _half_open(hedger, "primary")
+    tried = []
+
+    async def make_call(model: str, silent: bool):
+        tried.append(model)
+        await asyncio.sleep(0.01)
+        return model
+
+    async def run():
+        return await asyncio.gather(*(hedger.call("test_probe", "primary", make_call) for _ in range(4)))
+
+    assert asyncio.run(run()) == ["primary", "backup", "backup", "backup"]
+    assert tried.count("primary") == 1
+    assert hedger._breakers["primary"].state == "closed"
+
+def test_probe_is_released_when_it_says_nothing_about_the_model(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_FALLBACK_MODELS", ["backup"])
+    hedger = LLMHedger()
+    _half_open(hedger, "primary")
+    _half_open(hedger, "backup")
+
+    async def bad_request(model: str, silent: bool):
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(hedger.call("test_probe_release", "primary", bad_request))
+    # neither the failed primary probe nor the unused backup probe is stuck
+    assert hedger._breakers["primary"].allow() and hedger._breakers["backup"].allow()
+
+def test_cancelled_probe_is_released(monkeypatch):
+    hedger = LLMHedger()
+    _half_open(hedger, "primary")
+
+    async def slow(model: str, silent: bool):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(hedger.call("test_probe_cancel", "primary", slow))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert hedger._breakers["primary"].state == "half_open" and hedger._breakers["primary"].allow()
+
+# fallback ------------------------------------------------------------
+def test_model_failure_falls_back_to_the_next_model(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_FALLBACK_MODELS", ["backup"])
+    tried = []
+
+    async def make_call(model: str, silent: bool):
+        tried.append(model)
+        if model == "primary":
+            raise _connection_error()
+        return model
+
+    fallbacks = LLM_FALLBACKS.value(call_type="test_fallback")
+    assert asyncio.run(LLMHedger().call("test_fallback", "primary", make_call)) == "backup"
+    assert tried == ["primary", "backup"]
+    assert LLM_FALLBACKS.value(call_type="test_fallback") == fallbacks + 1
+
+def test_other_errors_are_not_retried_on_another_model(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_FALLBACK_MODELS", ["backup"])
+    tried = []
+
+    async def make_call(model: str, silent: bool):
+        tried.append(model)
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(LLMHedger().call("test_no_fallback", "primary", make_call))
+    assert tried == ["primary"]
+
+def test_open_breaker_skips_its_model(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_FALLBACK_MODELS", ["backup"])
+    hedger = LLMHedger()
+    hedger._breakers["primary"].opened_at = float("inf")  # opened "now" for the whole test
+
+    async def make_call(model: str, silent: bool):
+        return model
+
+    assert asyncio.run(hedger.call("test_breaker", "primary", make_call)) == "backup"
+
+# hedging ------------------------------------------------------------
+def test_hedge_delay_waits_for_enough_samples(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(hedging_module, "LLM_HEDGE_MIN_DELAY", 0.5)
+    hedger = LLMHedger()
+    assert hedger.hedge_delay("test_delay") == hedging_module.LLM_HEDGE_DEFAULT_DELAY
+    for seconds in (0.1, 0.2, 0.3, 0.4, 2.0):
+        LLM_ATTEMPT_SECONDS.observe(seconds, call_type="test_delay")
+    assert hedger.hedge_delay("test_delay") == 2.0
+    monkeypatch.setattr(hedging_module, "LLM_HEDGE_PERCENTILE", 0.0)
+    assert hedger.hedge_delay("test_delay") == 0.5  # never below the minimum delay
+
+def test_slow_primary_is_hedged_and_the_first_reply_wins(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(hedging_module, "LLM_HEDGE_DEFAULT_DELAY", 0.01)
+    monkeypatch.setattr(hedging_module, "LLM_HEDGE_MODEL", "fast")
+    calls = []
+    cancelled = []
+
+    async def make_call(model: str, silent: bool):
+        calls.append((model, silent))
+        if model == "slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+        return model
+
+    hedge_wins = LLM_HEDGES.value(call_type="test_hedge", winner="hedge")
+    assert asyncio.run(LLMHedger().call("test_hedge", "slow", make_call)) == "fast"
+    assert calls == [("slow", False), ("fast", True)]  # only the primary streams its tokens
+    assert cancelled == ["slow"]
+    assert LLM_HEDGES.value(call_type="test_hedge", winner="hedge") == hedge_wins + 1
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    monkeypatch.setattr(hedging_module, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(hedging_module, "LLM_HEDGE_DEFAULT_DELAY", 1.0)
+    calls = []
+
+    async def make_call(model: str, silent: bool):
+        calls.append(model)
+        return model
+
+    assert asyncio.run(LLMHedger().call("test_no_hedge", "primary", make_call)) == "primary"
+    assert calls == ["primary"]
+    assert LLMHedger().stats()["calls"].get("test_no_hedge", {}).get("hedged", 0) == 0
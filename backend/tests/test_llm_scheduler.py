@@ -0,0 +1,138 @@
+import asyncio
+import httpx
+import openai
+import pytest
+from src.services import llm_scheduler as scheduler_module
+from src.services.llm_scheduler import (
+    LLMScheduler,
+    LLMOverloadedError,
+    INTERACTIVE,
+    BACKGROUND,
+    _TokenBucket,
+    _retry_after_seconds,
+)
+
+def _rate_limit_error(headers: dict) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, headers=headers, request=request), body=None)
+
+# token bucket ------------------------------------------------------------
+def test_unlimited_bucket_never_waits():
+    bucket = _TokenBucket(0, 0)
+    bucket.take(1000, now=0.0)
+    assert bucket.wait_time(1000, now=0.0) == 0.0
+
+def test_bucket_spends_its_burst_then_refills_at_the_rate():
+    bucket = _TokenBucket(rate=2, capacity=4)
+    bucket.updated = 0.0
+    for _ in range(4):
+        assert bucket.wait_time(1, now=0.0) == 0.0
+        bucket.take(1, now=0.0)
+    assert bucket.wait_time(1, now=0.0) == 0.5
+    assert bucket.wait_time(1, now=0.5) == 0.0
+    assert bucket.wait_time(100, now=10.0) == 0.0  # refill is capped at the capacity...
+    bucket.take(100, now=10.0)  # ...and an oversized request takes all of it instead of waiting forever
+    assert bucket.wait_time(4, now=10.0) == 2.0
+
+def test_retry_after_header_and_openrouter_reset():
+    assert _retry_after_seconds(_rate_limit_error({"retry-after": "3"})) == 3.0
+    assert _retry_after_seconds(_rate_limit_error({})) == scheduler_module.LLM_DEFAULT_RETRY_AFTER
+    assert _retry_after_seconds(_rate_limit_error({"x-ratelimit-reset": "0"})) == 0.0
+
+# scheduler ------------------------------------------------------------
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_MAX_CONCURRENCY", 1)
+
+def test_interactive_calls_run_before_queued_background_calls(one_slot):
+    order = []
+
+    async def run():
+        scheduler = LLMScheduler()
+        release = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        async def record(name: str):
+            order.append(name)
+
+        holding = asyncio.create_task(scheduler.run(blocker))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(scheduler.run(lambda: record("background"), priority=BACKGROUND))]
+        await asyncio.sleep(0)
+        queued.append(asyncio.create_task(scheduler.run(lambda: record("interactive"), priority=INTERACTIVE)))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holding, *queued)
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert order == ["interactive", "background"]
+    assert stats["dispatched"] == 3 and stats["active"] == 0
+
+def test_full_background_queue_rejects_right_away(one_slot, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_QUEUE_MAX_BACKGROUND", 1)
+
+    async def run():
+        scheduler = LLMScheduler()
+        release = asyncio.Event()
+        holding = asyncio.create_task(scheduler.run(release.wait))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(scheduler.run(lambda: asyncio.sleep(0), priority=BACKGROUND))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError, match="queue is full"):
+            await scheduler.run(lambda: asyncio.sleep(0), priority=BACKGROUND)
+        interactive = asyncio.create_task(scheduler.run(lambda: asyncio.sleep(0)))  # its own, larger share
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holding, waiting, interactive)
+        return scheduler.stats()
+
+    assert asyncio.run(run())["rejected"] == 1
+
+def test_waiting_longer_than_the_queue_timeout_is_rejected(one_slot, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_QUEUE_TIMEOUT", 0.05)
+
+    async def run():
+        scheduler = LLMScheduler()
+        release = asyncio.Event()
+        holding = asyncio.create_task(scheduler.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError, match="Waited more than"):
+            await scheduler.run(lambda: asyncio.sleep(0))
+        release.set()
+        await holding
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["queue_timeouts"] == 1 and stats["active"] == 0
+
+def test_rate_limit_pauses_and_retries(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_MAX_RETRIES", 1)
+    attempts = []
+
+    async def call():
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise _rate_limit_error({"retry-after": "0.05"})
+        return "ok"
+
+    async def run():
+        scheduler = LLMScheduler()
+        return await scheduler.run(call), scheduler.stats()
+
+    result, stats = asyncio.run(run())
+    assert result == "ok" and attempts == [0, 1]
+    assert stats["rate_limited"] == 1 and stats["retries"] == 1
+
+def test_persistent_rate_limit_becomes_overloaded(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_MAX_RETRIES", 0)
+
+    async def call():
+        raise _rate_limit_error({"retry-after": "7"})
+
+    with pytest.raises(LLMOverloadedError) as raised:
+        asyncio.run(LLMScheduler().run(call))
+    assert raised.value.retry_after == 7.0
+    assert isinstance(raised.value.__cause__, openai.RateLimitError)
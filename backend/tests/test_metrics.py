@@ -0,0 +1,46 @@
+from langchain_core.messages import HumanMessage
+from src.utils.metrics import Counter, Histogram, percentile, render_metrics
+from src.utils.token_budget import count_prompt_tokens, get_token_stats
+from src.utils.graph_node_stats import record_node_time, get_node_stats
+
+def test_counter_values_by_label():
+    counter = Counter("test_events_total", "Test events", ("kind",))
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    counter.inc(kind="b")
+    assert counter.value(kind="a") == 3
+    assert counter.value(kind="missing") == 0
+    assert counter.values() == {("a",): 3, ("b",): 1}
+
+def test_histogram_window_keeps_only_recent_samples():
+    histogram = Histogram("test_seconds", "Test latency", ("op",), buckets=(1.0,), window=3)
+    for value in (5.0, 0.1, 0.3, 0.2):
+        histogram.observe(value, op="x")
+    summary = histogram.summaries()[("x",)]
+    assert summary["count"] == 4 and summary["max"] == 5.0 and summary["sum"] == 5.6
+    assert summary["recent"] == [0.1, 0.2, 0.3]
+    assert histogram.recent(op="x") == [0.1, 0.2, 0.3]
+    assert histogram.recent(op="y") == []
+
+def test_histogram_without_window_keeps_no_samples():
+    histogram = Histogram("test_unwindowed_seconds", "Test latency")
+    histogram.observe(0.5)
+    assert histogram.summaries()[()]["recent"] == []
+    assert 'test_unwindowed_seconds_bucket{le="+Inf"} 1' in render_metrics()
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.99) == 4.0
+
+def test_stats_views_read_the_registry():
+    count_prompt_tokens("test_prompt", [HumanMessage(content="one two three")])
+    count_prompt_tokens("test_prompt", [HumanMessage(content="one")])
+    stats = get_token_stats()["test_prompt"]
+    assert stats["calls"] == 2
+    assert stats["max_prompt_tokens"] > stats["prompt_tokens"] - stats["max_prompt_tokens"]
+    assert stats["avg_prompt_tokens"] == stats["prompt_tokens"] / 2
+
+    record_node_time("test_node", 0.2)
+    record_node_time("test_node", 0.4)
+    assert get_node_stats()["test_node"] == {"runs": 2, "total_s": 0.6, "latency_ms_p50": 400.0, "latency_ms_p95": 400.0}
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+from langchain_core.runnables.config import var_child_runnable_config
+from src.services.mystery_item_pool import MysteryItemPool
+from src.utils.mystery_item_prompts import TOPICS
+
+class FakeLLM:
+    """Returns a new secret per call and records the RunnableConfig it was called under."""
+
+    def __init__(self):
+        self.calls = 0
+        self.configs = []
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        self.configs.append(var_child_runnable_config.get())
+        return SimpleNamespace(content=f"Secret {self.calls}")
+
+def test_fills_every_topic_to_the_high_watermark():
+    llm = FakeLLM()
+
+    async def run():
+        pool = MysteryItemPool(lambda: llm, low_watermark=1, high_watermark=2)
+        pooled = await pool.wait_filled()
+        await pool.stop()
+        return pool, pooled
+
+    pool, pooled = asyncio.run(run())
+    assert pooled == 2 * len(TOPICS)
+    assert len(set(pool.pooled_secrets())) == pooled
+
+def test_pop_serves_pooled_secrets_and_skips_recent_ones():
+    llm = FakeLLM()
+
+    async def run():
+        pool = MysteryItemPool(lambda: llm, low_watermark=1, high_watermark=1)
+        await pool.wait_filled()
+        secret = pool.pop()
+        pool.remember("Secret 999")
+        duplicate = pool._is_duplicate(secret) and pool._is_duplicate("secret 999.")
+        await pool.stop()
+        return secret, duplicate
+
+    secret, duplicate = asyncio.run(run())
+    assert secret.startswith("Secret ")
+    assert duplicate
+
+def test_replenisher_does_not_inherit_the_callers_run_context():
+    llm = FakeLLM()
+
+    async def run():
+        pool = MysteryItemPool(lambda: llm, low_watermark=1, high_watermark=1)
+        # As if the first pop() happened inside a graph run
+        var_child_runnable_config.set({"callbacks": ["first run's handler"]})
+        assert pool.pop() is None
+        await pool.wait_filled()
+        await pool.stop()
+
+    asyncio.run(run())
+    assert llm.calls > 0
+    assert all(config is None for config in llm.configs)
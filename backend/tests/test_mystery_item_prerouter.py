@@ -0,0 +1,67 @@
+import pytest
+from src.utils.mystery_item_prerouter import classify_intent, pre_route, is_plain_hint_request, build_tool_args
+
+SECRET = "Toaster"
+
+@pytest.mark.parametrize("message, secret, tool, confidence, reason", [
+    # page load
+    ("page_load", None, "generate_mystery_item", 1.0, "rule:page_load_new_game"),
+    ("page_load", SECRET, "general_chat", 1.0, "rule:page_load_reminder"),
+    # starting a game
+    ("Yes!", None, "generate_mystery_item", 0.95, "rule:start_game"),
+    ("let's play", None, "generate_mystery_item", 0.95, "rule:start_game"),
+    ("Start a new game", None, "generate_mystery_item", 0.95, "rule:start_game"),
+    # reset
+    ("I give up", SECRET, "reset_game", 0.95, "rule:reset_game"),
+    ("new game!", SECRET, "reset_game", 0.95, "rule:reset_game"),
+    ("End the game", SECRET, "reset_game", 0.95, "rule:reset_game"),
+    # hints
+    ("Can I get a hint?", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("can I have a clue", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("Could I get another hint please?", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("could i have a clue?", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("May I have a hint?", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("Can you give me a clue?", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("get me a hint", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("Give me another clue", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("I need a hint", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("hint please", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("  HINT  ", SECRET, "give_hint", 0.95, "rule:hint"),
+    ("I'm stuck!", SECRET, "give_hint", 0.95, "rule:hint"),
+    # below the threshold, left to the agent LLM
+    ("Does it use electricity?", SECRET, "answer_question", 0.8, "classifier:question"),
+    ("is it alive?", SECRET, "check_guess", 0.7, "classifier:guess"),
+    ("Is it a toaster?", SECRET, "check_guess", 0.7, "classifier:guess"),
+])
+def test_classify_intent(message, secret, tool, confidence, reason):
+    assert classify_intent(message, secret) == (tool, confidence, reason)
+
+@pytest.mark.parametrize("message, secret", [
+    ("can i a hint", SECRET),  # no verb
+    ("can I get a hint about the colour?", SECRET),  # a custom hint, the LLM answers it
+    ("hint", None),  # no game to hint at
+    ("I give up", None),
+    ("yes", SECRET),  # a game is already running
+    ("Tell me a joke", SECRET),
+])
+def test_no_rule_matches(message, secret):
+    decision = classify_intent(message, secret)
+    assert decision is None or not decision.reason.startswith("rule:")
+
+@pytest.mark.parametrize("message", ["is it alive?", "Does it use electricity?", "Tell me a joke"])
+def test_below_threshold_goes_to_the_agent(message):
+    assert pre_route(message, SECRET) is None
+
+def test_hint_hit_is_counted_by_tool():
+    assert pre_route("Can I get a hint?", SECRET).tool_name == "give_hint"
+
+def test_plain_hint_request():
+    assert is_plain_hint_request("Can I get a hint?")
+    assert is_plain_hint_request("could I have another clue please")
+    assert not is_plain_hint_request("Can I get a hint about what it's made of?")
+
+def test_tool_args_match_the_tool_schemas():
+    assert build_tool_args("give_hint", "hint", SECRET) == {"user_message": "hint", "secret_answer": SECRET}
+    assert build_tool_args("generate_mystery_item", "yes", None) == {}
+    with pytest.raises(ValueError):
+        build_tool_args("unknown", "hi", SECRET)
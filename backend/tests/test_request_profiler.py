@@ -0,0 +1,63 @@
+import json
+import asyncio
+import pytest
+from src.utils import request_profiler
+from src.utils.request_profiler import RequestProfilerMiddleware
+
+async def _app(scope, receive, send):
+    body = json.dumps({"response": "hello"}).encode()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+def _request(headers: list[tuple[bytes, bytes]], path: str = "/mystery-item/invoke") -> tuple[dict, dict, bytes]:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path, "headers": headers}
+    asyncio.run(RequestProfilerMiddleware(_app)(scope, receive, send))
+    start, body = sent
+    return start, dict(start["headers"]), body["body"]
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(request_profiler, "PROFILING_HEADER_ENABLED", True)
+    monkeypatch.setattr(request_profiler, "PROFILING_SAMPLE_RATE", 0)
+    monkeypatch.setattr(request_profiler, "PROFILING_DIR", str(tmp_path))
+    return tmp_path
+
+@pytest.mark.parametrize("value", [b"0", b"false", b"", b"no", b"yes please"])
+def test_other_header_values_are_ignored(profiling, value):
+    _, headers, body = _request([(b"x-profile", value)])
+    assert b"x-profile-id" not in headers
+    assert json.loads(body) == {"response": "hello"}
+    assert list(profiling.iterdir()) == []
+
+@pytest.mark.parametrize("value", [b"1", b"true", b"File", b"file"])
+def test_file_mode_writes_the_profile(profiling, value):
+    _, headers, body = _request([(b"X-Profile", value)])
+    assert b"x-profile-id" in headers
+    assert json.loads(body) == {"response": "hello"}
+    assert int(headers[b"content-length"]) == len(body)
+    assert sorted(path.suffix for path in profiling.iterdir()) == [".json", ".prof"]
+
+def test_inline_mode_adds_the_report_to_the_response(profiling):
+    _, headers, body = _request([(b"x-profile", b"inline")])
+    payload = json.loads(body)
+    assert payload["response"] == "hello"
+    assert payload["profile"]["id"] == headers[b"x-profile-id"].decode()
+    assert int(headers[b"content-length"]) == len(body)
+    assert list(profiling.iterdir()) == []
+
+def test_header_is_ignored_unless_enabled(profiling, monkeypatch):
+    monkeypatch.setattr(request_profiler, "PROFILING_HEADER_ENABLED", False)
+    _, headers, _ = _request([(b"x-profile", b"1")])
+    assert b"x-profile-id" not in headers
+
+def test_other_paths_are_never_profiled(profiling):
+    _, headers, _ = _request([(b"x-profile", b"1")], path="/health")
+    assert b"x-profile-id" not in headers
@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from src.services import session_coordinator
+from src.services.session_coordinator import run_coalesced, session_lock, get_session_stats
+
+def _assert_cleaned_up():
+    assert session_coordinator._in_flight == {}
+    assert session_coordinator._session_locks == {}
+
+def test_identical_concurrent_requests_share_one_run():
+    runs = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def page_load():
+            runs.append("page_load")
+            await release.wait()
+            return "Welcome!"
+
+        before = get_session_stats()["coalesced"]
+        callers = [asyncio.create_task(run_coalesced("s1", ("s1", "chat", "page_load"), page_load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers)
+        return results, get_session_stats()["coalesced"] - before
+
+    results, coalesced = asyncio.run(run())
+    assert results == ["Welcome!"] * 3
+    assert runs == ["page_load"] and coalesced == 2
+    _assert_cleaned_up()
+
+def test_different_requests_of_a_session_run_one_at_a_time():
+    events = []
+
+    async def run():
+        async def turn(name: str):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+            return name
+
+        before = get_session_stats()["waited_for_lock"]
+        results = await asyncio.gather(
+            run_coalesced("s2", ("s2", "chat", "is it red?"), lambda: turn("first")),
+            run_coalesced("s2", ("s2", "chat", "is it big?"), lambda: turn("second")),
+            run_coalesced("other", ("other", "chat", "is it red?"), lambda: turn("other")),
+        )
+        return results, get_session_stats()["waited_for_lock"] - before
+
+    results, waited = asyncio.run(run())
+    assert results == ["first", "second", "other"]
+    assert events.index("first end") < events.index("second start")  # serialized on the session's lock
+    assert events.index("other start") < events.index("first end")  # other sessions don't wait
+    assert waited == 1
+    _assert_cleaned_up()
+
+def test_failed_leader_fails_its_followers_and_releases_everything():
+    runs = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def failing():
+            runs.append("run")
+            await release.wait()
+            raise RuntimeError("graph failed")
+
+        callers = [asyncio.create_task(run_coalesced("s3", ("s3", "reset"), failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        outcomes = await asyncio.gather(*callers, return_exceptions=True)
+        _assert_cleaned_up()
+        # the next identical request runs again instead of getting the stale failure
+        retried = await run_coalesced("s3", ("s3", "reset"), lambda: asyncio.sleep(0, result="ok"))
+        return outcomes, retried
+
+    outcomes, retried = asyncio.run(run())
+    assert runs == ["run"]
+    assert all(isinstance(outcome, RuntimeError) and str(outcome) == "graph failed" for outcome in outcomes)
+    assert retried == "ok"
+    _assert_cleaned_up()
+
+def test_cancelled_caller_does_not_cancel_the_shared_run():
+    async def run():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(run_coalesced("s4", ("s4", "chat", "hi"), slow))
+        second = asyncio.create_task(run_coalesced("s4", ("s4", "chat", "hi"), slow))
+        await asyncio.sleep(0)
+        first.cancel()  # the client disconnected
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    _assert_cleaned_up()
+
+def test_lock_entry_is_dropped_after_an_error_inside_it():
+    async def run():
+        with pytest.raises(ValueError):
+            async with session_lock("s5"):
+                raise ValueError("boom")
+
+    asyncio.run(run())
+    _assert_cleaned_up()
@@ -0,0 +1,111 @@
+import time
+import asyncio
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+from src.services.session_expiry import SessionExpiryIndex
+from src.services.sqlite_checkpointer import SqliteCheckpointSaver
+
+def _put(checkpointer, thread_id: str) -> None:
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpointer.put(config, empty_checkpoint(), {}, {})
+
+def _age(checkpointer: SqliteCheckpointSaver, thread_id: str, seconds: float) -> float:
+    timestamp = time.time() - seconds
+    checkpointer.conn.execute("UPDATE threads SET last_activity = ? WHERE thread_id = ?", (timestamp, thread_id))
+    return timestamp
+
+def _has_thread(checkpointer, thread_id: str) -> bool:
+    return checkpointer.get_tuple({"configurable": {"thread_id": thread_id}}) is not None
+
+# in-process (MemorySaver) ------------------------------------------------------------
+def test_memory_sweep_evicts_expired_and_over_the_cap():
+    saver = MemorySaver()
+    for thread_id in ("old", "a", "b", "c"):
+        _put(saver, thread_id)
+
+    async def run():
+        index = SessionExpiryIndex(saver, ttl=60, max_live=2)
+        now = time.time()
+        await index.touch("old", now - 120)
+        await index.touch("a", now - 30)
+        await index.touch("b", now - 20)
+        await index.touch("c", now - 10)
+        evicted = await index.sweep()
+        await index.stop()
+        return index, evicted
+
+    index, evicted = asyncio.run(run())
+    assert evicted == 2
+    assert index.stats()["expired"] == 1 and index.stats()["lru_evicted"] == 1
+    assert not _has_thread(saver, "old") and not _has_thread(saver, "a")
+    assert _has_thread(saver, "b") and _has_thread(saver, "c")
+
+def test_memory_touch_after_selection_keeps_the_thread():
+    saver = MemorySaver()
+    _put(saver, "t")
+
+    async def run():
+        index = SessionExpiryIndex(saver, ttl=60)
+        await index.touch("t", time.time() - 120)
+        (thread_id, timestamp, _), = index._pop_due(time.time())
+        await index.touch("t")  # a turn starts before the delete
+        deleted = await index._delete_if_inactive(thread_id, timestamp)
+        await index.stop()
+        return deleted
+
+    assert asyncio.run(run()) is False
+    assert _has_thread(saver, "t")
+
+# shared SQLite file, one saver per worker -----------------------------------------------
+def test_shared_sweep_deletes_only_inactive_threads(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    worker_a, worker_b = SqliteCheckpointSaver(path), SqliteCheckpointSaver(path)
+    _put(worker_a, "idle")
+    _put(worker_a, "playing")
+    _age(worker_a, "idle", 120)
+    _age(worker_a, "playing", 120)
+
+    async def run():
+        index_a = SessionExpiryIndex(worker_a, ttl=60)
+        index_b = SessionExpiryIndex(worker_b, ttl=60)
+        await index_b.touch("playing")  # worker B is serving it, worker A has never seen it
+        evicted = await index_a.sweep()
+        await index_a.stop()
+        await index_b.stop()
+        return evicted
+
+    assert asyncio.run(run()) == 1
+    assert not _has_thread(worker_b, "idle")
+    assert _has_thread(worker_b, "playing")
+
+def test_shared_touch_between_selection_and_delete_wins(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    worker_a, worker_b = SqliteCheckpointSaver(path), SqliteCheckpointSaver(path)
+    _put(worker_a, "t")
+    _age(worker_a, "t", 120)
+
+    async def run():
+        index_a = SessionExpiryIndex(worker_a, ttl=60)
+        (thread_id, timestamp, reason), = await index_a._shared_due(time.time())
+        worker_b.touch_thread("t", time.time())
+        deleted = await index_a._delete_if_inactive(thread_id, timestamp)
+        return reason, deleted
+
+    assert asyncio.run(run()) == ("expired", False)
+    assert _has_thread(worker_a, "t")
+
+def test_shared_cap_evicts_the_least_recently_active(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"))
+    for age, thread_id in enumerate(("c", "b", "a")):
+        _put(saver, thread_id)
+        _age(saver, thread_id, age)
+
+    async def run():
+        index = SessionExpiryIndex(saver, ttl=3600, max_live=1)
+        evicted = await index.sweep()
+        return index, evicted
+
+    index, evicted = asyncio.run(run())
+    assert evicted == 2
+    assert index.stats()["lru_evicted"] == 2
+    assert _has_thread(saver, "c") and not _has_thread(saver, "a") and not _has_thread(saver, "b")
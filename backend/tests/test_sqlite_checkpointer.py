@@ -0,0 +1,83 @@
+import sqlite3
+import pytest
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from src.services.sqlite_checkpointer import SqliteCheckpointSaver
+
+def _config(thread_id: str, checkpoint_id: str | None = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+def _put(saver: SqliteCheckpointSaver, thread_id: str, step: int, parent: dict | None = None) -> dict:
+    checkpoint = create_checkpoint(empty_checkpoint(), None, step)
+    return saver.put(parent or _config(thread_id), checkpoint, {"step": step}, {})
+
+@pytest.fixture
+def saver(tmp_path):
+    return SqliteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"), keep_checkpoints=3)
+
+def test_put_and_get_latest_with_writes(saver):
+    first = _put(saver, "t", 1)
+    second = _put(saver, "t", 2, parent=first)
+    saver.put_writes(second, [("messages", "hello"), ("__error__", "boom")], task_id="task-1")
+
+    latest = saver.get_tuple(_config("t"))
+    assert latest.config == second
+    assert latest.metadata == {"step": 2}
+    assert latest.parent_config == first
+    assert sorted(latest.pending_writes) == [("task-1", "__error__", "boom"), ("task-1", "messages", "hello")]
+    assert saver.get_tuple(first).metadata == {"step": 1}
+    assert saver.get_tuple(_config("unknown")) is None
+
+def test_put_writes_is_idempotent_for_regular_channels(saver):
+    config = _put(saver, "t", 1)
+    saver.put_writes(config, [("messages", "first")], task_id="task-1")
+    saver.put_writes(config, [("messages", "second")], task_id="task-1")
+    assert saver.get_tuple(config).pending_writes == [("task-1", "messages", "first")]
+
+def test_only_the_newest_checkpoints_are_kept(saver):
+    config = None
+    for step in range(6):
+        config = _put(saver, "t", step, parent=config)
+    steps = [checkpoint.metadata["step"] for checkpoint in saver.list(_config("t"))]
+    assert steps == [5, 4, 3]
+
+def test_list_filters_and_limits(saver):
+    config = None
+    for step in range(3):
+        config = _put(saver, "t", step, parent=config)
+    _put(saver, "other", 0)
+    assert [c.metadata["step"] for c in saver.list(_config("t"), filter={"step": 1})] == [1]
+    assert len(list(saver.list(_config("t"), limit=2))) == 2
+    assert len(list(saver.list(None))) == 4
+
+def test_delete_thread_removes_checkpoints_writes_and_activity(saver):
+    config = _put(saver, "t", 1)
+    saver.put_writes(config, [("messages", "hello")], task_id="task-1")
+    _put(saver, "other", 1)
+    saver.delete_thread("t")
+    assert saver.get_tuple(_config("t")) is None
+    assert saver.count_threads() == 1
+    assert saver.conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 't'").fetchone()[0] == 0
+
+def test_failed_begin_surfaces_the_original_error(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    saver = SqliteCheckpointSaver(path, busy_timeout_ms=50)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")  # another worker holds the write lock
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            _put(saver, "t", 1)
+    finally:
+        other.execute("ROLLBACK")
+    # and the connection is still usable afterwards
+    assert _put(saver, "t", 1)["configurable"]["thread_id"] == "t"
+
+def test_error_inside_the_transaction_rolls_back(saver):
+    with pytest.raises(RuntimeError):
+        with saver._cursor() as cur:
+            cur.execute("INSERT INTO threads (thread_id, last_activity) VALUES ('t', 1)")
+            raise RuntimeError("fail mid-transaction")
+    assert saver.count_threads() == 0
+    assert not saver.conn.in_transaction
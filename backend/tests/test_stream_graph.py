@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from langchain_core.messages import AIMessageChunk
+from src.services import mystery_item_service
+
+class FakeGraph:
+    """Replays one turn: the agent's tool choice, then the tool's LLM tokens."""
+
+    def __init__(self, tool_name: str, tokens: list[str]):
+        self.tool_name = tool_name
+        self.tokens = tokens
+
+    async def astream(self, state, config, stream_mode):
+        yield "updates", {"agent": {"tool_name": self.tool_name}}
+        for token in self.tokens:
+            yield "messages", (AIMessageChunk(content=token), {"langgraph_node": "tool_node"})
+        yield "updates", {"tool_node": {}}
+
+    async def aget_state(self, config):
+        return SimpleNamespace(values={"last_response": "the final reply", "tool_name": self.tool_name, "secret_answer": "Toaster"})
+
+class FakeExpiry:
+    async def touch(self, thread_id, timestamp=None):
+        pass
+
+@pytest.fixture
+def stream(monkeypatch):
+    monkeypatch.setattr(mystery_item_service, "session_expiry", FakeExpiry())
+
+    def run(tool_name: str, tokens: list[str]) -> tuple[str, dict]:
+        monkeypatch.setattr(mystery_item_service, "get_graph", lambda: FakeGraph(tool_name, tokens))
+
+        async def collect():
+            return [event async for event in mystery_item_service._stream_graph("s1", "is it a toaster?")]
+
+        events = asyncio.run(collect())
+        streamed = "".join(event["content"] for event in events if event["type"] == "token")
+        return streamed, events[-1]
+    return run
+
+@pytest.mark.parametrize("tokens, expected", [
+    (["CORRECT: Yes, it's a ", "Toaster!"], "Yes, it's a Toaster!"),
+    (["INC", "ORR", "ECT", ": Not quite", ", keep going."], "Not quite, keep going."),  # prefix split over chunks
+    (["I", "NCORRECT", ":", " ", "Nope."], "Nope."),
+    (["  correct:", " well done"], "well done"),  # lowercase, leading whitespace
+    (["Incorrect: ", "try again"], "try again"),
+    (["Cool", " guess, but no."], "Cool guess, but no."),  # starts like a prefix, isn't one
+    (["No, ", "it isn't a toaster."], "No, it isn't a toaster."),  # no prefix at all
+    (["In"], "In"),  # the reply ended while it still looked like a prefix
+])
+def test_check_guess_verdict_prefix_is_stripped(stream, tokens, expected):
+    streamed, end = stream("check_guess", tokens)
+    assert streamed == expected
+    assert end == {"type": "end", "response": "the final reply", "tool_name": "check_guess", "secret_answer": "Toaster"}
+
+def test_other_tools_stream_unchanged(stream):
+    streamed, _ = stream("answer_question", ["CORRECT: ", "that's right"])
+    assert streamed == "CORRECT: that's right"
+
+def test_non_streamable_tool_tokens_are_not_forwarded(stream):
+    streamed, end = stream("generate_mystery_item", ["Toaster"])
+    assert streamed == "" and end["type"] == "end"
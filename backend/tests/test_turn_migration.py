@@ -0,0 +1,81 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, RemoveMessage
+from src.services.mystery_item_service import _load_turn_context
+from src.utils.mystery_item_helpers import migrate_messages_to_turns, extract_secret_from_messages
+from src.utils.mystery_item_state import (
+    GameTurn,
+    MAX_TURNS,
+    MAX_HISTORY_LINES,
+    append_turns,
+    append_history_lines,
+    render_turn_lines,
+)
+
+def _legacy_turn(n: int, question: str, tool: str, reply: str) -> list:
+    """One turn the way the old schema checkpointed it: the tool's reply as the repr of an AIMessage."""
+    return [
+        HumanMessage(content=question, id=f"h{n}"),
+        AIMessage(content="", tool_calls=[{"name": tool, "args": {}, "id": f"call{n}"}], id=f"a{n}"),
+        ToolMessage(content=f"content='{reply}' additional_kwargs={{}}", name=tool, tool_call_id=f"call{n}", id=f"t{n}"),
+    ]
+
+LEGACY_MESSAGES = [
+    HumanMessage(content="start", id="h0"),
+    ToolMessage(
+        content="{'secret_answer': 'Toaster', 'messages': [AIMessage(content='I have thought of an item!')]}",
+        name="generate_mystery_item", tool_call_id="call0", id="t0",
+    ),
+    *_legacy_turn(1, "Is it red?", "answer_question", "No, it isn\\'t red."),
+    *_legacy_turn(2, "A hint please", "give_hint", "You find it in a kitchen."),
+]
+
+def test_legacy_messages_become_turn_records():
+    assert migrate_messages_to_turns(LEGACY_MESSAGES) == [
+        GameTurn("start", "I have thought of an item!", "generate_mystery_item"),
+        GameTurn("Is it red?", "No, it isn't red.", "answer_question"),
+        GameTurn("A hint please", "You find it in a kitchen.", "give_hint"),
+    ]
+    assert extract_secret_from_messages(LEGACY_MESSAGES) == "Toaster"
+
+def test_unparseable_tool_reply_is_skipped():
+    messages = [HumanMessage(content="Is it red?"), ToolMessage(content="not a message repr", tool_call_id="call1")]
+    assert migrate_messages_to_turns(messages) == []
+
+def test_legacy_checkpoint_is_migrated_once_into_the_compact_state():
+    current = HumanMessage(content="Is it metal?", id="current")
+    secret, history_lines, update = _load_turn_context({"messages": LEGACY_MESSAGES + [current]})
+
+    assert secret == "Toaster"
+    assert history_lines == [
+        "HumanMessage: start", "AIMessage: I have thought of an item!",
+        "HumanMessage: Is it red?", "AIMessage: No, it isn't red.",
+        "HumanMessage: A hint please", "AIMessage: You find it in a kitchen.",
+    ]
+    assert [turn.tool for turn in update["turns"]] == ["generate_mystery_item", "answer_question", "give_hint"]
+    assert update["secret_answer"] == "Toaster"
+    assert update["history_lines"] == history_lines
+    removed = [msg.id for msg in update["messages"]]
+    assert all(isinstance(msg, RemoveMessage) for msg in update["messages"])
+    assert "current" not in removed and len(removed) == len(LEGACY_MESSAGES)
+
+def test_up_to_date_state_needs_no_update():
+    turn = GameTurn("Is it red?", "No.", "answer_question")
+    state = {
+        "messages": [HumanMessage(content="Is it metal?", id="current")],
+        "secret_answer": "Toaster",
+        "turns": [turn],
+        "history_lines": render_turn_lines(turn),
+    }
+    assert _load_turn_context(state) == ("Toaster", render_turn_lines(turn), {})
+
+def test_turns_recorded_before_the_history_cache_are_rendered_once():
+    turn = GameTurn("Is it red?", "No.", "answer_question")
+    state = {"messages": [HumanMessage(content="Is it metal?")], "secret_answer": "Toaster", "turns": [turn]}
+    _, history_lines, update = _load_turn_context(state)
+    assert history_lines == update["history_lines"] == ["HumanMessage: Is it red?", "AIMessage: No."]
+
+def test_reducers_keep_only_the_most_recent_entries():
+    turns = [GameTurn(f"q{i}", f"a{i}") for i in range(MAX_TURNS + 5)]
+    kept = append_turns(turns[:10], turns[10:])
+    assert len(kept) == MAX_TURNS and kept[-1] == turns[-1]
+    lines = append_history_lines(None, [f"line {i}" for i in range(MAX_HISTORY_LINES + 3)])
+    assert len(lines) == MAX_HISTORY_LINES and lines[0] == "line 3"